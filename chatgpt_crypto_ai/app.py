@@ -21,6 +21,7 @@ from routes.exchange_api_routes import exchange_api_bp
 from routes.trading_history_routes import trading_history_bp
 from routes.subscription_routes import subscription_bp
 from routes.admin_subscription_routes import admin_subscription_bp
+from routes.market_routes import market_bp
 from services.trading_websocket_service import init_trading_websocket_service
 from models import db
 
@@ -502,6 +503,7 @@ def create_app(enable_socketio: bool = True):
     app.register_blueprint(trading_history_bp)
     app.register_blueprint(subscription_bp)
     app.register_blueprint(admin_subscription_bp)
+    app.register_blueprint(market_bp)
     
     # 初始化管理员模块
     try:
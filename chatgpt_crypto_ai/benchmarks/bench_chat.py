@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+聊天接口压测：并发请求 /api/chat/，统计吞吐量、延迟分位数、首个 token 时间和每个请求的数据库查询数
+
+默认在进程内启动应用，OpenAI 和币安都指向本地假服务（benchmarks.fake_openai 和
+benchmarks.fake_binance，同时在后台线程启动），K线和交易对缓存写到临时目录，
+不影响正式缓存；数据库使用 DATABASE_URL（建议指向单独的压测库），压测用户会自动创建。
+加 --url 和 --token 时压测已经运行的服务，此时不统计数据库查询数。
+
+运行: python -m benchmarks.bench_chat [--requests 200] [--concurrency 16] [--no-stream]
+                                      [--openai-latency 300] [--binance-latency 20]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import requests
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 压测问题：覆盖分析、价格监控、交易建议和闲聊
+DEFAULT_MESSAGES = [
+    "BTC 1小时走势怎么样",
+    "ETH现在多少钱",
+    "SOL 4小时图技术分析",
+    "BNB值得买入吗",
+    "分析一下DOGE的日线趋势",
+    "XRP现在什么价格",
+    "今天的市场情绪如何",
+]
+
+# 压测用户
+BENCH_USERNAME = "bench_user"
+
+# 本地假服务的默认端口
+FAKE_OPENAI_PORT = 8901
+FAKE_BINANCE_PORT = 8902
+
+
+class QueryCounter:
+    """统计 SQLAlchemy 引擎执行的语句数（含后台线程）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def attach(self, engine) -> None:
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            with self._lock:
+                self.count += 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    """分位数，空列表时为0"""
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_request(http: requests.Session, url: str, token: str, message: str, stream: bool) -> Dict[str, Any]:
+    """
+    发送一个聊天请求
+
+    Returns:
+        Dict[str, Any]: ok、latency（秒）、ttft（首个内容片段的时间，秒）、cached、
+        db_ms（本轮数据库写入耗时，仅流式）
+    """
+    start = time.perf_counter()
+    result = {'ok': False, 'latency': 0.0, 'ttft': None, 'cached': False, 'db_ms': None}
+    try:
+        response = http.post(f"{url}/api/chat/", json={'message': message, 'stream': stream},
+                             headers={'Authorization': f"Bearer {token}"}, stream=stream, timeout=120)
+        if stream:
+            # 按行解码，避免多字节字符跨数据块时被截断
+            for raw in response.iter_lines():
+                line = raw.decode('utf-8')
+                if not line.startswith('data: '):
+                    continue
+                event = json.loads(line[6:])
+                if event.get('content') and result['ttft'] is None:
+                    result['ttft'] = time.perf_counter() - start
+                if event.get('error'):
+                    break
+                if event.get('done'):
+                    result['ok'] = True
+                    result['cached'] = bool(event.get('cached'))
+                    result['db_ms'] = event.get('db_ms')
+                    break
+        else:
+            data = response.json()
+            result['ok'] = response.status_code == 200 and data.get('status') == 'success'
+            result['cached'] = bool(data.get('cached'))
+            result['ttft'] = time.perf_counter() - start
+    except (requests.RequestException, ValueError):
+        pass
+    result['latency'] = time.perf_counter() - start
+    return result
+
+
+def run_load(url: str, token: str, messages: List[str], total: int, concurrency: int,
+             stream: bool) -> Dict[str, Any]:
+    """
+    以固定并发发送 total 个请求
+
+    Returns:
+        Dict[str, Any]: results（每个请求的结果）和 elapsed（总耗时，秒）
+    """
+    local = threading.local()
+
+    def worker(i: int) -> Dict[str, Any]:
+        if not hasattr(local, 'http'):
+            local.http = requests.Session()
+        return run_request(local.http, url, token, messages[i % len(messages)], stream)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(total)))
+    return {'results': results, 'elapsed': time.perf_counter() - start}
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float, db_queries: Optional[int]) -> Dict[str, Any]:
+    """汇总压测结果"""
+    ok = [r for r in results if r['ok']]
+    latencies = [r['latency'] for r in ok]
+    ttfts = [r['ttft'] for r in ok if r['ttft'] is not None]
+    db_ms = [r['db_ms'] for r in ok if r.get('db_ms') is not None]
+    return {
+        'requests': len(results),
+        'errors': len(results) - len(ok),
+        'cached': sum(1 for r in ok if r['cached']),
+        'rps': len(ok) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'ttft_p50': percentile(ttfts, 50),
+        'ttft_p99': percentile(ttfts, 99),
+        'db_ms_p50': percentile(db_ms, 50) if db_ms else None,
+        'db_queries_per_request': db_queries / len(results) if db_queries is not None and results else None,
+    }
+
+
+def start_local_app(args) -> Dict[str, Any]:
+    """
+    启动假服务和进程内应用
+
+    Returns:
+        Dict[str, Any]: url、token、counter（QueryCounter）、server
+    """
+    # 必须在导入 config 之前设置环境变量
+    openai_url = args.openai_url or f"http://127.0.0.1:{FAKE_OPENAI_PORT}/v1"
+    binance_url = args.binance_url or f"http://127.0.0.1:{FAKE_BINANCE_PORT}"
+    os.environ['OPENAI_BASE_URL'] = openai_url
+    os.environ['BINANCE_API_BASE'] = binance_url
+    os.environ['BINANCE_API_FALLBACK'] = binance_url
+    os.environ.setdefault('OPENAI_API_KEY', 'bench')
+
+    from benchmarks import fake_binance, fake_openai
+    if not args.openai_url:
+        fake_openai.start_in_thread(fake_openai.make_server(
+            port=FAKE_OPENAI_PORT, latency=args.openai_latency / 1000,
+            tokens=args.reply_tokens, token_interval=args.token_interval / 1000))
+    if not args.binance_url:
+        fake_binance.start_in_thread(fake_binance.make_server(
+            port=FAKE_BINANCE_PORT, latency=args.binance_latency / 1000))
+
+    # K线和交易对缓存写到临时目录，避免假行情进入正式缓存
+    from utils import symbols_sync
+    from utils.kline_store import kline_store
+    cache_dir = tempfile.mkdtemp(prefix="coingpt-bench-")
+    kline_store.base_dir = os.path.join(cache_dir, "klines")
+    os.makedirs(kline_store.base_dir, exist_ok=True)
+    symbols_sync.CACHE_DIR = cache_dir
+    symbols_sync.SYMBOLS_CACHE_FILE = os.path.join(cache_dir, "binance_symbols.json")
+    symbols_sync.SYMBOLS_LOCK_FILE = os.path.join(cache_dir, "binance_symbols.lock")
+
+    from werkzeug.serving import make_server
+    from app import create_app
+    from models import db, User
+    from services.web_auth_service import WebAuthService
+
+    app = create_app(enable_socketio=False)
+    counter = QueryCounter()
+    with app.app_context():
+        user = User.query.filter_by(username=BENCH_USERNAME).first()
+        if user is None:
+            # 非免费用户，不受会话和消息数量限制
+            user = User(username=BENCH_USERNAME, membership='premium')
+            db.session.add(user)
+            db.session.commit()
+        token = WebAuthService.create_session_token(user.id)
+        counter.attach(db.engine)
+
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    return {'url': f"http://127.0.0.1:{server.server_port}", 'token': token, 'counter': counter, 'server': server}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="聊天接口压测")
+    parser.add_argument('--requests', type=int, default=200, help="请求总数")
+    parser.add_argument('--concurrency', type=int, default=16, help="并发数")
+    parser.add_argument('--no-stream', action='store_true', help="使用非流式接口")
+    parser.add_argument('--warmup', type=int, default=10, help="预热请求数（不计入结果）")
+    parser.add_argument('--url', help="压测已运行的服务，如 http://127.0.0.1:5000")
+    parser.add_argument('--token', help="与 --url 一起使用的会话令牌")
+    parser.add_argument('--port', type=int, default=0, help="进程内应用的端口，0 表示随机端口")
+    parser.add_argument('--openai-url', help="使用已运行的 OpenAI 兼容服务")
+    parser.add_argument('--binance-url', help="使用已运行的币安行情服务")
+    parser.add_argument('--openai-latency', type=float, default=300, help="假 OpenAI 首个 token 前的延迟（毫秒）")
+    parser.add_argument('--token-interval', type=float, default=10, help="假 OpenAI 流式片段间隔（毫秒）")
+    parser.add_argument('--reply-tokens', type=int, default=200, help="假 OpenAI 回答的片段数")
+    parser.add_argument('--binance-latency', type=float, default=20, help="假币安每个请求的延迟（毫秒）")
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.token:
+            parser.error("--url 需要同时提供 --token")
+        url, token, counter = args.url.rstrip('/'), args.token, None
+    else:
+        local = start_local_app(args)
+        url, token, counter = local['url'], local['token'], local['counter']
+
+    stream = not args.no_stream
+    if args.warmup:
+        run_load(url, token, DEFAULT_MESSAGES, args.warmup, min(args.concurrency, args.warmup), stream)
+
+    queries_before = counter.count if counter else None
+    load = run_load(url, token, DEFAULT_MESSAGES, args.requests, args.concurrency, stream)
+    db_queries = None
+    if counter:
+        # 非流式回复返回后，消息仍在后台写入，等写入结束再统计
+        time.sleep(0.5)
+        db_queries = counter.count - queries_before
+
+    report = summarize(load['results'], load['elapsed'], db_queries)
+    print(f"目标: {url}/api/chat/ ({'流式' if stream else '非流式'})，并发 {args.concurrency}")
+    print(f"请求: {report['requests']}，失败 {report['errors']}，命中回答缓存 {report['cached']}")
+    print(f"吞吐: {report['rps']:.1f} 请求/秒")
+    print(f"延迟: p50 {report['p50'] * 1000:.0f} ms，p99 {report['p99'] * 1000:.0f} ms")
+    print(f"首个token: p50 {report['ttft_p50'] * 1000:.0f} ms，p99 {report['ttft_p99'] * 1000:.0f} ms")
+    if report['db_ms_p50'] is not None:
+        print(f"本轮写入: p50 {report['db_ms_p50']:.1f} ms")
+    if report['db_queries_per_request'] is not None:
+        print(f"数据库查询: {report['db_queries_per_request']:.1f} 条/请求")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+币种提取基准测试：对比逐个符号正则匹配的旧实现与 Aho-Corasick 匹配器
+
+运行: python -m benchmarks.bench_extract [--symbols N] [--repeat N]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+from typing import Callable, Dict, List
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.extract import COMMON_CRYPTO_SYMBOLS, CRYPTO_NAME_TO_SYMBOL, CoinMentionMatcher
+
+SAMPLE_MESSAGES = [
+    "BTC和ETH的价格走势如何？",
+    "比特币和以太坊哪个投资价值更高？",
+    "Compare bitcoin and ethereum performance over the last week.",
+    "SOL、ADA和波卡的技术面分析",
+    "帮我看看 DOGE/USDT 4小时图，顺便说说狗狗币最近的消息",
+    "今天天气真好",
+    "What do you think about the market? Should I buy some LINK or stay in stablecoins?",
+    "请分析一下 BNB、XRP、AVAX 以及 polygon 的 1d 走势，给出支撑位和阻力位",
+]
+
+
+def legacy_extract_crypto_symbols(text: str, all_symbols: List[str], names: Dict[str, str]) -> List[str]:
+    """旧实现：对每个符号重新分词并编译正则"""
+    upper_text = text.upper()
+    lower_text = text.lower()
+    found_symbols = []
+
+    processed_text = re.sub(r'([.,!?()\[\]{}:;\'"\s])', r' \1 ', text)
+    processed_text = re.sub(r'\s+', ' ', processed_text)
+    tokens = processed_text.split()
+
+    for symbol in all_symbols:
+        if symbol.lower() in [t.lower() for t in tokens] or symbol in [t for t in tokens]:
+            if symbol not in found_symbols:
+                found_symbols.append(symbol)
+
+    for symbol in all_symbols:
+        if symbol in found_symbols:
+            continue
+        pattern = r'\b' + re.escape(symbol) + r'\b'
+        if re.search(pattern, upper_text) or re.search(pattern, lower_text):
+            found_symbols.append(symbol)
+            continue
+        pattern = r'\b' + re.escape(symbol) + r'/'
+        if re.search(pattern, upper_text) or re.search(pattern, lower_text):
+            found_symbols.append(symbol)
+
+    for name, symbol in names.items():
+        if name.lower() in text.lower() and symbol not in found_symbols:
+            found_symbols.append(symbol)
+
+    return found_symbols
+
+
+def load_symbols(count: int) -> List[str]:
+    """加载币种符号：优先使用本地币安缓存，不足时补充生成的符号"""
+    symbols = list(COMMON_CRYPTO_SYMBOLS)
+    try:
+        from utils.symbols_sync import read_symbols_cache_file
+        cache_data = read_symbols_cache_file()
+        if cache_data:
+            symbols += [coin for coin in cache_data["base_coins"] if coin not in symbols]
+    except Exception:
+        pass
+    i = 0
+    while len(symbols) < count:
+        symbols.append(f"X{i:04d}")
+        i += 1
+    return symbols[:count]
+
+
+def measure(func: Callable[[str], List[str]], messages: List[str], repeat: int) -> float:
+    """返回每条消息的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            func(message)
+    return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="币种提取基准测试")
+    parser.add_argument('--symbols', type=int, default=2000, help="币种符号数量")
+    parser.add_argument('--repeat', type=int, default=20, help="每条消息重复次数")
+    args = parser.parse_args()
+
+    symbols = load_symbols(args.symbols)
+
+    start = time.perf_counter()
+    matcher = CoinMentionMatcher(symbols, CRYPTO_NAME_TO_SYMBOL)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    legacy_us = measure(lambda m: legacy_extract_crypto_symbols(m, symbols, CRYPTO_NAME_TO_SYMBOL),
+                        SAMPLE_MESSAGES, args.repeat)
+    matcher_us = measure(matcher.find, SAMPLE_MESSAGES, args.repeat)
+
+    print(f"币种符号数量: {len(symbols)}，样例消息: {len(SAMPLE_MESSAGES)} 条，重复 {args.repeat} 次")
+    print(f"匹配器构建耗时: {build_ms:.2f} ms（仅在币种列表变化时发生）")
+    print(f"旧实现:   {legacy_us:10.1f} us/条")
+    print(f"匹配器:   {matcher_us:10.1f} us/条")
+    print(f"加速比:   {legacy_us / matcher_us:10.1f}x")
+
+    for message in SAMPLE_MESSAGES:
+        legacy = set(legacy_extract_crypto_symbols(message, symbols, CRYPTO_NAME_TO_SYMBOL))
+        current = set(matcher.find(message))
+        if legacy != current:
+            print(f"结果差异: {message!r} 旧={sorted(legacy)} 新={sorted(current)}")
+
+
+if __name__ == "__main__":
+    main()
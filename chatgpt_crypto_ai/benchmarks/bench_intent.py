@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+意图快速识别评估：在固定语料上统计规则命中率，以及命中部分与大模型结果的一致率
+
+默认与语料中标注的结果（按意图提示词规则标注）比较；加 --live 时对每条语料实际调用
+IntentExtractor.extract_intent，与大模型的当前输出比较（需要 OPENAI_API_KEY）。
+
+运行: python -m benchmarks.bench_intent [--live]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, List
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.intent_rules import classify_intent
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "tests", "fixtures", "intent_corpus.json")
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Dict[str, Any]]:
+    """读取意图语料"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _history(item: Dict[str, Any]) -> List[Dict[str, str]]:
+    """为依赖上下文的语料构造一轮对话历史"""
+    if not item.get('history_coin'):
+        return []
+    return [{"role": "user", "content": f"{item['history_coin']}最近怎么样"}]
+
+
+def evaluate(corpus: List[Dict[str, Any]], live: bool = False) -> Dict[str, Any]:
+    """
+    评估规则识别
+
+    Args:
+        corpus: 语料，每条包含 message 以及标注的 coin/intent/timeframe
+        live: 是否调用大模型获取参照结果
+
+    Returns:
+        Dict: 命中数、命中率、一致数、一致率、不一致的语料和规则平均耗时
+    """
+    if live:
+        from utils.intent_extractor import IntentExtractor
+
+    hits = agreed = 0
+    mismatches = []
+    elapsed = 0.0
+    for item in corpus:
+        started = time.perf_counter()
+        result = classify_intent(item['message'])
+        elapsed += time.perf_counter() - started
+        if result is None:
+            continue
+        hits += 1
+
+        expected = item
+        if live:
+            expected = IntentExtractor.extract_intent(item['message'], _history(item))
+        if result['coin'] == expected.get('coin') and result['intent'] == expected.get('intent'):
+            agreed += 1
+        else:
+            mismatches.append({'message': item['message'], 'rules': result,
+                               'expected': {k: expected.get(k) for k in ('coin', 'intent', 'timeframe')}})
+
+    return {
+        'total': len(corpus),
+        'hits': hits,
+        'hit_rate': hits / len(corpus) if corpus else 0.0,
+        'agreed': agreed,
+        'agreement': agreed / hits if hits else 0.0,
+        'mismatches': mismatches,
+        'avg_rule_us': elapsed / len(corpus) * 1e6 if corpus else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="意图快速识别评估")
+    parser.add_argument('--live', action='store_true', help="调用大模型作为参照")
+    args = parser.parse_args()
+
+    report = evaluate(load_corpus(), live=args.live)
+    print(f"语料: {report['total']} 条")
+    print(f"规则命中: {report['hits']} 条 ({report['hit_rate']:.1%})，平均耗时 {report['avg_rule_us']:.1f} µs")
+    print(f"与{'大模型' if args.live else '标注'}一致: {report['agreed']}/{report['hits']} ({report['agreement']:.1%})")
+    for mismatch in report['mismatches']:
+        print(f"  不一致: {mismatch['message']} 规则={mismatch['rules']['coin']}/{mismatch['rules']['intent']} "
+              f"参照={mismatch['expected']['coin']}/{mismatch['expected']['intent']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+支撑阻力位基准测试：对比逐根K线切片的旧实现与向量化实现
+
+运行: python -m benchmarks.bench_trend [--sizes 1000,10000,100000] [--legacy-max 10000]
+"""
+import os
+import sys
+import time
+import argparse
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.trend import TrendAnalyzer
+
+
+def legacy_cluster_price_levels(levels: List[float], threshold_pct: float = 0.01) -> List[float]:
+    """旧实现：每加入一个价位都重新计算聚类平均值"""
+    if not levels:
+        return []
+    sorted_levels = sorted(levels)
+    clusters = []
+    current_cluster = [sorted_levels[0]]
+    for i in range(1, len(sorted_levels)):
+        current = sorted_levels[i]
+        cluster_avg = sum(current_cluster) / len(current_cluster)
+        if abs(current - cluster_avg) / cluster_avg < threshold_pct:
+            current_cluster.append(current)
+        else:
+            clusters.append(sum(current_cluster) / len(current_cluster))
+            current_cluster = [current]
+    if current_cluster:
+        clusters.append(sum(current_cluster) / len(current_cluster))
+    return clusters
+
+
+def legacy_support_resistance(df: pd.DataFrame, window: int = 10) -> Dict[str, List[float]]:
+    """旧实现：每根K线构造前后两个 iloc 切片"""
+    local_min = []
+    local_max = []
+    if len(df) < window * 2:
+        return {"support": [df['low'].min()], "resistance": [df['high'].max()]}
+    for i in range(window, len(df) - window):
+        prev_window = df.iloc[i-window:i]
+        next_window = df.iloc[i+1:i+window+1]
+        current = df.iloc[i]
+        if current['low'] <= prev_window['low'].min() and current['low'] <= next_window['low'].min():
+            local_min.append(current['low'])
+        if current['high'] >= prev_window['high'].max() and current['high'] >= next_window['high'].max():
+            local_max.append(current['high'])
+    support = legacy_cluster_price_levels(local_min)
+    resistance = legacy_cluster_price_levels(local_max)
+    current_price = df.iloc[-1]['close']
+    support = [s for s in support if s < current_price]
+    resistance = [r for r in resistance if r > current_price]
+    support.sort(reverse=True)
+    resistance.sort()
+    return {"support": support[:3], "resistance": resistance[:3]}
+
+
+def make_klines(n: int, seed: int = 42) -> pd.DataFrame:
+    """生成随机游走K线"""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    spread = np.abs(rng.normal(0, 0.002, n)) * close
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2020-01-01', periods=n, freq='min'),
+        'open': close * (1 + rng.normal(0, 0.001, n)),
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.uniform(1, 100, n),
+    })
+
+
+def best_of(func, repeat: int) -> float:
+    """取多次运行中的最短耗时（毫秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="支撑阻力位基准测试")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="K线数量，逗号分隔")
+    parser.add_argument('--legacy-max', type=int, default=10000, help="超过该数量时跳过旧实现")
+    parser.add_argument('--repeat', type=int, default=3, help="重复次数")
+    args = parser.parse_args()
+
+    print(f"{'K线数量':>10} {'旧实现(ms)':>12} {'向量化(ms)':>12} {'加速比':>8}  结果一致")
+    for n in [int(x) for x in args.sizes.split(',')]:
+        df = make_klines(n)
+        new_ms = best_of(lambda: TrendAnalyzer.calculate_support_resistance(df), args.repeat)
+        if n <= args.legacy_max:
+            legacy_ms = best_of(lambda: legacy_support_resistance(df), 1)
+            same = legacy_support_resistance(df) == TrendAnalyzer.calculate_support_resistance(df)
+            print(f"{n:>10} {legacy_ms:>12.1f} {new_ms:>12.2f} {legacy_ms / new_ms:>7.0f}x  {same}")
+        else:
+            print(f"{n:>10} {'跳过':>12} {new_ms:>12.2f} {'-':>8}  -")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+本地币安行情假服务：实现 /api/v3/klines、/api/v3/exchangeInfo、/api/v3/ticker/24hr
+和 /api/v3/ticker/price，用于离线压测
+
+价格由交易对和K线开盘时间确定性地生成（正弦趋势加伪随机扰动），同一根K线在
+多次请求之间保持一致，分析缓存和回答缓存的行为与真实行情相同。
+
+运行: python -m benchmarks.fake_binance [--port 8902] [--latency 20]
+然后以 BINANCE_API_BASE=http://127.0.0.1:8902 BINANCE_API_FALLBACK=http://127.0.0.1:8902 启动应用
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.extract import COMMON_CRYPTO_SYMBOLS
+from utils.resample import INTERVAL_MS
+
+# 报价币种
+QUOTE_ASSET = "USDT"
+
+# 交易对列表
+BASE_ASSETS = [coin for coin in COMMON_CRYPTO_SYMBOLS if coin != QUOTE_ASSET]
+
+# 不在 INTERVAL_MS 中的周期（毫秒）
+LONG_INTERVAL_MS = {'1w': 7 * 86400_000, '1M': 30 * 86400_000}
+
+# 单次请求的K线数量
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+
+
+def _interval_ms(interval: str) -> int:
+    return INTERVAL_MS.get(interval) or LONG_INTERVAL_MS[interval]
+
+
+def _noise(k: np.ndarray, salt: int) -> np.ndarray:
+    """[0, 1) 之间的确定性伪随机数"""
+    x = np.sin(k * 12.9898 + salt * 78.233) * 43758.5453
+    return x - np.floor(x)
+
+
+def _close_prices(symbol: str, k: np.ndarray, interval_ms: int) -> np.ndarray:
+    """第 k 根K线的收盘价"""
+    salt = zlib.crc32(symbol.encode()) % 1000
+    base = 10.0 ** (salt % 5)
+    t = k * interval_ms
+    trend = 0.05 * np.sin(t / (interval_ms * 40.0) + salt)
+    return base * (1 + trend + 0.01 * (_noise(k, salt) - 0.5))
+
+
+def make_klines(symbol: str, interval: str, limit: int = DEFAULT_LIMIT, start_time: int = None,
+                end_time: int = None, now_ms: int = None) -> List[List[Any]]:
+    """
+    按币安 /api/v3/klines 的格式生成K线
+
+    Args:
+        symbol: 交易对，如 BTCUSDT
+        interval: 时间周期
+        limit: 数量上限
+        start_time: 起始时间（毫秒，含）
+        end_time: 结束时间（毫秒，含）
+        now_ms: 当前时间（毫秒），默认系统时间
+
+    Returns:
+        List[List[Any]]: K线列表，最后一根为当前未收盘的K线
+    """
+    interval_ms = _interval_ms(interval)
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    now_k = (now_ms if now_ms is not None else int(time.time() * 1000)) // interval_ms
+    last_k = now_k if end_time is None else min(now_k, end_time // interval_ms)
+    if start_time is not None:
+        first_k = -(-start_time // interval_ms)
+        last_k = min(last_k, first_k + limit - 1)
+    else:
+        first_k = last_k - limit + 1
+    if last_k < first_k:
+        return []
+
+    k = np.arange(first_k, last_k + 1, dtype=np.int64)
+    close = _close_prices(symbol, k, interval_ms)
+    open_ = _close_prices(symbol, k - 1, interval_ms)
+    salt = zlib.crc32(symbol.encode()) % 1000
+    high = np.maximum(open_, close) * (1 + 0.004 * _noise(k, salt + 1))
+    low = np.minimum(open_, close) * (1 - 0.004 * _noise(k, salt + 2))
+    volume = 100 + 900 * _noise(k, salt + 3)
+
+    rows = []
+    for i, ki in enumerate(k.tolist()):
+        open_time = ki * interval_ms
+        rows.append([
+            open_time, f"{open_[i]:.8f}", f"{high[i]:.8f}", f"{low[i]:.8f}", f"{close[i]:.8f}",
+            f"{volume[i]:.4f}", open_time + interval_ms - 1, f"{volume[i] * close[i]:.4f}",
+            int(volume[i]), f"{volume[i] / 2:.4f}", f"{volume[i] * close[i] / 2:.4f}", "0",
+        ])
+    return rows
+
+
+def make_ticker_24hr(symbol: str) -> Dict[str, Any]:
+    """按币安 /api/v3/ticker/24hr 的格式生成行情统计"""
+    rows = make_klines(symbol, '1h', 24)
+    open_price, last_price = float(rows[0][1]), float(rows[-1][4])
+    return {
+        "symbol": symbol,
+        "openPrice": f"{open_price:.8f}",
+        "lastPrice": f"{last_price:.8f}",
+        "priceChange": f"{last_price - open_price:.8f}",
+        "priceChangePercent": f"{(last_price / open_price - 1) * 100:.3f}",
+        "highPrice": f"{max(float(r[2]) for r in rows):.8f}",
+        "lowPrice": f"{min(float(r[3]) for r in rows):.8f}",
+        "volume": f"{sum(float(r[5]) for r in rows):.4f}",
+        "quoteVolume": f"{sum(float(r[7]) for r in rows):.4f}",
+    }
+
+
+def exchange_info() -> Dict[str, Any]:
+    """按币安 /api/v3/exchangeInfo 的格式生成交易对信息"""
+    return {
+        "timezone": "UTC",
+        "serverTime": int(time.time() * 1000),
+        "symbols": [{
+            "symbol": f"{base}{QUOTE_ASSET}",
+            "status": "TRADING",
+            "baseAsset": base,
+            "quoteAsset": QUOTE_ASSET,
+            "isSpotTradingAllowed": True,
+            "filters": [],
+        } for base in BASE_ASSETS],
+    }
+
+
+class FakeBinanceHandler(BaseHTTPRequestHandler):
+    """行情请求处理器，延迟保存在 server 上"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        time.sleep(self.server.latency)
+
+        try:
+            if url.path == '/api/v3/klines':
+                self._send_json(200, make_klines(
+                    params['symbol'], params['interval'], int(params.get('limit', DEFAULT_LIMIT)),
+                    int(params['startTime']) if 'startTime' in params else None,
+                    int(params['endTime']) if 'endTime' in params else None,
+                ))
+            elif url.path == '/api/v3/exchangeInfo':
+                self._send_json(200, exchange_info())
+            elif url.path in ('/api/v3/ticker/24hr', '/api/v3/ticker/price'):
+                if 'symbol' in params:
+                    symbols = [params['symbol']]
+                elif 'symbols' in params:
+                    symbols = json.loads(params['symbols'])
+                else:
+                    symbols = [f"{base}{QUOTE_ASSET}" for base in BASE_ASSETS]
+                tickers = [make_ticker_24hr(symbol) for symbol in symbols]
+                if url.path.endswith('/price'):
+                    tickers = [{"symbol": t["symbol"], "price": t["lastPrice"]} for t in tickers]
+                self._send_json(200, tickers[0] if 'symbol' in params else tickers)
+            else:
+                self._send_json(404, {"code": -1, "msg": f"unknown path {url.path}"})
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {"code": -1100, "msg": f"invalid parameter: {e}"})
+
+
+def make_server(host: str = '127.0.0.1', port: int = 0, latency: float = 0.02) -> ThreadingHTTPServer:
+    """
+    创建假币安服务
+
+    Args:
+        host: 监听地址
+        port: 监听端口，0 表示随机端口
+        latency: 每个请求的延迟（秒）
+
+    Returns:
+        ThreadingHTTPServer: 尚未启动的服务
+    """
+    server = ThreadingHTTPServer((host, port), FakeBinanceHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    return server
+
+
+def start_in_thread(server: ThreadingHTTPServer) -> str:
+    """在后台线程中运行服务，返回 base_url"""
+    threading.Thread(target=server.serve_forever, name='fake-binance', daemon=True).start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地币安行情假服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8902)
+    parser.add_argument('--latency', type=float, default=20, help="每个请求的延迟（毫秒）")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency / 1000)
+    print(f"假币安服务: http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+本地 OpenAI 兼容假服务：实现 POST /v1/chat/completions（流式和非流式），用于离线压测
+
+意图识别请求（提示词中带“当前用户输入：”）返回固定格式的 JSON；其他请求返回
+固定长度的文本回答。延迟可配置：--latency 为收到请求到首个 token 的时间，
+--token-interval 为流式输出时相邻片段的间隔。
+
+运行: python -m benchmarks.fake_openai [--port 8901] [--latency 300] [--tokens 200] [--token-interval 10]
+然后以 OPENAI_BASE_URL=http://127.0.0.1:8901/v1 启动应用
+"""
+import re
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# 回答文本的单个片段，流式输出时每个片段作为一个 chunk
+REPLY_PIECE = "行情"
+
+# 意图识别提示词中用户输入的标记
+INTENT_MARKER = "当前用户输入："
+
+_COIN_PATTERN = re.compile(r'[A-Za-z]{2,10}')
+
+
+def intent_reply(prompt: str) -> str:
+    """为意图识别请求生成 JSON 回答：取用户输入中第一个英文单词作为币种"""
+    user_input = prompt.rsplit(INTENT_MARKER, 1)[-1]
+    match = _COIN_PATTERN.search(user_input)
+    return json.dumps({
+        "coin": match.group(0).upper() if match else None,
+        "timeframe": None,
+        "intent": "analyze",
+        "error": None,
+        "confidence": 0.9,
+    }, ensure_ascii=False)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """chat/completions 请求处理器，配置保存在 server 上"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+
+        messages: List[Dict[str, str]] = request.get('messages') or []
+        model = request.get('model', 'fake-model')
+        last = messages[-1].get('content', '') if messages else ''
+        if INTENT_MARKER in last:
+            pieces = [intent_reply(last)]
+        else:
+            pieces = [REPLY_PIECE] * self.server.tokens
+        prompt_tokens = sum(len(m.get('content') or '') for m in messages)
+
+        time.sleep(self.server.latency)
+        if request.get('stream'):
+            self._stream(model, pieces)
+        else:
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(pieces)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                          "total_tokens": prompt_tokens + len(pieces)},
+            })
+
+    def _stream(self, model: str, pieces: List[str]) -> None:
+        """以 SSE 格式逐个输出片段"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8')
+
+        try:
+            self.wfile.write(chunk({"role": "assistant", "content": ""}))
+            for i, piece in enumerate(pieces):
+                if i and self.server.token_interval:
+                    time.sleep(self.server.token_interval)
+                self.wfile.write(chunk({"content": piece}))
+                self.wfile.flush()
+            self.wfile.write(chunk({}, "stop"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def make_server(host: str = '127.0.0.1', port: int = 0, latency: float = 0.3,
+                tokens: int = 200, token_interval: float = 0.01) -> ThreadingHTTPServer:
+    """
+    创建假 OpenAI 服务
+
+    Args:
+        host: 监听地址
+        port: 监听端口，0 表示随机端口
+        latency: 首个 token 前的延迟（秒）
+        tokens: 文本回答的片段数
+        token_interval: 流式片段间隔（秒）
+
+    Returns:
+        ThreadingHTTPServer: 尚未启动的服务
+    """
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.tokens = tokens
+    server.token_interval = token_interval
+    return server
+
+
+def start_in_thread(server: ThreadingHTTPServer) -> str:
+    """在后台线程中运行服务，返回 base_url"""
+    threading.Thread(target=server.serve_forever, name='fake-openai', daemon=True).start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容假服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8901)
+    parser.add_argument('--latency', type=float, default=300, help="首个 token 前的延迟（毫秒）")
+    parser.add_argument('--tokens', type=int, default=200, help="文本回答的片段数")
+    parser.add_argument('--token-interval', type=float, default=10, help="流式片段间隔（毫秒）")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency / 1000, args.tokens, args.token_interval / 1000)
+    print(f"假 OpenAI 服务: http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -91,12 +91,22 @@ def make_celery(flask_app) -> Celery:
         __import__("tasks.sync_tasks")
     except ImportError:
         pass
+    try:
+        __import__("tasks.screener_tasks")
+    except ImportError:
+        pass
 
     celery.conf.beat_schedule = {
         "sync-all-users-history": {
             "task": "tasks.sync_tasks.sync_all_users_history_task",
             "schedule": timedelta(seconds=getattr(config, "CELERY_SYNC_INTERVAL_SECONDS", 300)),
-        }
+        },
+        "refresh-market-screener": {
+            "task": "tasks.screener_tasks.refresh_market_screener_task",
+            "schedule": timedelta(seconds=getattr(config, "SCREENER_REFRESH_INTERVAL", 300)),
+            # 上一轮刷新未结束时丢弃积压的任务
+            "options": {"expires": getattr(config, "SCREENER_REFRESH_INTERVAL", 300)},
+        },
     }
 
     return celery
@@ -12,12 +12,20 @@ API_VERSION_PREFIX = f'/api/{API_VERSION}'
 # OpenAI API配置
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None  # OpenAI兼容接口地址，为空时使用官方地址；压测时指向本地假服务
 OPENAI_TIMEOUT = int(os.getenv('OPENAI_TIMEOUT', '30'))  # API超时时间，默认30秒
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '32'))  # 每个进程同时进行的OpenAI调用数上限
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '32'))  # OpenAI HTTP连接池大小
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '1'))  # SDK内置重试次数
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '6000'))  # 回答请求的提示词token上限
+INTENT_RULES_ENABLED = os.getenv('INTENT_RULES_ENABLED', 'True').lower() == 'true'  # 明确的输入用规则识别意图，跳过OpenAI调用
 
 # 加密货币API配置
 EXCHANGE = os.getenv('EXCHANGE', 'bybit')
 EXCHANGE_API_KEY = os.getenv('EXCHANGE_API_KEY', '')
 EXCHANGE_SECRET = os.getenv('EXCHANGE_SECRET', '')
+BINANCE_API_BASE = os.getenv('BINANCE_API_BASE', 'https://api.binance.com')  # 币安行情API地址；压测时指向本地假服务
+BINANCE_API_FALLBACK = os.getenv('BINANCE_API_FALLBACK', 'https://api1.binance.com')  # 备用API地址
 
 # 应用配置
 DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
@@ -59,6 +67,10 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_SYNC_INTERVAL_SECONDS = int(os.getenv('CELERY_SYNC_INTERVAL_SECONDS', '30'))
 
+# 全市场筛选配置
+SCREENER_REFRESH_INTERVAL = int(os.getenv('SCREENER_REFRESH_INTERVAL', '300'))  # 刷新间隔（秒），由 Celery beat 调度
+SCREENER_REFRESH_IN_PROCESS = os.getenv('SCREENER_REFRESH_IN_PROCESS', 'False').lower() == 'true'  # 没有 Celery beat 的单进程部署时在Web进程内刷新
+
 # 数据库配置
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///coingpt.db')
 
@@ -2,31 +2,32 @@
 """
 核心聊天API接口模块
 """
-from flask import Blueprint, request, jsonify, session, g, Response
+from flask import Blueprint, request, jsonify, session, g, Response, current_app
 import time
 import json
 import os
 import logging
 import traceback
 from functools import wraps
-from openai import OpenAI
 
-# 导入配置和数据库模型
-import config
+# 导入数据库模型
 from models import db
 
 # 导入服务类
-from services.db_service import UserService, SessionService, MessageService, SymbolService
+from services.db_service import SessionService, MessageService, ChatTurn
 from services.auth_service import AppleAuthService
 from services.web_auth_service import WebAuthService
 from services.limit_service import LimitService
+from services.market_screener import get_market_screener
+from services.chat_pipeline import DeferredWrites, prefetch_klines, collect_market_data
 
 # 导入工具类
-from utils.extract import extract_all_info
-from utils.kline import KlineDataFetcher
-from utils.trend_analyzer import TrendAnalyzer
+from utils.extract import extract_all_info, extract_time_window
+from utils.kline import get_kline_fetcher
 from utils.prompt import PromptConstructor
 from utils.intent_extractor import IntentExtractor
+from utils.llm_client import chat_completion, stream_chat_completion
+from utils.answer_cache import answer_cache, make_answer_key, replay_chunks
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -166,6 +167,16 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def _commit_turn(turn: ChatTurn) -> dict:
+    """
+    在一个事务中写入本轮对话尚未提交的变更（AI回复在后台线程中提交）
+    """
+    saved = turn.commit()
+    logger.info(f"会话 {turn.session_id} 写入 {len(saved['message_ids'])} 条消息，"
+                f"数据库耗时 {saved['db_ms']:.1f} ms（本轮累计 {turn.db_ms:.1f} ms）")
+    return saved
+
+
 @chat_bp.route('/', methods=['POST'])
 @token_required
 def chat():
@@ -177,7 +188,7 @@ def chat():
         data = request.get_json()
         user_message = data.get('message', '')
         session_id = data.get('session_id', None)
-        stream = data.get('stream', False)  # 新增流式输出参数
+        stream = data.get('stream', True)  # 默认流式输出，收到第一个token即返回
         user_id = g.user_id
         
         if not user_message:
@@ -215,45 +226,50 @@ def chat():
                     'code': 'MESSAGE_LIMIT_REACHED'
                 }), 403
             
-            # 保存用户消息
-            MessageService.create_message(session_id, "user", user_message)
-            
-            # 更新会话
-            SessionService.touch_session(session_id)
+            # 使用进程内共享的K线数据获取器
+            kline_fetcher = get_kline_fetcher()
             
-            # 如果检测到币种，更新会话最后使用的币种并添加到用户币种偏好
+            # 预取：已识别出的币种在意图提取进行的同时开始获取K线
+            prefetched = {}
             if crypto_info['symbols']:
-                symbol = crypto_info['symbols'][0]  # 取第一个作为主要币种
-                SessionService.update_session_symbol(session_id, symbol)
-                SymbolService.add_symbol_for_user(user_id, symbol)
+                guessed_timeframe = IntentExtractor.map_timeframe_to_system(extract_time_window(user_message))
+                prefetched = prefetch_klines(kline_fetcher, crypto_info['symbols'], guessed_timeframe)
             
-            # 获取会话消息作为上下文
+            # 获取会话消息作为上下文（在保存当前用户消息之前读取，这里直接补到上下文中）
             context = MessageService.get_messages_for_context(session_id, 10)
+            if len(context) < 10:
+                context.append({"role": "user", "content": user_message})
             
-            # 增加用户对话计数
-            UserService.increment_dialog_count(user_id)
+            # 调用大模型前在一个事务中保存用户消息、更新会话和对话计数，
+            # 之后的请求按已保存的消息检查数量限制；AI回复在回答完成后于后台提交
+            turn = ChatTurn(session_id, user_id)
+            turn.record_user_message(user_message, crypto_info['symbols'][0] if crypto_info['symbols'] else None)
+            _commit_turn(turn)
+            writes = DeferredWrites(current_app._get_current_object())
             
             # 格式化对话历史用于意图提取
             # context已经是格式化好的字典列表，直接使用
             conversation_history = context
             
             # 使用意图提取器获取更精确的意图和参数，传入对话历史以支持上下文理解
-            intent_data = IntentExtractor.extract_intent(user_message, conversation_history)
+            # （明确的输入直接按规则识别，不调用OpenAI）
+            intent_data = IntentExtractor.detect_intent(user_message, conversation_history)
 
             # 自动补全逻辑
             # 补全币种
             if not intent_data.get('coin') or intent_data.get('coin') in [None, '', 'null', 'none']:
                 try:
-                    from utils.symbols_sync import get_all_symbols
-                    cached_coins = set(get_all_symbols())
+                    from utils.symbols_sync import get_symbols_snapshot
+                    cached_coins = get_symbols_snapshot().base_coins
                 except Exception:
-                    cached_coins = set()
+                    cached_coins = ()
                 for msg in reversed(conversation_history):
                     if msg['role'] == 'user':
                         # 用缓存币种信息智能提取
+                        content = msg['content'].upper()
                         for coin in cached_coins:
-                            if coin and coin.upper() in msg['content'].upper():
-                                intent_data['coin'] = coin.upper()
+                            if coin and coin in content:
+                                intent_data['coin'] = coin
                                 break
                         if intent_data.get('coin'):
                             break
@@ -264,8 +280,8 @@ def chat():
             if not intent_data.get('intent') or intent_data.get('intent') in [None, '', 'null', 'none']:
                 intent_data['intent'] = 'chat'
             
-            # 获取传统提取的信息作为补充
-            extracted_info = extract_all_info(user_message)
+            # 获取传统提取的信息作为补充（与上面的 crypto_info 是同一条消息，直接复用）
+            extracted_info = crypto_info
             
             # 合并两种方法提取的信息
             symbols = []
@@ -297,82 +313,98 @@ def chat():
             # 检查是否为普通聊天模式
             is_chat_mode = intent == "chat" or not symbols
             
-            # 只有当非聊天模式且检测到币种时才执行分析
+            # 只有当非聊天模式且检测到币种时才执行分析（所有币种并行获取，复用预取的K线）
             if not is_chat_mode and symbols:
-                for symbol in symbols:
-                    # 确保币种符号格式正确
-                    if '/' not in symbol:
-                        symbol_key = f"{symbol}/USDT"
-                    else:
-                        symbol_key = symbol
-                        
-                    # 初始化K线数据获取器
-                    kline_fetcher = KlineDataFetcher()
-                    # 获取K线数据
-                    kline_data = kline_fetcher.get_klines(symbol_key, timeframe)
-                    
-                    if not kline_data.empty:
-                        # 分析趋势
-                        analysis = TrendAnalyzer.analyze_trend(kline_data)
-                        
-                        # 存储结果
-                        price_data[symbol_key] = kline_data
-                        analysis_results[symbol] = analysis
+                price_data, analysis_results = collect_market_data(
+                    kline_fetcher, symbols, timeframe, intent, prefetched)
             
-            # 构造GPT消息
-            gpt_messages = PromptConstructor.construct_messages(
-                user_message, 
-                final_extracted_info,  # 使用合并后的提取信息
-                analysis_results, 
-                price_data,
-                context
-            )
+            # 分析/交易意图但没有指定币种时，使用全市场筛选结果（读取预先计算的快照）
+            market_screen = None
+            if intent in ('analyze', 'trade') and not symbols:
+                try:
+                    market_screen = get_market_screener().overview(timeframe)
+                except Exception as e:
+                    logger.error(f"获取全市场筛选结果失败: {str(e)}")
+            
+            # 同一根K线内相同的分析/价格问题直接复用回答（交易建议和有对话历史的问题不缓存）
+            answer_key = make_answer_key(intent, price_data.keys(), timeframe, price_data, user_message, context)
+            cached_answer = answer_cache.get(answer_key)
             
-            # 调用OpenAI API
-            client = OpenAI(api_key=config.OPENAI_API_KEY)
+            # 构造GPT消息（在token预算内，超出时先压缩较早的对话）
+            gpt_messages, prompt_stats = [], {'tokens': 0}
+            if cached_answer is None:
+                gpt_messages, prompt_stats = PromptConstructor.build_prompt(
+                    user_message, 
+                    final_extracted_info,  # 使用合并后的提取信息
+                    analysis_results, 
+                    price_data,
+                    context,
+                    market_screen=market_screen
+                )
             
+            # 调用OpenAI API（共享的客户端和连接池，带超时和并发限制）
             # 如果请求流式输出
             if stream:
-                # 使用流式输出模式调用API
+                # 使用流式输出模式调用API，命中缓存时回放缓存的回答
                 def generate():
                     full_response = ""
-                    stream_response = client.chat.completions.create(
-                        model=config.OPENAI_MODEL,
-                        messages=gpt_messages,
-                        stream=True
-                    )
-                    for chunk in stream_response:
-                        content = chunk.choices[0].delta.content
-                        if content is not None:
+                    chunks = replay_chunks(cached_answer) if cached_answer is not None \
+                        else stream_chat_completion(gpt_messages)
+                    try:
+                        for content in chunks:
+                            # 返回SSE格式数据，第一个事件带上会话ID（新建会话的客户端据此继续对话）
+                            event = {'content': content, 'done': False}
+                            if not full_response:
+                                event['session_id'] = session_id
                             full_response += content
-                            # 返回SSE格式数据
-                            yield f"data: {json.dumps({'content': content, 'done': False})}\n\n"
+                            yield f"data: {json.dumps(event)}\n\n"
+                    except Exception as e:
+                        logger.error(f"流式调用OpenAI失败: {str(e)}")
+                        yield f"data: {json.dumps({'content': '', 'done': True, 'error': str(e), 'session_id': session_id})}\n\n"
+                        return
                     
-                    # 完成后保存到数据库
-                    message = MessageService.create_message(session_id, "assistant", full_response)
+                    if cached_answer is None:
+                        answer_cache.set(answer_key, full_response)
                     
-                    # 发送完成信号，包含消息ID
-                    yield f"data: {json.dumps({'content': '', 'done': True, 'message_id': message.id})}\n\n"
+                    # 完成后保存AI回复
+                    turn.add_message("assistant", full_response)
+                    try:
+                        saved = writes.submit(_commit_turn, turn).result()
+                    except Exception as e:
+                        yield f"data: {json.dumps({'content': '', 'done': True, 'error': f'保存回复失败: {str(e)}', 'session_id': session_id})}\n\n"
+                        return
+                    
+                    # 发送完成信号，包含会话ID、消息ID和本轮数据库耗时
+                    done = {'content': '', 'done': True, 'session_id': session_id,
+                            'message_id': saved['message_ids']['assistant'],
+                            'prompt_tokens': prompt_stats['tokens'], 'cached': cached_answer is not None,
+                            'db_ms': round(turn.db_ms, 1)}
+                    yield f"data: {json.dumps(done)}\n\n"
                 
-                # 返回流式响应
-                return Response(generate(), mimetype='text/event-stream')
+                # 返回流式响应（关闭代理缓冲，让第一个token立即送达客户端）
+                return Response(generate(), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
             
             # 非流式输出模式
             else:
-                response = client.chat.completions.create(
-                    model=config.OPENAI_MODEL,
-                    messages=gpt_messages
-                )
+                if cached_answer is None:
+                    response = chat_completion(gpt_messages)
+                    ai_message = response.choices[0].message.content
+                    answer_cache.set(answer_key, ai_message)
+                else:
+                    ai_message = cached_answer
                 
-                # 将AI回复添加到上下文并保存到数据库
-                ai_message = response.choices[0].message.content
-                MessageService.create_message(session_id, "assistant", ai_message)
+                # 在后台保存AI回复，耗时记录在日志中
+                turn.add_message("assistant", ai_message)
+                writes.submit(_commit_turn, turn)
                 
                 # 返回AI回复
                 return jsonify({
                     'status': 'success',
                     'message': ai_message,
-                    'session_id': session_id
+                    'session_id': session_id,
+                    'prompt_tokens': prompt_stats['tokens'],
+                    'cached': cached_answer is not None
                 })
         
         except Exception as e:
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+市场数据 API 路由
+"""
+from flask import Blueprint, request, jsonify
+import logging
+import traceback
+
+from routes.chat_routes import token_required
+from services.market_screener import get_market_screener, SCREENER_QUERIES
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+market_bp = Blueprint('market', __name__, url_prefix='/api/market')
+
+
+@market_bp.route('/screener', methods=['GET'])
+@token_required
+def screener():
+    """
+    全市场筛选
+
+    Query Parameters:
+        query: 筛选条件，如 oversold / overbought / golden_cross / death_cross /
+               top_gainers / top_losers / top_movers / ma_bullish / ma_bearish
+        interval: 时间周期，默认 1h
+        limit: 返回数量，默认 20，最大 100
+
+    Returns:
+        {
+            "status": "success",
+            "data": {
+                "query": "oversold",
+                "interval": "1h",
+                "ready": true,
+                "updated_at": 1700000000.0,
+                "total": 12,
+                "results": [
+                    {"symbol": "XXXUSDT", "price": 1.23, "change_24h": -8.5, "rsi": 22.1, ...}
+                ]
+            }
+        }
+    """
+    try:
+        query = request.args.get('query', 'top_movers')
+        interval = request.args.get('interval', '1h')
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+
+        if query not in SCREENER_QUERIES:
+            return jsonify({
+                'status': 'error',
+                'message': f"不支持的筛选条件: {query}",
+                'queries': SCREENER_QUERIES
+            }), 400
+
+        result = get_market_screener().query(query, interval, limit)
+
+        return jsonify({
+            'status': 'success',
+            'data': result
+        })
+
+    except Exception as e:
+        logger.error(f"全市场筛选失败: {e}")
+        traceback.print_exc()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
@@ -8,7 +8,7 @@ import traceback
 
 from services.trading_service import TradingService
 from routes.chat_routes import token_required
-from utils.symbols_sync import get_all_symbols
+from utils.symbols_sync import get_symbols_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -99,11 +99,12 @@ def create_order():
                 # 限价单使用指定价格
                 price = float(data['price'])
             else:
-                # 市价单需要获取当前市场价格
+                # 市价单需要获取当前市场价格（不使用缓存，按最新价格计算数量）
                 ticker = TradingService.get_ticker(
                     user_id=user_id,
                     symbol=data['symbol'],
-                    exchange_name=data.get('exchange')
+                    exchange_name=data.get('exchange'),
+                    use_cache=False
                 )
                 price = float(ticker.get('last_price', 0))
                 if price == 0:
@@ -526,11 +527,10 @@ def get_symbols():
     try:
         return_type = request.args.get('type', 'all')
         
-        # 获取基础币种
-        base_symbols = get_all_symbols()
-        
-        # 生成交易对（所有币种 + USDT）
-        trading_pairs = [f"{symbol}USDT" for symbol in base_symbols]
+        # 获取基础币种及预先生成的交易对（所有币种 + USDT）
+        snapshot = get_symbols_snapshot()
+        base_symbols = snapshot.base_coins
+        trading_pairs = snapshot.trading_pairs
         
         # 根据type参数返回不同内容
         if return_type == 'base':
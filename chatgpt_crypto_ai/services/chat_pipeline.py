@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+聊天请求的分阶段流水线
+
+chat() 原先严格串行：数据库写入 -> 意图提取（OpenAI） -> 逐个币种获取K线并分析 -> 回答。
+这里把不互相依赖的步骤并行化：
+
+1. 预取：extract_all_info 已识别出的币种在意图提取进行的同时开始获取K线；
+2. 扇出：意图确定后，所有币种的K线、多周期数据、回测和行情并行获取，
+   请求线程只等待结果并做（带缓存的）分析计算；
+3. 延后写入：用户消息、会话更新和对话计数在调用大模型前用一个事务提交
+   （ChatTurn），AI回复在回答完成后于后台线程中提交，不阻塞首个 token 的返回。
+"""
+import os
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from utils.backtest import backtest_all_rules
+from utils.resample import multi_timeframe_arrays, MULTI_TIMEFRAMES
+from utils.trend_analyzer import TrendAnalyzer
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('chat_pipeline')
+
+# 市场数据获取线程数（主要是等待币安响应的I/O）
+PIPELINE_WORKERS = 16
+
+# 后台数据库写入线程数
+DB_WRITE_WORKERS = 4
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_pid: Optional[int] = None
+_executors_lock = threading.Lock()
+
+
+def _get_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """获取进程内共享的线程池（懒加载，fork 后在子进程中重新创建）"""
+    global _executors_pid
+
+    pid = os.getpid()
+    executor = _executors.get(name)
+    if executor is not None and _executors_pid == pid:
+        return executor
+
+    with _executors_lock:
+        if _executors_pid != pid:
+            _executors.clear()
+            _executors_pid = pid
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"chat-{name}")
+        return _executors[name]
+
+
+def get_pipeline_executor() -> ThreadPoolExecutor:
+    """获取市场数据获取线程池"""
+    return _get_executor('data', PIPELINE_WORKERS)
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """获取后台数据库写入线程池"""
+    return _get_executor('db', DB_WRITE_WORKERS)
+
+
+class DeferredWrites:
+    """
+    一次对话中的后台数据库写入
+
+    写入按提交顺序依次执行（后一个写入在前一个完成后才开始），每个写入都在
+    Flask 应用上下文中运行。失败只记录日志，不影响后续写入。
+    """
+
+    def __init__(self, app, executor: Optional[ThreadPoolExecutor] = None):
+        """
+        Args:
+            app: Flask 应用对象（current_app._get_current_object()）
+            executor: 执行写入的线程池，默认使用共享的数据库写入线程池
+        """
+        self._app = app
+        self._executor = executor or get_db_executor()
+        self._last: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args) -> Future:
+        """
+        提交一个写入
+
+        Args:
+            fn: 写入函数（在应用上下文中调用）
+            *args: 传给写入函数的参数
+
+        Returns:
+            Future: 写入函数的返回值
+        """
+        result = Future()
+
+        def run():
+            try:
+                with self._app.app_context():
+                    result.set_result(fn(*args))
+            except Exception as e:
+                logger.error(f"后台数据库写入失败 {getattr(fn, '__name__', fn)}: {str(e)}")
+                result.set_exception(e)
+
+        with self._lock:
+            previous, self._last = self._last, result
+
+        if previous is None:
+            self._executor.submit(run)
+        else:
+            previous.add_done_callback(lambda _: self._executor.submit(run))
+        return result
+
+
+def _result(future: Optional[Future], default: Any, label: str) -> Any:
+    """获取后台任务结果，失败时记录日志并返回默认值"""
+    if future is None:
+        return default
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error(f"{label} 失败: {str(e)}")
+        return default
+
+
+def to_symbol_key(symbol: str) -> str:
+    """把币种转换为K线获取使用的交易对格式，如 BTC -> BTC/USDT"""
+    return symbol if '/' in symbol else f"{symbol}/USDT"
+
+
+def prefetch_klines(fetcher, symbols: Iterable[str], timeframe: str) -> Dict[Tuple[str, str], Future]:
+    """
+    在意图提取进行的同时预取K线
+
+    Args:
+        fetcher: KlineDataFetcher
+        symbols: 已识别的币种
+        timeframe: 预计使用的时间周期
+
+    Returns:
+        Dict[(symbol_key, timeframe), Future]: 预取任务，交给 collect_market_data 复用
+    """
+    executor = get_pipeline_executor()
+    return {
+        (key, timeframe): executor.submit(fetcher.get_klines, key, timeframe)
+        for key in dict.fromkeys(to_symbol_key(symbol) for symbol in symbols)
+    }
+
+
+def collect_market_data(fetcher, symbols: Iterable[str], timeframe: str, intent: str,
+                        prefetched: Optional[Dict[Tuple[str, str], Future]] = None
+                        ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Dict[str, Any]]]:
+    """
+    并行获取所有币种的市场数据并分析
+
+    Args:
+        fetcher: KlineDataFetcher
+        symbols: 最终确定的币种
+        timeframe: 时间周期
+        intent: 意图（monitor 附带24小时行情，analyze/trade 附带多周期汇总，trade 附带回测）
+        prefetched: prefetch_klines 返回的预取任务
+
+    Returns:
+        Tuple[Dict, Dict]: (交易对到K线DataFrame的映射, 币种到分析结果的映射)
+    """
+    executor = get_pipeline_executor()
+    prefetched = prefetched or {}
+    symbol_keys = {symbol: to_symbol_key(symbol) for symbol in symbols}
+    keys = list(dict.fromkeys(symbol_keys.values()))
+
+    # 所有网络请求同时发出
+    klines = {key: prefetched.get((key, timeframe)) or executor.submit(fetcher.get_klines, key, timeframe)
+              for key in keys}
+    tickers = executor.submit(fetcher.get_current_prices, keys) if intent == 'monitor' else None
+    frames = {}
+    if intent in ('analyze', 'trade'):
+        frames = {key: executor.submit(multi_timeframe_arrays, fetcher, key, MULTI_TIMEFRAMES) for key in keys}
+    backtests = {}
+    if intent == 'trade':
+        backtests = {key: executor.submit(backtest_all_rules, key.replace('/', ''), timeframe, fetcher)
+                     for key in keys}
+
+    price_data = {}
+    analysis_results = {}
+    ticker_data = _result(tickers, {}, "获取24小时行情")
+    for symbol, key in symbol_keys.items():
+        kline_data = _result(klines[key], pd.DataFrame(), f"获取 {key} K线")
+        if kline_data.empty:
+            continue
+
+        # 分析趋势（同一根K线内的重复请求直接复用缓存结果）
+        analysis = TrendAnalyzer.analyze_trend_cached(key, timeframe, kline_data)
+        ticker = ticker_data.get(key.replace('/', ''))
+        if ticker:
+            analysis['ticker_24h'] = ticker
+
+        if 'error' not in analysis:
+            # 一次基础周期请求聚合出的多周期趋势汇总
+            if key in frames:
+                frame = _result(frames[key], None, f"多周期分析 {key}")
+                if frame is not None:
+                    analysis['multi_timeframe'] = TrendAnalyzer.analyze_timeframes(frame)
+            # 信号规则在本地K线上的回测表现（按交易对/周期/规则缓存）
+            if key in backtests:
+                backtest = _result(backtests[key], None, f"回测 {key}")
+                if backtest is not None:
+                    analysis['backtest'] = backtest
+
+        price_data[key] = kline_data
+        analysis_results[symbol] = analysis
+
+    return price_data, analysis_results
@@ -2,6 +2,7 @@
 """
 数据库服务模块 - 提供数据库操作的高级API
 """
+import time
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 
@@ -266,3 +267,97 @@ class SymbolService:
         """获取用户最近使用的币种"""
         symbols = UserSymbol.query.filter_by(user_id=user_id).order_by(UserSymbol.added_at.desc()).limit(limit).all()
         return [symbol.symbol for symbol in symbols]
+
+
+class ChatTurn:
+    """
+    一次对话的数据库写入（unit of work）
+    
+    变更先记在内存中，commit() 时在一个事务中写入尚未提交的部分：插入消息、
+    用一条 UPDATE 更新会话时间和最后使用的币种、添加用户币种偏好、
+    用原子的 UPDATE dialog_count = dialog_count + 1 增加对话计数。
+    不再逐项 query.get 后单独提交。
+    
+    一次对话提交两次：调用大模型前提交用户消息、会话更新和对话计数
+    （消息数量限制按已保存的消息计算），回答完成后提交AI回复。
+    """
+    
+    def __init__(self, session_id: int, user_id: int):
+        """
+        Args:
+            session_id: 会话ID
+            user_id: 用户ID
+        """
+        self.session_id = session_id
+        self.user_id = user_id
+        self._messages: List[Message] = []
+        self._symbol: Optional[str] = None
+        self._touch_session = False
+        self._count_dialog = False
+        self.db_ms = 0.0
+    
+    def add_message(self, role: str, content: str) -> None:
+        """记录一条消息（创建时间取记录时刻，保证消息顺序）"""
+        self._messages.append(Message(
+            session_id=self.session_id,
+            role=role,
+            content=content,
+            created_at=datetime.utcnow()
+        ))
+    
+    def record_user_message(self, content: str, symbol: Optional[str] = None) -> None:
+        """
+        记录用户消息，提交时同时更新会话时间和币种、用户币种偏好并增加对话计数
+        
+        Args:
+            content: 用户消息
+            symbol: 本轮识别出的币种（可选）
+        """
+        self.add_message("user", content)
+        self._symbol = symbol or None
+        self._touch_session = True
+        self._count_dialog = True
+    
+    def commit(self) -> Dict[str, Any]:
+        """
+        在一个事务中写入尚未提交的变更，失败时回滚并抛出异常
+        
+        Returns:
+            Dict[str, Any]: message_ids（本次提交的角色到消息ID的映射）和
+            db_ms（本次提交的数据库耗时，毫秒；db_ms 属性为本轮累计耗时）
+        """
+        start = time.perf_counter()
+        try:
+            db.session.add_all(self._messages)
+            
+            if self._touch_session:
+                values = {Session.updated_at: datetime.utcnow()}
+                if self._symbol:
+                    values[Session.last_symbol] = self._symbol
+                Session.query.filter_by(id=self.session_id).update(values, synchronize_session=False)
+            
+            if self._symbol:
+                exists = db.session.query(UserSymbol.id).filter_by(user_id=self.user_id, symbol=self._symbol).first()
+                if not exists:
+                    db.session.add(UserSymbol(user_id=self.user_id, symbol=self._symbol))
+            
+            if self._count_dialog:
+                User.query.filter_by(id=self.user_id).update(
+                    {User.dialog_count: User.dialog_count + 1}, synchronize_session=False
+                )
+            
+            # 提交前读取消息ID，提交后对象会过期
+            db.session.flush()
+            message_ids = {message.role: message.id for message in self._messages}
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        self._messages = []
+        self._symbol = None
+        self._touch_session = self._count_dialog = False
+        
+        elapsed = (time.perf_counter() - start) * 1000
+        self.db_ms += elapsed
+        return {'message_ids': message_ids, 'db_ms': elapsed}
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+全市场筛选服务：持续维护所有USDT交易对的技术指标，查询时直接读取预先排好序的索引
+
+Celery beat 定时执行 tasks.screener_tasks 刷新每个时间周期的数据：K线通过 KlineDataFetcher 增量获取
+（本地存储只拉取新K线），指标由指标引擎按长度分组批量计算，24小时涨跌幅来自批量 ticker/24hr 请求。
+刷新完成后快照原子写入共享目录，各Web进程按文件mtime重新加载，查询只是切片，不会触发任何网络请求。
+没有 Celery beat 的单进程部署可设置 SCREENER_REFRESH_IN_PROCESS，在进程内启动后台刷新线程。
+"""
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import config
+from utils.indicators import compute_indicators_batch, TREND_MA_WINDOWS
+from utils.kline import get_kline_fetcher
+from utils.kline_store import KlineArrays
+from utils.symbols_sync import get_trading_pairs
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('market_screener')
+
+# 默认维护的时间周期
+SCREENER_INTERVALS = ('1h', '4h', '1d')
+
+# 可按需加入维护的时间周期
+SUPPORTED_INTERVALS = ('15m', '30m', '1h', '2h', '4h', '6h', '12h', '1d', '1w')
+
+# 刷新间隔（秒）
+SCREENER_REFRESH_INTERVAL = config.SCREENER_REFRESH_INTERVAL
+
+# 超过该时长（秒）未刷新的快照视为过期（刷新任务停止时不再返回旧数据）
+SNAPSHOT_MAX_AGE = SCREENER_REFRESH_INTERVAL * 3
+
+# 快照共享目录
+SCREENER_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "screener")
+
+# 每个交易对参与计算的K线数量，与聊天分析一致
+SCREENER_KLINE_LIMIT = 100
+
+# 计算指标所需的最少K线数量
+MIN_KLINES = 35
+
+# 支持的筛选条件及说明
+SCREENER_QUERIES = {
+    'oversold': "RSI超卖（<30）",
+    'overbought': "RSI超买（>70）",
+    'golden_cross': "MACD金叉",
+    'death_cross': "MACD死叉",
+    'top_gainers': "24小时涨幅榜",
+    'top_losers': "24小时跌幅榜",
+    'top_movers': "24小时波动榜",
+    'ma_bullish': "均线多头排列",
+    'ma_bearish': "均线空头排列",
+}
+
+
+class ScreenerSnapshot(NamedTuple):
+    """
+    某个时间周期的筛选快照
+    """
+    interval: str
+    updated_at: float
+    rows: Mapping[str, Dict[str, Any]]   # 交易对 -> 指标
+    indexes: Dict[str, Tuple[str, ...]]  # 筛选条件 -> 排好序的交易对
+
+
+def _nan_to_none(value: float) -> Optional[float]:
+    return None if value is None or np.isnan(value) else float(value)
+
+
+class MarketScreener:
+    """
+    全市场筛选器
+    """
+
+    def __init__(self, fetcher=None, intervals: Iterable[str] = SCREENER_INTERVALS,
+                 refresh_interval: float = SCREENER_REFRESH_INTERVAL, limit: int = SCREENER_KLINE_LIMIT,
+                 base_dir: str = SCREENER_CACHE_DIR):
+        """
+        Args:
+            fetcher: K线数据获取器，默认使用进程内共享的实例
+            intervals: 维护的时间周期
+            refresh_interval: 后台刷新间隔（秒）
+            limit: 每个交易对参与计算的K线数量
+            base_dir: 快照共享目录
+        """
+        self._fetcher = fetcher
+        self.intervals = list(intervals)
+        self.refresh_interval = refresh_interval
+        self.limit = limit
+        self.base_dir = base_dir
+        self._snapshots: Dict[str, ScreenerSnapshot] = {}
+        # 已加载的快照文件mtime: interval -> mtime
+        self._snapshot_mtimes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    @property
+    def fetcher(self):
+        """K线数据获取器（只读快照的Web进程不会创建）"""
+        if self._fetcher is None:
+            self._fetcher = get_kline_fetcher()
+        return self._fetcher
+
+    @staticmethod
+    def usdt_pairs() -> List[str]:
+        """当前所有处于交易状态的USDT交易对"""
+        pairs = get_trading_pairs()
+        return sorted(
+            symbol for symbol, info in pairs.items()
+            if info.get('quoteAsset') == 'USDT' and info.get('status', 'TRADING') == 'TRADING'
+        )
+
+    def refresh(self, interval: str) -> ScreenerSnapshot:
+        """
+        重新计算某个时间周期的全市场指标并替换快照
+
+        Args:
+            interval: 时间周期
+
+        Returns:
+            ScreenerSnapshot: 新快照
+        """
+        started = time.time()
+        pairs = self.usdt_pairs()
+
+        def fetch(symbol: str) -> KlineArrays:
+            # 单个交易对失败时跳过，不影响整个周期的刷新
+            try:
+                return self.fetcher.get_kline_arrays(symbol, interval, self.limit)
+            except Exception as e:
+                logger.error(f"全市场筛选获取 {symbol} {interval} K线失败: {str(e)}")
+                return KlineArrays.empty()
+
+        # 并发获取K线（本地存储命中时只拉取新K线）
+        with ThreadPoolExecutor(max_workers=self.fetcher.max_batch_workers) as executor:
+            arrays = dict(zip(pairs, executor.map(fetch, pairs)))
+
+        tickers = {}
+        try:
+            tickers = self.fetcher.get_current_prices(pairs)
+        except Exception as e:
+            logger.error(f"获取24小时行情失败: {str(e)}")
+
+        rows = self._compute_rows(arrays, tickers)
+        snapshot = ScreenerSnapshot(
+            interval=interval,
+            updated_at=time.time(),
+            rows=rows,
+            indexes=self._build_indexes(rows),
+        )
+        with self._lock:
+            self._snapshots[interval] = snapshot
+        self._save_snapshot(snapshot)
+        logger.info(f"全市场筛选 {interval} 刷新完成: {len(rows)}/{len(pairs)} 个交易对，耗时 {time.time() - started:.1f}s")
+        return snapshot
+
+    def _compute_rows(self, arrays: Dict[str, Any], tickers: Dict[str, Dict]) -> Dict[str, Dict[str, Any]]:
+        """按K线长度分组批量计算指标，生成每个交易对的指标行"""
+        groups: Dict[int, List[str]] = {}
+        for symbol, series in arrays.items():
+            if len(series) >= MIN_KLINES:
+                groups.setdefault(len(series), []).append(symbol)
+
+        rows = {}
+        for length, symbols in groups.items():
+            closes = [arrays[symbol].close for symbol in symbols]
+            indicators = compute_indicators_batch(closes, length, ma_windows=TREND_MA_WINDOWS)
+            close = np.vstack(closes)
+            hist = indicators.macd_hist
+            ma7, ma25, ma99 = (indicators.latest(f'ma{window}') for window in TREND_MA_WINDOWS)
+            rsi = indicators.latest('rsi')
+
+            for i, symbol in enumerate(symbols):
+                last_close = float(close[i, -1])
+                ticker = tickers.get(symbol)
+                if hist[i, -1] > 0 and hist[i, -2] <= 0:
+                    macd_cross = 'golden'
+                elif hist[i, -1] < 0 and hist[i, -2] >= 0:
+                    macd_cross = 'death'
+                else:
+                    macd_cross = None
+                if ma7[i] > ma25[i] > ma99[i]:
+                    ma_trend = 'bullish'
+                elif ma7[i] < ma25[i] < ma99[i]:
+                    ma_trend = 'bearish'
+                else:
+                    ma_trend = None
+
+                rows[symbol] = {
+                    'symbol': symbol,
+                    'price': ticker['price'] if ticker else last_close,
+                    'change_24h': ticker['24h_change'] if ticker else None,
+                    'quote_volume_24h': ticker['24h_quote_volume'] if ticker else None,
+                    'candle_change': (last_close / float(close[i, -2]) - 1) * 100,
+                    'rsi': _nan_to_none(rsi[i]),
+                    'macd_hist': _nan_to_none(hist[i, -1]),
+                    'macd_cross': macd_cross,
+                    'ma_trend': ma_trend,
+                }
+        return rows
+
+    @staticmethod
+    def _build_indexes(rows: Dict[str, Dict[str, Any]]) -> Dict[str, Tuple[str, ...]]:
+        """为每个筛选条件生成排好序的交易对列表"""
+        symbols = np.array(list(rows), dtype=object)
+        if not len(symbols):
+            return {query: () for query in SCREENER_QUERIES}
+
+        def column(name: str) -> np.ndarray:
+            return np.array([np.nan if rows[s][name] is None else rows[s][name] for s in symbols], dtype=np.float64)
+
+        rsi = column('rsi')
+        change = column('change_24h')
+        # 没有24小时行情时用最后一根K线的涨跌幅排序
+        change = np.where(np.isnan(change), column('candle_change'), change)
+        hist_strength = column('macd_hist') / column('price')
+        cross = np.array([rows[s]['macd_cross'] for s in symbols], dtype=object)
+        ma_trend = np.array([rows[s]['ma_trend'] for s in symbols], dtype=object)
+
+        def ordered(mask: np.ndarray, key: np.ndarray) -> Tuple[str, ...]:
+            idx = np.flatnonzero(mask)
+            return tuple(symbols[idx[np.argsort(key[idx], kind='stable')]])
+
+        valid_change = ~np.isnan(change)
+        return {
+            'oversold': ordered(rsi < 30, rsi),
+            'overbought': ordered(rsi > 70, -rsi),
+            'golden_cross': ordered(cross == 'golden', -hist_strength),
+            'death_cross': ordered(cross == 'death', hist_strength),
+            'top_gainers': ordered(valid_change, -change),
+            'top_losers': ordered(valid_change, change),
+            'top_movers': ordered(valid_change, -np.abs(change)),
+            'ma_bullish': ordered(ma_trend == 'bullish', -change),
+            'ma_bearish': ordered(ma_trend == 'bearish', change),
+        }
+
+    def _snapshot_path(self, interval: str) -> str:
+        """获取快照文件路径"""
+        return os.path.join(self.base_dir, f"{interval}.json")
+
+    def _save_snapshot(self, snapshot: ScreenerSnapshot) -> None:
+        """原子写入快照文件（先写临时文件再重命名），供其他进程读取"""
+        path = self._snapshot_path(snapshot.interval)
+        try:
+            os.makedirs(self.base_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, prefix=f".{snapshot.interval}.", suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot._asdict(), f)
+            os.replace(tmp_path, path)
+            self._snapshot_mtimes[snapshot.interval] = os.stat(path).st_mtime_ns
+        except Exception as e:
+            logger.error(f"保存全市场筛选快照失败 {path}: {str(e)}")
+
+    def _load_snapshot(self, interval: str) -> Optional[ScreenerSnapshot]:
+        """快照文件有更新时重新加载，否则返回内存中的快照"""
+        path = self._snapshot_path(interval)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return self._snapshots.get(interval)
+
+        if self._snapshot_mtimes.get(interval) == mtime:
+            return self._snapshots.get(interval)
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            snapshot = ScreenerSnapshot(
+                interval=data['interval'],
+                updated_at=data['updated_at'],
+                rows=data['rows'],
+                indexes={query: tuple(symbols) for query, symbols in data['indexes'].items()},
+            )
+        except Exception as e:
+            logger.error(f"读取全市场筛选快照失败 {path}: {str(e)}")
+            return self._snapshots.get(interval)
+
+        with self._lock:
+            self._snapshots[interval] = snapshot
+            self._snapshot_mtimes[interval] = mtime
+        return snapshot
+
+    def get_snapshot(self, interval: str) -> Optional[ScreenerSnapshot]:
+        """
+        获取某个时间周期的快照（读取共享快照文件）；进程内刷新时，该周期未被维护则加入维护列表并唤醒后台刷新
+
+        Returns:
+            Optional[ScreenerSnapshot]: 快照，尚未完成首次刷新或已过期时为None
+        """
+        snapshot = self._load_snapshot(interval)
+        if snapshot is not None and time.time() - snapshot.updated_at > SNAPSHOT_MAX_AGE:
+            snapshot = None
+        if snapshot is None and interval in SUPPORTED_INTERVALS and self._refresh_thread is not None:
+            with self._lock:
+                if interval not in self.intervals:
+                    self.intervals.append(interval)
+            self._wakeup.set()
+        return snapshot
+
+    def refresh_all(self) -> None:
+        """依次刷新所有维护的时间周期，单个周期失败不影响其他周期"""
+        for interval in list(self.intervals):
+            if self._refresh_stop.is_set():
+                break
+            try:
+                self.refresh(interval)
+            except Exception as e:
+                logger.error(f"全市场筛选 {interval} 刷新失败: {str(e)}")
+
+    def query(self, query: str, interval: str = '1h', limit: int = 20) -> Dict[str, Any]:
+        """
+        查询筛选结果
+
+        Args:
+            query: 筛选条件，见 SCREENER_QUERIES
+            interval: 时间周期
+            limit: 返回数量
+
+        Returns:
+            Dict: 包含 ready、updated_at 和 results 的结果
+        """
+        if query not in SCREENER_QUERIES:
+            raise ValueError(f"不支持的筛选条件: {query}")
+
+        snapshot = self.get_snapshot(interval)
+        if snapshot is None:
+            return {'query': query, 'interval': interval, 'ready': False, 'updated_at': None, 'results': []}
+
+        symbols = snapshot.indexes[query][:max(limit, 0)]
+        return {
+            'query': query,
+            'interval': interval,
+            'ready': True,
+            'updated_at': snapshot.updated_at,
+            'total': len(snapshot.indexes[query]),
+            'results': [snapshot.rows[symbol] for symbol in symbols],
+        }
+
+    def overview(self, interval: str = '1h', limit: int = 5,
+                 queries: Iterable[str] = ('top_gainers', 'top_losers', 'oversold', 'overbought', 'golden_cross')
+                 ) -> Optional[Dict[str, Any]]:
+        """
+        市场概览：多个筛选条件的前几名
+
+        Returns:
+            Optional[Dict]: 筛选条件到结果列表的映射，快照尚未就绪时为None
+        """
+        snapshot = self.get_snapshot(interval)
+        if snapshot is None:
+            return None
+        return {
+            'interval': interval,
+            'updated_at': snapshot.updated_at,
+            'labels': {query: SCREENER_QUERIES[query] for query in queries},
+            'results': {query: [snapshot.rows[s] for s in snapshot.indexes[query][:limit]] for query in queries},
+        }
+
+    def start(self) -> None:
+        """启动后台刷新线程（幂等）"""
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+
+        def refresh_loop():
+            while not self._refresh_stop.is_set():
+                self.refresh_all()
+                self._wakeup.wait(self.refresh_interval)
+                self._wakeup.clear()
+
+        self._refresh_stop.clear()
+        self._refresh_thread = threading.Thread(target=refresh_loop, name='market-screener', daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        """停止后台刷新线程"""
+        self._refresh_stop.set()
+        self._wakeup.set()
+
+
+_shared_screener: Optional[MarketScreener] = None
+_shared_screener_pid: Optional[int] = None
+_shared_screener_lock = threading.Lock()
+
+
+def get_market_screener() -> MarketScreener:
+    """
+    获取进程内共享的全市场筛选器（懒加载）
+
+    默认只读取 Celery beat 刷新的共享快照；设置 SCREENER_REFRESH_IN_PROCESS 时首次调用启动进程内后台刷新。
+
+    Returns:
+        MarketScreener: 共享的筛选器实例
+    """
+    global _shared_screener, _shared_screener_pid
+
+    pid = os.getpid()
+    if _shared_screener is not None and _shared_screener_pid == pid:
+        return _shared_screener
+
+    with _shared_screener_lock:
+        if _shared_screener is None or _shared_screener_pid != pid:
+            screener = MarketScreener()
+            if config.SCREENER_REFRESH_IN_PROCESS:
+                screener.start()
+            _shared_screener = screener
+            _shared_screener_pid = pid
+    return _shared_screener
@@ -8,6 +8,7 @@ import logging
 from exchanges.exchange_factory import ExchangeFactory
 from exchanges.base_exchange import BaseExchange, OrderSide, PositionSide
 import config
+from utils.kline import ticker_cache
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +19,9 @@ class TradingService:
     # 缓存交易所实例（按用户ID缓存）
     _exchange_instances: Dict[str, BaseExchange] = {}
     
+    # 用户API Key所在的网络（是否测试网），行情缓存命中时无需查库和解密
+    _user_networks: Dict[str, bool] = {}
+    
     @classmethod
     def clear_user_cache(cls, user_id: int, exchange_name: str = None):
         """
@@ -29,6 +33,7 @@ class TradingService:
         """
         if exchange_name:
             # 清除特定交易所的缓存
+            cls._user_networks.pop(f"{user_id}_{exchange_name}", None)
             for testnet in [True, False]:
                 cache_key = f"{user_id}_{exchange_name}_{testnet}"
                 if cache_key in cls._exchange_instances:
@@ -36,6 +41,8 @@ class TradingService:
                     logger.info(f"清除用户{user_id}的{exchange_name}交易所缓存")
         else:
             # 清除该用户的所有缓存
+            for key in [k for k in cls._user_networks if k.startswith(f"{user_id}_")]:
+                del cls._user_networks[key]
             keys_to_remove = [k for k in cls._exchange_instances.keys() if k.startswith(f"{user_id}_")]
             for key in keys_to_remove:
                 del cls._exchange_instances[key]
@@ -356,12 +363,34 @@ class TradingService:
         cls,
         user_id: int,
         symbol: str,
-        exchange_name: str = None
+        exchange_name: str = None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
-        """获取行情"""
+        """
+        获取行情（公共行情数据，按交易所和网络在短期缓存中共享）
+        
+        Args:
+            user_id: 用户ID
+            symbol: 交易对
+            exchange_name: 交易所名称
+            use_cache: 是否使用缓存；按金额计算下单数量时应传 False 获取最新价格
+        """
         try:
+            exchange_name = exchange_name or 'bybit'
+            network_key = f"{user_id}_{exchange_name}"
+            
+            # 已知用户所在网络时先查缓存，命中时不再查库、解密和创建交易所实例
+            testnet = cls._user_networks.get(network_key)
+            if use_cache and testnet is not None:
+                ticker = ticker_cache.get((exchange_name, testnet, symbol.upper()))
+                if ticker is not None:
+                    return ticker
+            
             exchange = cls.get_exchange(user_id=user_id, exchange_name=exchange_name)
-            return exchange.get_ticker(symbol)
+            cls._user_networks[network_key] = exchange.testnet
+            ticker = exchange.get_ticker(symbol)
+            ticker_cache.set((exchange_name, exchange.testnet, symbol.upper()), ticker)
+            return ticker
         except Exception as e:
             logger.error(f"获取行情失败: {e}")
             raise
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""Celery tasks for refreshing the market screener snapshots."""
+import logging
+from celery import shared_task
+
+from services.market_screener import MarketScreener
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="tasks.screener_tasks.refresh_market_screener_task")
+def refresh_market_screener_task():
+    """Task to refresh the market screener snapshots shared by all web workers."""
+    logger.info("[Celery] 开始刷新全市场筛选快照")
+    MarketScreener().refresh_all()
+    logger.info("[Celery] 全市场筛选快照刷新完成")
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+测试共用的列式K线构造工具
+"""
+import sys
+import os
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.kline_store import KlineArrays, KLINE_FIELDS, FIELD_INDEX
+
+HOUR_MS = 3600 * 1000
+
+
+def make_arrays(close, start_ms: int = 0, interval_ms: int = HOUR_MS, **columns) -> KlineArrays:
+    """
+    根据收盘价生成按开盘时间升序排列的列式K线
+
+    Args:
+        close: 收盘价
+        start_ms: 第一根K线的开盘时间（毫秒）
+        interval_ms: K线周期（毫秒）
+        columns: 覆盖其他字段，如 open=...、volume=...；默认最高价/最低价为收盘价的±1%
+
+    Returns:
+        KlineArrays: 列式K线
+    """
+    close = np.asarray(close, dtype=np.float64)
+    data = np.zeros((len(KLINE_FIELDS), len(close)))
+    data[FIELD_INDEX['timestamp']] = start_ms + np.arange(len(close)) * interval_ms
+    data[FIELD_INDEX['close']] = close
+    data[FIELD_INDEX['high']] = close * 1.01
+    data[FIELD_INDEX['low']] = close * 0.99
+    data[FIELD_INDEX['close_time']] = data[FIELD_INDEX['timestamp']] + interval_ms - 1
+    for name, values in columns.items():
+        data[FIELD_INDEX[name]] = values
+    return KlineArrays(data)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+测试趋势分析结果缓存
+"""
+import sys
+import os
+import time
+import threading
+import unittest
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.analysis_cache import AnalysisCache
+from utils.trend_analyzer import TrendAnalyzer
+import utils.trend_analyzer
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """测试缓存命中、并发合并和结果隔离"""
+
+    def test_single_flight(self):
+        """并发的相同请求只计算一次"""
+        cache = AnalysisCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"price": 1.0}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"price": 1.0}] * 8)
+        stats = cache.get_stats()
+        self.assertEqual(stats['shared'] + stats['hits'], 7)
+
+    def test_errors_not_cached_and_results_copied(self):
+        """错误结果不缓存，返回值修改不影响缓存"""
+        cache = AnalysisCache()
+        self.assertIn('error', cache.get_or_compute('bad', lambda: {"error": "x"}))
+        self.assertEqual(cache.get_or_compute('bad', lambda: {"price": 2.0}), {"price": 2.0})
+
+        cache.get_or_compute('bad', lambda: {"price": 3.0})['ticker_24h'] = {}
+        self.assertEqual(cache.get_or_compute('bad', lambda: {"price": 4.0}), {"price": 2.0})
+        self.assertEqual(cache.get_stats()['hits'], 2)
+
+    def test_analyze_trend_cached_keyed_by_last_candle(self):
+        """最后一根K线变化时重新分析"""
+        close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, 120))
+        df = pd.DataFrame({
+            'timestamp': pd.date_range('2024-01-01', periods=120, freq='h'),
+            'high': close + 1, 'low': close - 1, 'close': close,
+        })
+        cache = AnalysisCache()
+        original = utils.trend_analyzer.analysis_cache
+        utils.trend_analyzer.analysis_cache = cache
+        try:
+            first = TrendAnalyzer.analyze_trend_cached('BTC/USDT', '1h', df)
+            TrendAnalyzer.analyze_trend_cached('BTC/USDT', '1h', df.copy())
+            moved = df.copy()
+            moved.loc[moved.index[-1], 'close'] += 5
+            second = TrendAnalyzer.analyze_trend_cached('BTC/USDT', '1h', moved)
+        finally:
+            utils.trend_analyzer.analysis_cache = original
+
+        self.assertEqual(first, TrendAnalyzer.analyze_trend(df))
+        self.assertNotEqual(first['price'], second['price'])
+        self.assertEqual(cache.get_stats()['hits'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
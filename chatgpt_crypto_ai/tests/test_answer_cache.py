@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+测试回答缓存
+"""
+import sys
+import os
+import time
+import unittest
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.answer_cache import AnswerCache, answer_ttl, make_answer_key, replay_chunks, ANALYZE_MAX_TTL, MONITOR_MAX_TTL
+
+
+def make_frame(last_open_ms: int, interval_ms: int = 3600_000, periods: int = 3) -> pd.DataFrame:
+    start = last_open_ms - (periods - 1) * interval_ms
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime([start + i * interval_ms for i in range(periods)], unit='ms'),
+        'close': [1.0] * periods,
+    })
+
+
+class TestAnswerCache(unittest.TestCase):
+    """测试缓存键、过期时间与回放"""
+
+    def setUp(self):
+        # 当前这根1小时K线刚开始10分钟
+        self.now = time.time()
+        self.last_open = int((self.now - 600) * 1000)
+        self.price_data = {'BTCUSDT': make_frame(self.last_open)}
+
+    def test_key(self):
+        """只缓存分析和价格监控；问题规范化；新K线改变键"""
+        key = make_answer_key('analyze', ['BTCUSDT'], '1h', self.price_data, "BTC 走势怎么样？")
+        self.assertEqual(key, make_answer_key('analyze', ['BTCUSDT'], '1h', self.price_data, "btc走势怎么样"))
+        self.assertIsNone(make_answer_key('trade', ['BTCUSDT'], '1h', self.price_data, "BTC 能买吗"))
+        self.assertIsNone(make_answer_key('analyze', [], '1h', {}, "走势"))
+        next_candle = {'BTCUSDT': make_frame(self.last_open + 3600_000)}
+        self.assertNotEqual(key, make_answer_key('analyze', ['BTCUSDT'], '1h', next_candle, "BTC 走势怎么样？"))
+
+    def test_key_requires_empty_history(self):
+        """上下文中只有当前消息时才缓存，有对话历史时不缓存"""
+        question = "BTC 走势怎么样"
+        current = [{"role": "user", "content": question}]
+        history = [{"role": "user", "content": "我持有BTC"}, {"role": "assistant", "content": "好的"}] + current
+        self.assertIsNotNone(make_answer_key('analyze', ['BTCUSDT'], '1h', self.price_data, question, current))
+        self.assertIsNone(make_answer_key('analyze', ['BTCUSDT'], '1h', self.price_data, question, history))
+
+    def test_ttl(self):
+        """分析回答保留到K线结束且最多 ANALYZE_MAX_TTL，价格监控最多 MONITOR_MAX_TTL 秒，快结束时不缓存"""
+        key = make_answer_key('analyze', ['BTCUSDT'], '1h', self.price_data, "走势")
+        self.assertEqual(answer_ttl(key, self.now), ANALYZE_MAX_TTL)
+        self.assertAlmostEqual(answer_ttl(key, self.now + 2980), 20, delta=1)
+        daily = {'BTCUSDT': make_frame(self.last_open, 86400_000)}
+        key = make_answer_key('analyze', ['BTCUSDT'], '1d', daily, "走势")
+        self.assertEqual(answer_ttl(key, self.now), ANALYZE_MAX_TTL)
+        key = make_answer_key('monitor', ['BTCUSDT'], '1h', self.price_data, "价格")
+        self.assertEqual(answer_ttl(key, self.now), MONITOR_MAX_TTL)
+        self.assertEqual(answer_ttl(key, self.now + 3598), 0)
+
+    def test_set_get_and_replay(self):
+        """命中时返回原回答，回放的片段拼起来与原回答一致"""
+        cache = AnswerCache()
+        key = make_answer_key('analyze', ['BTCUSDT'], '1h', self.price_data, "走势")
+        answer = "比特币当前处于上升趋势，" * 10
+        self.assertIsNone(cache.get(key))
+        cache.set(key, answer)
+        self.assertEqual(cache.get(key), answer)
+        self.assertEqual("".join(replay_chunks(answer, 7)), answer)
+        cache.set(None, answer)
+        self.assertIsNone(cache.get(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+测试信号回测模块
+"""
+import sys
+import os
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import backtest
+from utils.backtest import evaluate_positions, rule_positions, backtest_symbol, BACKTEST_RULES
+from tests.kline_helpers import make_arrays
+
+
+class TestBacktest(unittest.TestCase):
+    """测试持仓切分、统计与缓存"""
+
+    def test_evaluate_positions(self):
+        """按持仓变化点切分交易，未平仓的最后一段不计入"""
+        close = np.array([100, 110, 121, 121, 110, 100, 100, 90])
+        positions = np.array([1, 1, 0, 0, -1, -1, 1, 1])
+        result = evaluate_positions(close, positions, fee=0)
+
+        # 多单 100->121 (+21%)，空单 110->100 (+9.09%)，最后的多单未平仓
+        self.assertEqual(result['trades'], 2)
+        self.assertAlmostEqual(result['win_rate'], 100.0)
+        self.assertAlmostEqual(result['expectancy'], (21 + 100 / 11) / 2)
+        self.assertEqual(result['open_position'], 1)
+        self.assertAlmostEqual(result['max_drawdown'], -10.0)
+
+        with_fee = evaluate_positions(close, positions, fee=0.001)
+        self.assertAlmostEqual(with_fee['expectancy'], result['expectancy'] - 0.2)
+
+    def test_rule_positions(self):
+        """趋势行情中均线多头排列与MACD金叉持有多单"""
+        close = 100 * np.exp(np.linspace(0, 1, 300))
+        self.assertEqual(rule_positions('ma_stack', close)[-1], 1)
+        self.assertEqual(rule_positions('macd_cross', close)[-1], 1)
+        self.assertEqual(rule_positions('rsi', close)[-1], -1)
+        with self.assertRaises(ValueError):
+            rule_positions('moon', close)
+
+    def test_backtest_symbol_cache(self):
+        """结果按 (symbol, interval, rule) 缓存，存储出现新K线后重新计算"""
+        backtest.backtest_cache.clear()
+        rng = np.random.default_rng(1)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 600)))
+        series = {'arrays': make_arrays(close[:500])}
+
+        with patch.object(backtest.kline_store, 'load', side_effect=lambda s, i: series['arrays']), \
+                patch.object(backtest, 'backtest_arrays', wraps=backtest.backtest_arrays) as run:
+            for rule in BACKTEST_RULES:
+                first = backtest_symbol('TESTUSDT', '1h', rule)
+                self.assertEqual(first['bars'], 500)
+                self.assertIs(backtest_symbol('TESTUSDT', '1h', rule), first)
+            self.assertEqual(run.call_count, len(BACKTEST_RULES))
+
+            series['arrays'] = make_arrays(close)
+            self.assertEqual(backtest_symbol('TESTUSDT', '1h', 'rsi')['bars'], 600)
+            self.assertEqual(run.call_count, len(BACKTEST_RULES) + 1)
+
+    def test_backtest_symbol_backfills_once(self):
+        """存储不足时只补齐一次，缓存命中时不请求数据"""
+        backtest.backtest_cache.clear()
+        backtest.backfilled_series.clear()
+        rng = np.random.default_rng(2)
+        arrays = make_arrays(100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300))))
+
+        class FakeFetcher:
+            calls = 0
+
+            def get_kline_arrays(self, symbol, interval, limit):
+                FakeFetcher.calls += 1
+                return arrays
+
+        fetcher = FakeFetcher()
+        with patch.object(backtest.kline_store, 'load', return_value=arrays):
+            first = backtest_symbol('NEWUSDT', '1h', 'rsi', fetcher)
+            self.assertIs(backtest_symbol('NEWUSDT', '1h', 'rsi', fetcher), first)
+            backtest_symbol('NEWUSDT', '1h', 'macd_cross', fetcher)
+        self.assertEqual(first['bars'], 300)
+        self.assertEqual(FakeFetcher.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
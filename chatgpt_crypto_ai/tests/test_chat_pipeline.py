@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+测试聊天请求流水线
+"""
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+import contextlib
+import unittest
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.chat_pipeline import DeferredWrites, prefetch_klines, collect_market_data
+from utils.analysis_cache import AnalysisCache
+from utils.indicator_state import IndicatorStateStore
+
+
+class FakeApp:
+    """只提供 app_context 的应用对象"""
+
+    def app_context(self):
+        return contextlib.nullcontext()
+
+
+class SlowFetcher:
+    """每次请求耗时固定的K线获取器"""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = []
+
+    def get_klines(self, symbol, timeframe='1d', limit=100):
+        self.calls.append((symbol, timeframe))
+        time.sleep(self.delay)
+        close = 100 + np.cumsum(np.random.default_rng(len(symbol)).normal(0, 1, 100))
+        return pd.DataFrame({
+            'timestamp': pd.date_range('2024-01-01', periods=100, freq='h'),
+            'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+        })
+
+    def get_current_prices(self, symbols):
+        time.sleep(self.delay)
+        return {symbol.replace('/', ''): {'price': 1.0} for symbol in symbols}
+
+
+class TestChatPipeline(unittest.TestCase):
+    """测试预取、并行扇出与后台写入"""
+
+    def setUp(self):
+        # 分析走增量指标状态，使用临时目录和新的缓存，避免把假行情写进真实缓存
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            patch('utils.trend_analyzer.indicator_state_store', IndicatorStateStore(base_dir=self.tmp_dir)),
+            patch('utils.trend_analyzer.analysis_cache', AnalysisCache()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_collect_market_data_parallel(self):
+        """多个币种并行获取，总耗时接近单次请求"""
+        fetcher = SlowFetcher()
+        started = time.monotonic()
+        price_data, analysis = collect_market_data(fetcher, ['BTC', 'ETH', 'SOL', 'DOGE'], '1h', 'monitor')
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(set(analysis), {'BTC', 'ETH', 'SOL', 'DOGE'})
+        self.assertEqual(set(price_data), {'BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'DOGE/USDT'})
+        self.assertEqual(analysis['ETH']['ticker_24h'], {'price': 1.0})
+
+    def test_prefetch_reused(self):
+        """预取的K线在意图确定后直接复用，不会重复请求"""
+        fetcher = SlowFetcher(delay=0.05)
+        prefetched = prefetch_klines(fetcher, ['BTC', 'BTC'], '1h')
+        collect_market_data(fetcher, ['BTC', 'ETH'], '1h', 'chat', prefetched)
+        self.assertEqual(sorted(fetcher.calls), [('BTC/USDT', '1h'), ('ETH/USDT', '1h')])
+
+    def test_deferred_writes_in_order(self):
+        """后台写入按提交顺序执行，失败不影响后续写入"""
+        order = []
+        lock = threading.Lock()
+
+        def write(name, delay=0.0):
+            time.sleep(delay)
+            with lock:
+                order.append(name)
+            return name
+
+        def fail():
+            raise RuntimeError("boom")
+
+        writes = DeferredWrites(FakeApp())
+        writes.submit(write, 'user', 0.1)
+        failed = writes.submit(fail)
+        last = writes.submit(write, 'assistant')
+
+        self.assertEqual(last.result(timeout=2), 'assistant')
+        self.assertEqual(order, ['user', 'assistant'])
+        with self.assertRaises(RuntimeError):
+            failed.result()
+
+
+if __name__ == "__main__":
+    unittest.main()
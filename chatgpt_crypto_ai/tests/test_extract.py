@@ -11,7 +11,7 @@ import pandas as pd
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.extract import extract_crypto_symbols, extract_time_window, extract_all_info
+from utils.extract import extract_crypto_symbols, extract_time_window, extract_all_info, CoinMentionMatcher
 
 
 class TestExtractFunctions(unittest.TestCase):
@@ -44,6 +44,14 @@ class TestExtractFunctions(unittest.TestCase):
         result5 = extract_crypto_symbols(text5)
         self.assertEqual(result5, [])
 
+    def test_coin_matcher_pair_forms(self):
+        """测试交易对写法和单词边界"""
+        matcher = CoinMentionMatcher(["BTC", "ETH", "USDT", "ONE"], {"比特币": "BTC"})
+        self.assertEqual(matcher.find("看看BTC/USDT和ethusdt"), ["BTC", "USDT", "ETH"])
+        self.assertEqual(matcher.find("比特币 vs BTC-PERP"), ["BTC"])
+        # 符号出现在单词内部时不匹配
+        self.assertEqual(matcher.find("someone bought BTCX"), [])
+
     def test_extract_time_window(self):
         """测试从文本中提取时间窗口"""
         # 测试常用时间窗口
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+测试压测用的本地假服务
+"""
+import sys
+import os
+import json
+import unittest
+import requests
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_binance, fake_openai
+from benchmarks.bench_chat import summarize
+from utils.kline_store import KlineArrays
+
+
+class TestFakeBinance(unittest.TestCase):
+    """测试假币安服务"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = fake_binance.make_server(latency=0)
+        cls.base_url = fake_binance.start_in_thread(cls.server)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_klines(self):
+        """K线可被解析，按时间连续，同一根K线多次请求结果一致"""
+        rows = requests.get(f"{self.base_url}/api/v3/klines",
+                            params={'symbol': 'BTCUSDT', 'interval': '1h', 'limit': 50}).json()
+        arrays = KlineArrays.from_rows(rows)
+        self.assertEqual(len(arrays), 50)
+        open_time = arrays.column('timestamp')
+        self.assertTrue((open_time[1:] - open_time[:-1] == 3600_000).all())
+        self.assertTrue((arrays.column('high') >= arrays.column('low')).all())
+
+        rows_again = fake_binance.make_klines('BTCUSDT', '1h', start_time=int(open_time[0]), limit=10)
+        self.assertEqual(rows_again, rows[:10])
+
+    def test_ticker_and_exchange_info(self):
+        """单个和批量行情，交易对信息"""
+        ticker = requests.get(f"{self.base_url}/api/v3/ticker/24hr", params={'symbol': 'ETHUSDT'}).json()
+        self.assertEqual(ticker['symbol'], 'ETHUSDT')
+        tickers = requests.get(f"{self.base_url}/api/v3/ticker/24hr",
+                               params={'symbols': json.dumps(['BTCUSDT', 'ETHUSDT'])}).json()
+        self.assertEqual([t['symbol'] for t in tickers], ['BTCUSDT', 'ETHUSDT'])
+        info = requests.get(f"{self.base_url}/api/v3/exchangeInfo").json()
+        self.assertIn('BTCUSDT', [s['symbol'] for s in info['symbols']])
+
+
+class TestFakeOpenAI(unittest.TestCase):
+    """测试假 OpenAI 服务"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = fake_openai.make_server(latency=0, tokens=5, token_interval=0)
+        cls.base_url = fake_openai.start_in_thread(cls.server)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_completion(self):
+        """非流式回答；意图识别请求返回 JSON"""
+        reply = requests.post(f"{self.base_url}/chat/completions", json={
+            'model': 'm', 'messages': [{'role': 'user', 'content': "你好"}]}).json()
+        self.assertEqual(reply['choices'][0]['message']['content'], fake_openai.REPLY_PIECE * 5)
+
+        reply = requests.post(f"{self.base_url}/chat/completions", json={
+            'model': 'm', 'messages': [{'role': 'user', 'content': "规则……\n当前用户输入：eth 怎么样"}]}).json()
+        intent = json.loads(reply['choices'][0]['message']['content'])
+        self.assertEqual(intent['coin'], 'ETH')
+
+    def test_stream(self):
+        """流式回答按 SSE 输出，以 [DONE] 结束"""
+        response = requests.post(f"{self.base_url}/chat/completions", stream=True, json={
+            'model': 'm', 'stream': True, 'messages': [{'role': 'user', 'content': "你好"}]})
+        lines = [raw.decode('utf-8') for raw in response.iter_lines()]
+        events = [line[6:] for line in lines if line.startswith('data: ')]
+        self.assertEqual(events[-1], '[DONE]')
+        content = "".join(json.loads(e)['choices'][0]['delta'].get('content') or '' for e in events[:-1])
+        self.assertEqual(content, fake_openai.REPLY_PIECE * 5)
+
+
+class TestSummarize(unittest.TestCase):
+    """测试压测结果汇总"""
+
+    def test_summarize(self):
+        results = [{'ok': True, 'latency': 0.1 * i, 'ttft': 0.05 * i, 'cached': i == 1} for i in range(1, 11)]
+        results.append({'ok': False, 'latency': 1.0, 'ttft': None, 'cached': False})
+        report = summarize(results, 2.0, 55)
+        self.assertEqual(report['errors'], 1)
+        self.assertEqual(report['cached'], 1)
+        self.assertAlmostEqual(report['rps'], 5.0)
+        self.assertAlmostEqual(report['p50'], 0.55)
+        self.assertAlmostEqual(report['db_queries_per_request'], 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
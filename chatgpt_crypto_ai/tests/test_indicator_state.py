@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+测试增量技术指标状态
+"""
+import sys
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indicators import compute_indicators
+from utils.indicator_state import IndicatorState, IndicatorStateStore
+from utils.trend_analyzer import TrendAnalyzer
+from tests.kline_helpers import make_arrays, HOUR_MS
+
+
+class TestIndicatorState(unittest.TestCase):
+    """测试增量更新与全量计算一致"""
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, 250)))
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_incremental_matches_full_computation(self):
+        """逐根更新（含修订）的结果与全量计算一致"""
+        state = IndicatorState(ma_windows=(7, 25, 99))
+        for i, price in enumerate(self.close):
+            state.update(i * HOUR_MS, price * 1.02, price * 0.98, price * 1.01)
+            state.update(i * HOUR_MS, price, price, price)
+
+        expected = compute_indicators(self.close, ma_windows=(7, 25, 99))
+        latest = state.latest()
+        for name in ('ma7', 'ma99', 'rsi', 'macd', 'macd_signal', 'macd_hist', 'bb_upper', 'bb_lower'):
+            self.assertAlmostEqual(latest[name], expected.latest(name), places=6, msg=name)
+
+        restored = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+        for name, value in restored.latest().items():
+            self.assertAlmostEqual(value, latest[name], places=6, msg=name)
+
+    def test_store_sync_and_analyze(self):
+        """状态存储只处理新K线，并能从磁盘恢复"""
+        store = IndicatorStateStore(base_dir=self.tmp_dir)
+        arrays = make_arrays(self.close)
+
+        store.sync('BTCUSDT', '1h', make_arrays(self.close[:-1]))
+        state = store.sync('BTCUSDT', '1h', arrays.tail(10))
+        self.assertEqual(state.count, len(self.close))
+
+        reloaded = IndicatorStateStore(base_dir=self.tmp_dir).get('BTCUSDT', '1h')
+        self.assertEqual(reloaded.last_timestamp, int(arrays.last_open_time))
+
+        analysis = TrendAnalyzer.analyze_state(reloaded)
+        expected = TrendAnalyzer.analyze_arrays(arrays.tail(100))
+        self.assertEqual(analysis['ma_trend'], expected['ma_trend'])
+        self.assertAlmostEqual(analysis['rsi'], expected['rsi'])
+        self.assertAlmostEqual(analysis['price_change_pct_24h'], expected['price_change_pct_24h'])
+
+    def test_sync_saves_only_new_candles(self):
+        """只修订未收盘K线时不写磁盘，追加新K线时才写"""
+        store = IndicatorStateStore(base_dir=self.tmp_dir)
+        saves = []
+        original = store._save_unlocked
+        store._save_unlocked = lambda *args: saves.append(args) or original(*args)
+
+        arrays = make_arrays(self.close[:100])
+        store.sync('BTCUSDT', '1h', arrays)
+        store.sync('BTCUSDT', '1h', arrays)
+        self.assertEqual(len(saves), 1)
+        store.sync('BTCUSDT', '1h', make_arrays(self.close[:101]).tail(100))
+        self.assertEqual(len(saves), 2)
+
+    def test_analyze_trend_cached_uses_state(self):
+        """聊天路径的缓存分析在100根K线时走增量状态，结果与完整计算一致"""
+        import utils.trend_analyzer
+        from utils.analysis_cache import AnalysisCache
+
+        frame = make_arrays(self.close[:100]).to_frame()
+        store = IndicatorStateStore(base_dir=self.tmp_dir)
+        originals = utils.trend_analyzer.indicator_state_store, utils.trend_analyzer.analysis_cache
+        utils.trend_analyzer.indicator_state_store = store
+        utils.trend_analyzer.analysis_cache = AnalysisCache()
+        try:
+            analysis = TrendAnalyzer.analyze_trend_cached('BTC/USDT', '1h', frame)
+        finally:
+            utils.trend_analyzer.indicator_state_store, utils.trend_analyzer.analysis_cache = originals
+
+        self.assertEqual(store.get('BTCUSDT', '1h').count, 100)
+        expected = TrendAnalyzer.analyze_trend(frame)
+        self.assertEqual(analysis['ma_trend'], expected['ma_trend'])
+        self.assertAlmostEqual(analysis['rsi'], expected['rsi'])
+        self.assertAlmostEqual(analysis['price'], expected['price'])
+
+
+if __name__ == "__main__":
+    unittest.main()
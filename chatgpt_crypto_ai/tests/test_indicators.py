@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+测试技术指标计算引擎
+"""
+import sys
+import os
+import unittest
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indicators import compute_indicators, compute_indicators_batch, ema
+
+
+class TestIndicators(unittest.TestCase):
+    """测试指标引擎与pandas写法的一致性"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, 300)))
+
+    def assertSeriesClose(self, actual, expected):
+        np.testing.assert_allclose(actual, np.asarray(expected, dtype=np.float64), rtol=1e-9, equal_nan=True)
+
+    def test_matches_pandas(self):
+        """均线、RSI、MACD、布林带与pandas rolling/ewm结果一致"""
+        close = pd.Series(self.close)
+        indicators = compute_indicators(self.close, ma_windows=(7, 20))
+
+        self.assertSeriesClose(indicators.ma[7], close.rolling(window=7).mean())
+
+        delta = close.diff()
+        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+        self.assertSeriesClose(indicators.rsi, 100 - (100 / (1 + gain / loss)))
+
+        macd = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+        signal = macd.ewm(span=9, adjust=False).mean()
+        self.assertSeriesClose(indicators.macd, macd)
+        self.assertSeriesClose(indicators.macd_hist, macd - signal)
+
+        std = close.rolling(window=20).std()
+        self.assertSeriesClose(indicators.bb_upper, close.rolling(window=20).mean() + std * 2)
+        self.assertAlmostEqual(indicators.latest('ma20'), close.iloc[-20:].mean())
+
+    def test_ema_long_series(self):
+        """超过一个分块长度的长序列与pandas ewm一致，二维逐行结果与一维相同"""
+        rng = np.random.default_rng(11)
+        close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, 5000)))
+        for span in (2, 9, 26):
+            self.assertSeriesClose(ema(close, span), pd.Series(close).ewm(span=span, adjust=False).mean())
+        stacked = ema(np.vstack([close, close[::-1]]), 9)
+        self.assertSeriesClose(stacked[1], ema(close[::-1], 9))
+
+    def test_batch_matches_single(self):
+        """批量模式每一行与单独计算的结果一致"""
+        other = self.close[:200] * 0.5
+        batch = compute_indicators_batch([self.close, other])
+
+        self.assertEqual(batch.rsi.shape, (2, 200))
+        single = compute_indicators(other)
+        self.assertSeriesClose(batch.macd_signal[1], single.macd_signal)
+        self.assertSeriesClose(batch.bb_lower[0], compute_indicators(self.close[-200:]).bb_lower)
+        self.assertEqual(batch.latest('rsi').shape, (2,))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+测试意图提取结果缓存
+"""
+import sys
+import os
+import json
+import unittest
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.intent_cache import IntentCache, normalize_message, context_fingerprint
+
+RESULT = {"coin": "BTC", "timeframe": None, "intent": "analyze", "error": None, "confidence": 0.9}
+
+
+class FakeRedis:
+    """只实现 get/setex 的 Redis 替身"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+
+class TestIntentCache(unittest.TestCase):
+    """测试缓存键与读写"""
+
+    def test_normalize_message(self):
+        """大小写、空白、标点、全角和句末语气词不影响缓存键"""
+        self.assertEqual(normalize_message("BTC走势"), "btc走势")
+        self.assertEqual(normalize_message(" btc 走势如何？"), "btc走势")
+        self.assertEqual(normalize_message("ＢＴＣ走势怎么样呢"), "btc走势")
+        self.assertNotEqual(normalize_message("BTC走势"), normalize_message("ETH走势"))
+
+    def test_context_fingerprint(self):
+        """上下文指纹按最后提及排序，忽略助手消息和当前输入"""
+        history = [
+            {"role": "user", "content": "BTC怎么样"},
+            {"role": "assistant", "content": "SOL也不错"},
+            {"role": "user", "content": "ETH呢"},
+            {"role": "user", "content": "比特币呢"},
+            {"role": "user", "content": "它能买吗"},
+        ]
+        self.assertEqual(context_fingerprint("它能买吗", history), "ETH,BTC")
+        self.assertNotEqual(IntentCache.make_key("它能买吗", history), IntentCache.make_key("它能买吗", history[:3]))
+        self.assertEqual(IntentCache.make_key("BTC走势", []), IntentCache.make_key("btc 走势如何", None))
+
+    def test_memory_backend(self):
+        """进程内缓存：出错或低置信度的结果不缓存，读取返回副本"""
+        cache = IntentCache(use_redis=False)
+        cache.set("a", RESULT)
+        cached = cache.get("a")
+        self.assertEqual(cached, RESULT)
+        cached["coin"] = "ETH"
+        self.assertEqual(cache.get("a")["coin"], "BTC")
+
+        cache.set("b", dict(RESULT, error="失败"))
+        cache.set("c", dict(RESULT, confidence=0.2))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNone(cache.get("c"))
+
+    def test_redis_backend(self):
+        """Redis 缓存：以 JSON 写入并带过期时间"""
+        cache = IntentCache(use_redis=True)
+        cache._redis = FakeRedis()
+        cache.set("a", RESULT)
+        self.assertEqual(json.loads(cache._redis.data["coingpt:intent:a"]), RESULT)
+        self.assertEqual(cache.get("a"), RESULT)
+        self.assertEqual(len(cache._local), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
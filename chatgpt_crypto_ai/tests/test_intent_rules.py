@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+测试基于规则的意图快速识别
+"""
+import sys
+import os
+import unittest
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.intent_rules import classify_intent, IntentRuleStats
+from benchmarks.bench_intent import load_corpus, evaluate
+
+
+class TestIntentRules(unittest.TestCase):
+    """测试规则识别与语料一致率"""
+
+    def test_clear_inputs(self):
+        """明确的输入直接给出结果"""
+        result = classify_intent("分析ETH 4小时")
+        self.assertEqual((result['coin'], result['intent'], result['timeframe']), ('ETH', 'analyze', '4h'))
+        self.assertEqual(result['source'], 'rules')
+        self.assertEqual(classify_intent("BTC多少钱")['intent'], 'monitor')
+        # trade 关键词优先于价格和分析
+        self.assertEqual(classify_intent("BTC多少钱，现在能买吗")['intent'], 'trade')
+
+    def test_ambiguous_inputs(self):
+        """代词、多个币种、无关键词或不支持的周期交给大模型"""
+        for text in ("它现在多少价格", "BTC和ETH哪个走势更强", "BTC是什么", "ETH最近7天走势", ""):
+            self.assertIsNone(classify_intent(text), text)
+
+    def test_corpus_agreement(self):
+        """规则命中的语料与标注完全一致，且命中率不低于60%"""
+        report = evaluate(load_corpus())
+        self.assertEqual(report['mismatches'], [])
+        self.assertGreaterEqual(report['hit_rate'], 0.6)
+
+    def test_stats(self):
+        """命中率统计"""
+        stats = IntentRuleStats()
+        stats.record(True)
+        stats.record(True)
+        stats.record(False)
+        self.assertEqual(stats.get_stats(), {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
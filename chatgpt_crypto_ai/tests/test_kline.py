@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+测试K线获取模块及本地K线存储功能
+"""
+import sys
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.kline_store import KlineStore, KlineArrays, merge_arrays
+import utils.kline
+from utils.kline import KlineDataFetcher, SymbolIndex, get_kline_fetcher, ticker_cache
+from utils.trend_analyzer import TrendAnalyzer
+
+HOUR_MS = 3600 * 1000
+
+TRADING_PAIRS = {
+    'BTCUSDT': {'baseAsset': 'BTC', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+    'ETHUSDT': {'baseAsset': 'ETH', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+}
+
+
+def make_rows(start_ms: int, count: int, interval_ms: int = HOUR_MS):
+    """生成币安格式的K线行"""
+    rows = []
+    for i in range(count):
+        open_time = start_ms + i * interval_ms
+        price = 100.0 + i
+        rows.append([
+            open_time, str(price), str(price + 1), str(price - 1), str(price + 0.5), "10.0",
+            open_time + interval_ms - 1, "1000.0", 5, "5.0", "500.0", "0"
+        ])
+    return rows
+
+
+class TestKlineStore(unittest.TestCase):
+    """测试本地K线存储的单元测试类"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = KlineStore(base_dir=self.tmp_dir)
+        # 当前小时的开盘时间
+        self.current_open = int(time.time() * 1000) // HOUR_MS * HOUR_MS
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_merge_keeps_only_closed_klines(self):
+        """测试只保存已收盘的K线并按开盘时间去重"""
+        rows = make_rows(self.current_open - 4 * HOUR_MS, 5)
+        series = self.store.merge('BTCUSDT', '1h', rows)
+
+        # 最后一根K线尚未收盘，不应被保存
+        self.assertEqual(len(series), 4)
+        self.assertEqual(self.store.high_water_mark('BTCUSDT', '1h'), self.current_open - HOUR_MS)
+
+        # 重复合并同一批数据不会产生重复行
+        self.store.merge('BTCUSDT', '1h', rows[-3:])
+        self.assertEqual(len(self.store.load('BTCUSDT', '1h')), 4)
+
+    def test_load_from_new_instance(self):
+        """测试序列持久化到磁盘后可被其他实例读取"""
+        self.store.merge('BTCUSDT', '1h', make_rows(self.current_open - 10 * HOUR_MS, 10))
+        other = KlineStore(base_dir=self.tmp_dir)
+        self.assertEqual(len(other.load('BTCUSDT', '1h')), 10)
+
+    def test_merge_caps_default_series(self):
+        """测试默认路径的序列保留 default_klines 根，回填的序列保持已有长度"""
+        store = KlineStore(base_dir=self.tmp_dir, max_klines=50, default_klines=10)
+        store.merge('BTCUSDT', '1h', make_rows(self.current_open - 30 * HOUR_MS, 20))
+        self.assertEqual(len(store.load('BTCUSDT', '1h')), 10)
+
+        store.merge('ETHUSDT', '1h', make_rows(self.current_open - 100 * HOUR_MS, 80), backfill=True)
+        self.assertEqual(len(store.load('ETHUSDT', '1h')), 50)
+        series = store.merge('ETHUSDT', '1h', make_rows(self.current_open - 20 * HOUR_MS, 20))
+        self.assertEqual(len(series), 50)
+        self.assertEqual(series.last_open_time, self.current_open - HOUR_MS)
+
+    def test_reload_when_mtime_unchanged(self):
+        """测试同一时间戳内被替换的文件也会重新映射"""
+        self.store.merge('BTCUSDT', '1h', make_rows(self.current_open - 10 * HOUR_MS, 5))
+        path = self.store._series_path('BTCUSDT', '1h')
+        stat = os.stat(path)
+        self.assertEqual(len(self.store.load('BTCUSDT', '1h')), 5)
+
+        other = KlineStore(base_dir=self.tmp_dir)
+        other.merge('BTCUSDT', '1h', make_rows(self.current_open - 5 * HOUR_MS, 5))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(len(self.store.load('BTCUSDT', '1h')), 10)
+
+    def test_merge_arrays_new_rows_win(self):
+        """测试合并列式数据时按开盘时间去重，新数据覆盖旧数据"""
+        old = KlineArrays.from_rows(make_rows(0, 5))
+        revised = make_rows(3 * HOUR_MS, 3)
+        revised[0][4] = "999.0"
+        merged = merge_arrays(old, KlineArrays.from_rows(revised))
+
+        self.assertEqual(len(merged), 6)
+        self.assertEqual(list(merged.timestamp), [i * HOUR_MS for i in range(6)])
+        self.assertEqual(merged.close[3], 999.0)
+
+    def test_load_is_memory_mapped(self):
+        """测试读取的序列是只读内存映射，取尾部数据不复制"""
+        self.store.merge('BTCUSDT', '1h', make_rows(self.current_open - 30 * HOUR_MS, 30))
+        arrays = self.store.load('BTCUSDT', '1h')
+        tail = arrays.tail(10)
+
+        self.assertFalse(arrays.data.flags.writeable)
+        self.assertTrue(np.shares_memory(tail.close, arrays.data))
+        self.assertEqual(list(tail.to_frame().columns[:6]), ['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+
+    def test_get_klines_fetches_only_new_klines(self):
+        """测试get_klines只拉取高水位之后的K线"""
+        with patch('utils.kline.get_trading_pairs', return_value=TRADING_PAIRS), \
+                patch('utils.kline.kline_store', self.store):
+            fetcher = KlineDataFetcher()
+            # 首次请求返回的最后一根K线未收盘，存储中只有99根已收盘K线
+            history = make_rows(self.current_open - 99 * HOUR_MS, 100)
+
+            with patch.object(fetcher, '_make_api_request', return_value=history) as mock_request:
+                df = fetcher.get_klines('BTC/USDT', '1h', 100)
+            self.assertEqual(len(df), 100)
+            self.assertNotIn('startTime', mock_request.call_args[0][1])
+
+            # 第二次请求只需要拉取未收盘的最新K线
+            with patch.object(fetcher, '_make_api_request', return_value=history[-1:]) as mock_request:
+                df = fetcher.get_klines('BTC/USDT', '1h', 100)
+            params = mock_request.call_args[0][1]
+            self.assertEqual(params['startTime'], self.current_open - HOUR_MS + 1)
+            self.assertEqual(len(df), 100)
+            self.assertEqual(df.iloc[-1]['close'], float(history[-1][4]))
+
+    def test_get_klines_falls_back_to_store(self):
+        """测试API请求失败时使用本地缓存"""
+        self.store.merge('BTCUSDT', '1h', make_rows(self.current_open - 50 * HOUR_MS, 50))
+        with patch('utils.kline.get_trading_pairs', return_value=TRADING_PAIRS), \
+                patch('utils.kline.kline_store', self.store):
+            fetcher = KlineDataFetcher()
+            with patch.object(fetcher, '_make_api_request', return_value=None):
+                df = fetcher.get_klines('BTCUSDT', '1h', 20)
+        self.assertEqual(len(df), 20)
+
+    def test_get_kline_range_paginates_and_reuses_store(self):
+        """测试范围查询按窗口分页，并且已存储的窗口不会重复请求"""
+        history = make_rows(self.current_open - 2500 * HOUR_MS, 2501)
+        requested_windows = []
+
+        def fake_request(endpoint, params):
+            requested_windows.append((params['startTime'], params['endTime']))
+            return [row for row in history if params['startTime'] <= row[0] <= params['endTime']][:1000]
+
+        with patch('utils.kline.get_trading_pairs', return_value=TRADING_PAIRS), \
+                patch('utils.kline.kline_store', self.store):
+            fetcher = KlineDataFetcher()
+            start_ms, end_ms = history[0][0], int(time.time() * 1000)
+
+            with patch.object(fetcher, '_make_api_request', side_effect=fake_request):
+                arrays = fetcher.get_kline_range('BTCUSDT', '1h', start_ms, end_ms)
+            self.assertEqual(len(requested_windows), 3)
+            self.assertEqual(len(arrays), 2501)
+            self.assertTrue((np.diff(arrays.timestamp) == HOUR_MS).all())
+
+            # 再次查询时只需要请求存储高水位之后的窗口
+            requested_windows.clear()
+            with patch.object(fetcher, '_make_api_request', side_effect=fake_request):
+                arrays = fetcher.get_kline_range('BTCUSDT', '1h', start_ms, end_ms)
+            self.assertEqual(requested_windows, [(self.current_open - HOUR_MS + 1, end_ms)])
+            self.assertEqual(len(arrays), 2501)
+
+    def test_get_multiple_klines_reports_errors(self):
+        """测试并发批量获取K线时返回每个交易对的错误信息"""
+        def fake_request(endpoint, params):
+            if params['symbol'] != 'BTCUSDT':
+                return None
+            return make_rows(self.current_open - 9 * HOUR_MS, 10)
+
+        with patch('utils.kline.get_trading_pairs', return_value=TRADING_PAIRS), \
+                patch('utils.kline.kline_store', self.store):
+            fetcher = KlineDataFetcher()
+            errors = {}
+            with patch.object(fetcher, '_make_api_request', side_effect=fake_request):
+                result = fetcher.get_multiple_klines(['BTC', 'ETH', 'NOPE'], '1h', 10, errors=errors)
+
+        self.assertEqual(list(result), ['BTC'])
+        self.assertEqual(set(errors), {'ETH', 'NOPE'})
+
+    def test_get_kline_fetcher_is_shared(self):
+        """测试进程内共享同一个K线数据获取器，交易对只加载一次"""
+        with patch('utils.kline.get_trading_pairs', return_value=TRADING_PAIRS) as mock_pairs, \
+                patch.object(utils.kline, '_shared_fetcher', None):
+            first = get_kline_fetcher()
+            second = get_kline_fetcher()
+            first.stop_symbol_refresh()
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_pairs.call_count, 1)
+
+    def test_get_current_prices_single_batch_request(self):
+        """测试批量获取当前价格只发一次ticker/24hr请求，并命中短期缓存"""
+        tickers = [
+            {'symbol': 'BTCUSDT', 'lastPrice': '100.0', 'priceChangePercent': '1.5',
+             'highPrice': '110.0', 'lowPrice': '90.0', 'volume': '1000', 'quoteVolume': '100000'},
+            {'symbol': 'ETHUSDT', 'lastPrice': '10.0', 'priceChangePercent': '-2.0',
+             'highPrice': '11.0', 'lowPrice': '9.0', 'volume': '500', 'quoteVolume': '5000'},
+        ]
+        ticker_cache.clear()
+        with patch('utils.kline.get_trading_pairs', return_value=TRADING_PAIRS):
+            fetcher = KlineDataFetcher()
+            with patch.object(fetcher, '_make_api_request', return_value=tickers) as mock_request:
+                prices = fetcher.get_current_prices(['BTC/USDT', 'ETH'])
+                self.assertEqual(mock_request.call_count, 1)
+                self.assertEqual(mock_request.call_args[0][0], '/api/v3/ticker/24hr')
+                self.assertEqual(prices['ETHUSDT']['24h_change'], -2.0)
+
+                # 缓存有效期内不再请求
+                price = fetcher.get_current_price('BTC')
+                self.assertEqual(mock_request.call_count, 1)
+                self.assertEqual(price['price'], 100.0)
+        ticker_cache.clear()
+
+    def test_symbol_index_resolution(self):
+        """测试交易对解析索引支持各种写法并缓存未知币种"""
+        index = SymbolIndex({
+            'ETHBTC': {'baseAsset': 'ETH', 'quoteAsset': 'BTC'},
+            'ETHUSDT': {'baseAsset': 'ETH', 'quoteAsset': 'USDT'},
+            'PEPEFDUSD': {'baseAsset': 'PEPE', 'quoteAsset': 'FDUSD'},
+        })
+
+        self.assertEqual(index.resolve('ETH'), 'ETHUSDT')
+        self.assertEqual(index.resolve('eth/btc'), 'ETHBTC')
+        self.assertEqual(index.resolve('ETH/EUR'), 'ETHUSDT')
+        self.assertEqual(index.resolve('pepe'), 'PEPEFDUSD')
+        self.assertEqual(index.resolve('NOPE'), '')
+        self.assertIn('NOPE', index._unknown)
+
+    def test_analyze_arrays(self):
+        """测试TrendAnalyzer直接分析列式数据"""
+        arrays = KlineArrays.from_rows(make_rows(self.current_open - 120 * HOUR_MS, 120))
+        analysis = TrendAnalyzer.analyze_arrays(arrays)
+        self.assertNotIn('error', analysis)
+        self.assertEqual(analysis['overall_trend'], "上涨趋势")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+测试全市场筛选服务
+"""
+import sys
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.market_screener import MarketScreener, SNAPSHOT_MAX_AGE
+from tests.kline_helpers import make_arrays
+
+TRADING_PAIRS = {
+    'UPUSDT': {'baseAsset': 'UP', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+    'DOWNUSDT': {'baseAsset': 'DOWN', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+    'FLATUSDT': {'baseAsset': 'FLAT', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+    'NEWUSDT': {'baseAsset': 'NEW', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+    'UPBTC': {'baseAsset': 'UP', 'quoteAsset': 'BTC', 'status': 'TRADING'},
+}
+
+
+class FakeFetcher:
+    """按交易对返回固定K线的获取器"""
+
+    max_batch_workers = 4
+
+    def __init__(self):
+        rng = np.random.default_rng(5)
+        self.series = {
+            'UPUSDT': 100 * np.exp(np.linspace(0, 0.5, 100)),
+            'DOWNUSDT': 100 * np.exp(np.linspace(0, -0.5, 100)),
+            'FLATUSDT': 100 + rng.normal(0, 0.5, 100),
+            'NEWUSDT': 100 + np.arange(50.0),
+        }
+        self.calls = 0
+
+    def get_kline_arrays(self, symbol, timeframe, limit):
+        self.calls += 1
+        return make_arrays(self.series[symbol])
+
+    def get_current_prices(self, symbols):
+        changes = {'UPUSDT': 12.0, 'DOWNUSDT': -9.0, 'FLATUSDT': 0.5}
+        return {s: {'price': float(self.series[s][-1]), '24h_change': c, '24h_quote_volume': 1e6}
+                for s, c in changes.items()}
+
+
+class TestMarketScreener(unittest.TestCase):
+    """测试快照刷新与排序索引"""
+
+    def setUp(self):
+        self.fetcher = FakeFetcher()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.screener = MarketScreener(fetcher=self.fetcher, base_dir=self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_refresh_and_query(self):
+        """刷新后按预先排好的索引查询，不再请求数据"""
+        self.assertFalse(self.screener.query('top_gainers', '1h')['ready'])
+
+        with patch('services.market_screener.get_trading_pairs', return_value=TRADING_PAIRS):
+            self.screener.refresh('1h')
+        calls = self.fetcher.calls
+
+        gainers = self.screener.query('top_gainers', '1h', limit=2)
+        self.assertTrue(gainers['ready'])
+        self.assertEqual([row['symbol'] for row in gainers['results']], ['UPUSDT', 'NEWUSDT'])
+        self.assertEqual(self.screener.query('top_losers', '1h', limit=1)['results'][0]['symbol'], 'DOWNUSDT')
+        self.assertEqual(self.screener.query('overbought', '1h')['results'][0]['symbol'], 'UPUSDT')
+        self.assertIn('UPUSDT', [row['symbol'] for row in self.screener.query('ma_bullish', '1h')['results']])
+        self.assertEqual(self.fetcher.calls, calls)
+
+        overview = self.screener.overview('1h', limit=1)
+        self.assertEqual(overview['results']['top_losers'][0]['symbol'], 'DOWNUSDT')
+        self.assertIn('top_losers', overview['labels'])
+
+    def test_shared_snapshot(self):
+        """刷新进程写入的快照可被其他进程的筛选器读取，过期快照不返回"""
+        with patch('services.market_screener.get_trading_pairs', return_value=TRADING_PAIRS):
+            self.screener.refresh('1h')
+
+        reader = MarketScreener(fetcher=FakeFetcher(), base_dir=self.tmp_dir)
+        result = reader.query('top_losers', '1h', limit=1)
+        self.assertTrue(result['ready'])
+        self.assertEqual(result['results'][0]['symbol'], 'DOWNUSDT')
+        self.assertEqual(reader.get_snapshot('1h').indexes, self.screener.get_snapshot('1h').indexes)
+        self.assertIsNone(reader.get_snapshot('4h'))
+
+        with patch('services.market_screener.time.time', return_value=time.time() + SNAPSHOT_MAX_AGE + 1):
+            self.assertIsNone(reader.get_snapshot('1h'))
+
+    def test_refresh_skips_failed_symbol(self):
+        """单个交易对获取失败时跳过该交易对，其他交易对照常刷新"""
+        series = self.fetcher.series
+
+        def get_kline_arrays(symbol, timeframe, limit):
+            if symbol == 'FLATUSDT':
+                raise ValueError("malformed row")
+            return make_arrays(series[symbol])
+
+        self.fetcher.get_kline_arrays = get_kline_arrays
+        with patch('services.market_screener.get_trading_pairs', return_value=TRADING_PAIRS):
+            snapshot = self.screener.refresh('1h')
+        self.assertNotIn('FLATUSDT', snapshot.rows)
+        self.assertIn('UPUSDT', snapshot.rows)
+
+    def test_unknown_query(self):
+        """不支持的筛选条件抛出异常"""
+        with self.assertRaises(ValueError):
+            self.screener.query('moon', '1h')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+测试提示词构造与 token 预算
+"""
+import sys
+import os
+import unittest
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.prompt import PromptConstructor
+from utils.token_budget import count_message_tokens, count_tokens, truncate_to_tokens
+
+EXTRACTED = {"symbols": [], "time_window": "1h", "intent": "chat"}
+
+
+def make_history(turns: int):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"第{i}个问题：" + "比特币的走势怎么样" * 20})
+        history.append({"role": "assistant", "content": f"第{i}个回答：" + "这是一段很长的分析内容" * 30})
+    return history
+
+
+class TestPromptBudget(unittest.TestCase):
+    """测试预算内的消息组装"""
+
+    def test_render_candle_table(self):
+        """K线表格与逐行格式化结果一致"""
+        candles = pd.DataFrame({
+            'timestamp': pd.date_range('2024-01-01', periods=2),
+            'open': [1.0, 2.0], 'high': [1.5, 2.5], 'low': [0.5, 1.5], 'close': [1.2, 2.2], 'volume': [10.126, 20.0],
+        })
+        self.assertEqual(
+            PromptConstructor.render_candle_table(candles),
+            "- 2024-01-01: 开:1.0000 高:1.5000 低:0.5000 收:1.2000 量:10.13\n"
+            "- 2024-01-02: 开:2.0000 高:2.5000 低:1.5000 收:2.2000 量:20.00\n"
+        )
+
+    def test_small_history_kept(self):
+        """预算充足时保留全部历史，并去掉与当前输入重复的最后一条用户消息"""
+        history = make_history(1) + [{"role": "user", "content": "现在呢"}]
+        messages, stats = PromptConstructor.build_prompt("现在呢", EXTRACTED, {}, {}, history, token_budget=100000)
+        self.assertEqual(stats['history_kept'], 2)
+        self.assertEqual(messages[1:3], history[:2])
+        self.assertEqual([m['content'] for m in messages].count("现在呢"), 0)
+        self.assertEqual(stats['tokens'], count_message_tokens(messages))
+
+    def test_old_turns_summarized(self):
+        """超出预算时保留最新的消息，较早的对话压缩为摘要"""
+        history = make_history(5)
+        messages, stats = PromptConstructor.build_prompt("现在呢", EXTRACTED, {}, {}, history, token_budget=2500)
+        self.assertLessEqual(stats['tokens'], 2500)
+        self.assertGreater(stats['history_kept'], 0)
+        self.assertLess(stats['history_kept'], len(history))
+        self.assertEqual(stats['history_kept'] + stats['history_summarized'], len(history))
+        self.assertTrue(messages[1]['content'].startswith("[较早的对话摘要]"))
+        # 保留的是最新的消息
+        self.assertEqual(messages[-2], history[-1])
+
+    def test_truncate_to_tokens(self):
+        """截断后不超过 token 上限"""
+        text = "比特币" * 100
+        truncated = truncate_to_tokens(text, 20)
+        self.assertLessEqual(count_tokens(truncated), 20)
+        self.assertTrue(truncated.endswith("…"))
+        self.assertEqual(truncate_to_tokens("短文本", 20), "短文本")
+
+
+if __name__ == "__main__":
+    unittest.main()
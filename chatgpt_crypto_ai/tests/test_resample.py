@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+测试K线重采样模块
+"""
+import sys
+import os
+import unittest
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.resample import choose_base_interval, resample_arrays, multi_timeframe_arrays, INTERVAL_MS
+from utils.kline_store import KlineArrays
+from utils.trend_analyzer import TrendAnalyzer
+from tests.kline_helpers import make_arrays
+
+HOUR_MS = INTERVAL_MS['1h']
+
+
+def make_hourly(n, start_hour=0) -> KlineArrays:
+    rng = np.random.default_rng(3)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return make_arrays(
+        close, start_ms=start_hour * HOUR_MS,
+        open=close - 0.5,
+        high=close + rng.uniform(0, 2, n),
+        low=close - rng.uniform(0, 2, n),
+        volume=rng.uniform(1, 10, n),
+        trades_count=10,
+    )
+
+
+class TestResample(unittest.TestCase):
+    """测试OHLCV聚合"""
+
+    def test_choose_base_interval(self):
+        """选择能整除所有目标周期的最粗基础周期"""
+        self.assertEqual(choose_base_interval(('1h', '4h', '1d')), '1h')
+        self.assertEqual(choose_base_interval(['15m', '1h', '4h']), '5m')
+        with self.assertRaises(ValueError):
+            choose_base_interval(('1w',))
+
+    def test_resample_matches_loop(self):
+        """与逐周期聚合结果一致，丢弃开头不完整的周期，保留最后未走完的周期"""
+        hourly = make_hourly(101, start_hour=2)
+        four_hour = resample_arrays(hourly, '1h', '4h')
+
+        # 前两根K线属于不完整的 00:00 周期，之后 99 根K线组成 25 个周期（最后一个只有3根）
+        self.assertEqual(len(four_hour), 25)
+        self.assertEqual(int(four_hour.timestamp[0]), 4 * HOUR_MS)
+        for i in range(len(four_hour)):
+            chunk = slice(2 + 4 * i, min(2 + 4 * (i + 1), 101))
+            self.assertEqual(four_hour.open[i], hourly.open[chunk][0])
+            self.assertEqual(four_hour.close[i], hourly.close[chunk][-1])
+            self.assertEqual(four_hour.high[i], hourly.high[chunk].max())
+            self.assertEqual(four_hour.low[i], hourly.low[chunk].min())
+            self.assertAlmostEqual(four_hour.volume[i], hourly.volume[chunk].sum())
+        self.assertEqual(four_hour.close_time[0], 8 * HOUR_MS - 1)
+
+        self.assertIs(resample_arrays(hourly, '1h', '1h'), hourly)
+        with self.assertRaises(ValueError):
+            resample_arrays(hourly, '1h', '15m')
+
+    def test_multi_timeframe_single_fetch(self):
+        """多周期汇总只请求一次基础周期K线"""
+        calls = []
+
+        class FakeFetcher:
+            def get_kline_arrays(self, symbol, timeframe, limit):
+                calls.append((symbol, timeframe, limit))
+                return make_hourly(1000)
+
+        frames = multi_timeframe_arrays(FakeFetcher(), 'BTC/USDT')
+        self.assertEqual(calls, [('BTC/USDT', '1h', 1000)])
+        self.assertEqual({tf: len(a) for tf, a in frames.items()}, {'1h': 1000, '4h': 250, '1d': 42})
+
+        summary = TrendAnalyzer.analyze_timeframes(frames)
+        self.assertEqual(set(summary), {'1h', '4h', '1d'})
+        self.assertEqual(summary['1d']['bars'], 42)
+        # 日线不足99根，不给出均线排列
+        self.assertIsNone(summary['1d']['ma_trend'])
+        self.assertIsNotNone(summary['1h']['ma_trend'])
+
+
+if __name__ == "__main__":
+    unittest.main()
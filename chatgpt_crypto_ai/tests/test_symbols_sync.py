@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+测试交易对缓存同步模块
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.symbols_sync as symbols_sync
+
+TRADING_PAIRS = {
+    'ETHUSDT': {'baseAsset': 'ETH', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+    'BTCUSDT': {'baseAsset': 'BTC', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+}
+
+
+class TestSymbolsSnapshot(unittest.TestCase):
+    """测试进程内交易对快照"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmp_dir, "binance_symbols.json")
+        self.patches = [
+            patch.object(symbols_sync, 'SYMBOLS_CACHE_FILE', self.cache_file),
+            patch.object(symbols_sync, '_snapshot', None),
+            patch.object(symbols_sync, '_snapshot_mtime', None),
+            patch.object(symbols_sync, '_snapshot_checked_at', 0.0),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def write_cache(self, symbols_dict, base_coins, timestamp=None):
+        with open(self.cache_file, 'w') as f:
+            json.dump({
+                "timestamp": int(time.time()) if timestamp is None else timestamp,
+                "symbols_dict": symbols_dict,
+                "base_coins": base_coins,
+            }, f)
+
+    def test_snapshot_views(self):
+        """快照提供排序后的只读视图"""
+        self.write_cache(TRADING_PAIRS, ['ETH', 'BTC'])
+
+        snapshot = symbols_sync.get_symbols_snapshot()
+        self.assertEqual(snapshot.base_coins, ('BTC', 'ETH'))
+        self.assertEqual(snapshot.trading_pairs, ('BTCUSDT', 'ETHUSDT'))
+        self.assertIn('ETH', snapshot.base_coin_set)
+        with self.assertRaises(TypeError):
+            snapshot.symbols_dict['XRPUSDT'] = {}
+        self.assertEqual(symbols_sync.get_all_symbols(), ['BTC', 'ETH'])
+
+    def test_reload_only_on_mtime_change(self):
+        """文件未变化时不重复读取，mtime变化后重新加载"""
+        self.write_cache(TRADING_PAIRS, ['ETH', 'BTC'])
+
+        with patch.object(symbols_sync, 'read_symbols_cache_file',
+                          wraps=symbols_sync.read_symbols_cache_file) as mock_read:
+            first = symbols_sync.get_symbols_snapshot()
+            self.assertIs(symbols_sync.get_trading_pairs(), first.symbols_dict)
+            self.assertEqual(mock_read.call_count, 1)
+
+            pairs = dict(TRADING_PAIRS, SOLUSDT={'baseAsset': 'SOL', 'quoteAsset': 'USDT'})
+            self.write_cache(pairs, ['ETH', 'BTC', 'SOL'])
+            stat = os.stat(self.cache_file)
+            os.utime(self.cache_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+            second = symbols_sync.get_symbols_snapshot()
+            self.assertEqual(mock_read.call_count, 2)
+            self.assertEqual(second.base_coins, ('BTC', 'ETH', 'SOL'))
+
+    def test_same_snapshot_after_memory_ttl(self):
+        """超过 MEMORY_CACHE_TTL 但文件未变化时返回同一个快照对象"""
+        self.write_cache(TRADING_PAIRS, ['ETH', 'BTC'])
+        first = symbols_sync.get_symbols_snapshot()
+
+        symbols_sync._snapshot_checked_at = 0.0
+        with patch.object(symbols_sync, 'read_symbols_cache_file') as mock_read:
+            self.assertIs(symbols_sync.get_symbols_snapshot(), first)
+        mock_read.assert_not_called()
+        self.assertGreater(symbols_sync._snapshot_checked_at, 0.0)
+
+    def test_expired_cache_served_while_refreshing(self):
+        """缓存过期时立即返回旧数据，并在后台刷新"""
+        self.write_cache(TRADING_PAIRS, ['ETH', 'BTC'], timestamp=0)
+
+        with patch.object(symbols_sync, 'schedule_symbols_refresh', return_value=True) as mock_schedule, \
+                patch.object(symbols_sync, 'fetch_binance_symbols') as mock_fetch:
+            snapshot = symbols_sync.get_symbols_snapshot()
+
+        mock_schedule.assert_called_once()
+        mock_fetch.assert_not_called()
+        self.assertEqual(snapshot.base_coins, ('BTC', 'ETH'))
+
+    def test_refresh_skips_fresh_cache_and_writes_atomically(self):
+        """刷新时缓存仍有效则不下载，保存缓存不留下临时文件"""
+        self.write_cache(TRADING_PAIRS, ['ETH', 'BTC'])
+        with patch.object(symbols_sync, 'CACHE_DIR', self.tmp_dir), \
+                patch.object(symbols_sync, 'SYMBOLS_LOCK_FILE', os.path.join(self.tmp_dir, 'symbols.lock')), \
+                patch.object(symbols_sync, 'fetch_binance_symbols') as mock_fetch:
+            self.assertTrue(symbols_sync.refresh_symbols_cache())
+            mock_fetch.assert_not_called()
+
+            symbols_sync.save_symbols_cache(TRADING_PAIRS, ['BTC', 'ETH'])
+
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['binance_symbols.json', 'symbols.lock'])
+        self.assertEqual(symbols_sync.read_symbols_cache_file()["base_coins"], ['BTC', 'ETH'])
+
+
+if __name__ == '__main__':
+    unittest.main()
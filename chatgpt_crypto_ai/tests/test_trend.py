@@ -109,6 +109,24 @@ class TestTrendAnalyzer(unittest.TestCase):
         for level in sr_bullish['support']:
             self.assertLess(level, current_price)
 
+    def test_find_pivots_matches_window_scan(self):
+        """测试向量化极值点与逐点扫描结果一致（包括相等值）"""
+        values = np.round(np.random.normal(100, 2, 300), 0)
+        window = 10
+        expected = [
+            values[i] for i in range(window, len(values) - window)
+            if values[i] <= values[i-window:i].min() and values[i] <= values[i+1:i+window+1].min()
+        ]
+        result = TrendAnalyzer._find_pivots(values, window, np.fmin, np.less_equal)
+        self.assertEqual(result, expected)
+
+    def test_cluster_price_levels(self):
+        """测试价位聚类"""
+        clusters = TrendAnalyzer._cluster_price_levels([100.0, 120.0, 100.5, 99.8, 121.0])
+        self.assertEqual(len(clusters), 2)
+        self.assertAlmostEqual(clusters[0], (99.8 + 100.0 + 100.5) / 3)
+        self.assertAlmostEqual(clusters[1], 120.5)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+趋势分析结果缓存
+
+同一交易对、同一周期在同一根K线内的分析结果完全相同，因此以
+(symbol, interval, K线数量, 最后一根K线开盘时间, 最后收盘价) 为键缓存；
+最后一根K线的价格变化或新K线出现时键自然改变，不需要主动失效。
+
+多个请求同时分析同一个键时只计算一次（single-flight），其余请求等待并共享结果。
+"""
+import copy
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from utils.ttl_cache import TTLCache
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('analysis_cache')
+
+# 缓存容量与兜底过期时间（键已包含最后一根K线，过期时间只用于回收不再访问的条目）
+ANALYSIS_CACHE_MAXSIZE = 1024
+ANALYSIS_CACHE_TTL = 3600  # 秒
+
+_MISSING = object()
+
+
+class AnalysisCache:
+    """
+    带 LRU 淘汰、命中统计和并发合并的分析结果缓存
+    """
+
+    def __init__(self, maxsize: int = ANALYSIS_CACHE_MAXSIZE, ttl: float = ANALYSIS_CACHE_TTL):
+        self._cache = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.shared = 0  # 等待其他请求计算结果的次数
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        获取缓存的分析结果，不存在时计算；同一个键的并发请求只计算一次
+
+        包含 "error" 的结果不会被缓存。返回值是副本，调用方可以自由修改。
+
+        Args:
+            key: 缓存键
+            compute: 计算分析结果的函数
+
+        Returns:
+            Dict: 分析结果
+        """
+        result = self._cache.get(key, _MISSING)
+        if result is not _MISSING:
+            return copy.deepcopy(result)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                # 上一次计算可能在检查缓存之后刚刚完成
+                result = self._cache.get(key, _MISSING)
+                if result is not _MISSING:
+                    return copy.deepcopy(result)
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.shared += 1
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = compute()
+            if 'error' not in result:
+                self._cache.set(key, result)
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+        return copy.deepcopy(result)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计：命中、未命中、合并的并发请求数"""
+        stats = self._cache.get_stats()
+        stats['shared'] = self.shared
+        stats['inflight'] = len(self._inflight)
+        return stats
+
+
+# 全局分析结果缓存
+analysis_cache = AnalysisCache()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+回答缓存：同一根K线内相同的行情问题直接复用上一次的回答
+
+缓存键为 (意图, 币种, 时间周期, 每个币种最后一根K线的开盘时间, 规范化后的问题)。
+新K线出现时键自然改变；条目的过期时间与周期挂钩：分析类回答最多保留到当前K线
+结束且不超过 ANALYZE_MAX_TTL 秒（长周期的K线内价格仍在变化），价格监控类回答
+因为引用实时价格，最多保留 MONITOR_MAX_TTL 秒。
+
+只缓存 analyze 和 monitor 意图；trade（交易建议）和 chat 不缓存。回答由对话历史
+参与生成，可能引用用户之前的对话，所以只缓存会话中的第一个问题（上下文中只有
+当前消息），避免把一个用户的回答回放给其他用户。
+"""
+import time
+import logging
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from utils.intent_cache import normalize_message
+from utils.resample import INTERVAL_MS
+from utils.ttl_cache import TTLCache
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('answer_cache')
+
+# 可以缓存回答的意图
+CACHEABLE_INTENTS = ('analyze', 'monitor')
+
+# 价格监控回答的最长保留时间（秒）
+MONITOR_MAX_TTL = 60
+
+# 分析回答的最长保留时间（秒），日线等长周期也不超过这个时间
+ANALYZE_MAX_TTL = 900
+
+# 剩余时间太短时不再缓存（秒）
+MIN_TTL = 5
+
+# 缓存容量
+ANSWER_CACHE_MAXSIZE = 2048
+
+# 回放缓存回答时每个流式片段的字符数
+REPLAY_CHUNK_CHARS = 24
+
+# 不在 INTERVAL_MS 中的周期（秒）
+_LONG_INTERVALS = {'1w': 7 * 86400, '1M': 30 * 86400}
+
+
+def interval_seconds(timeframe: str) -> int:
+    """时间周期的秒数，未知周期按1小时处理"""
+    if timeframe in INTERVAL_MS:
+        return INTERVAL_MS[timeframe] // 1000
+    return _LONG_INTERVALS.get(timeframe, 3600)
+
+
+def make_answer_key(intent: str, symbols: Iterable[str], timeframe: str,
+                    price_data: Dict[str, pd.DataFrame], question: str,
+                    context: Optional[List[Dict[str, str]]] = None) -> Optional[Hashable]:
+    """
+    生成回答缓存键
+
+    Args:
+        intent: 意图
+        symbols: 交易对（price_data 的键）
+        timeframe: 时间周期
+        price_data: 交易对到K线DataFrame的映射
+        question: 用户问题
+        context: 构造提示词使用的对话上下文（可包含当前消息）
+
+    Returns:
+        Optional[Hashable]: 缓存键；意图不可缓存、缺少K线或有对话历史时为None
+    """
+    if intent not in CACHEABLE_INTENTS:
+        return None
+    if any(msg.get("content") != question for msg in context or []):
+        return None
+    symbols = tuple(sorted(set(symbols)))
+    if not symbols:
+        return None
+
+    last_open = []
+    for symbol in symbols:
+        frame = price_data.get(symbol)
+        if frame is None or frame.empty:
+            return None
+        last_open.append(int(pd.Timestamp(frame['timestamp'].iloc[-1]).value // 1_000_000))
+
+    return (intent, symbols, timeframe, tuple(last_open), normalize_message(question))
+
+
+def answer_ttl(key: Hashable, now: Optional[float] = None) -> float:
+    """
+    计算回答的过期时间（秒）：分析类到当前K线结束且最多 ANALYZE_MAX_TTL，
+    价格监控类最多 MONITOR_MAX_TTL
+
+    Args:
+        key: make_answer_key 生成的键
+        now: 当前时间戳（秒），默认 time.time()
+
+    Returns:
+        float: 过期时间，为0时不应缓存
+    """
+    intent, _, timeframe, last_open, _ = key
+    now = time.time() if now is None else now
+    period = interval_seconds(timeframe)
+    candle_end = min(last_open) / 1000 + period
+    ttl = min(candle_end - now, period, MONITOR_MAX_TTL if intent == 'monitor' else ANALYZE_MAX_TTL)
+    return ttl if ttl >= MIN_TTL else 0
+
+
+class AnswerCache:
+    """
+    进程内的回答缓存
+    """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_MAXSIZE):
+        self._cache = TTLCache(ttl=3600, maxsize=maxsize)
+
+    def get(self, key: Optional[Hashable]) -> Optional[str]:
+        """获取缓存的回答"""
+        if key is None:
+            return None
+        answer = self._cache.get(key)
+        if answer is not None:
+            logger.info(f"回答缓存命中: {key[0]} {key[1]} {key[2]}")
+        return answer
+
+    def set(self, key: Optional[Hashable], answer: str) -> None:
+        """缓存回答，过期时间见 answer_ttl"""
+        if key is None or not answer:
+            return
+        ttl = answer_ttl(key)
+        if ttl > 0:
+            self._cache.set(key, answer, ttl=ttl)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._cache.clear()
+
+    def get_stats(self):
+        """获取缓存统计"""
+        return self._cache.get_stats()
+
+
+def replay_chunks(answer: str, size: int = REPLAY_CHUNK_CHARS) -> Iterator[str]:
+    """把缓存的回答切成片段，用于流式回放"""
+    for start in range(0, len(answer), size):
+        yield answer[start:start + size]
+
+
+# 全局回答缓存
+answer_cache = AnswerCache()
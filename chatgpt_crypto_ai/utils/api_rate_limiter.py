@@ -145,9 +145,101 @@ class APIRateLimiter:
             )
         }
 
+class WeightBudget:
+    """
+    按请求权重限流的滑动窗口预算
+
+    币安按 IP 统计每分钟的请求权重（REQUEST_WEIGHT），不同端点权重不同，
+    超限会返回 429，持续超限会返回 418 并封禁 IP。多个线程共享同一个预算，
+    每次请求前先申请对应权重，预算不足时等待最早的权重过期。
+    """
+    
+    def __init__(self, limit_per_minute: int, safety_ratio: float = 0.9):
+        """
+        Args:
+            limit_per_minute: 交易所公布的每分钟权重上限
+            safety_ratio: 实际使用的比例，为其他进程和误差留出余量
+        """
+        self.limit = int(limit_per_minute * safety_ratio)
+        self._lock = threading.Lock()
+        self._history = deque()  # (时间戳, 权重)
+        self._used = 0
+        self._blocked_until = 0.0
+    
+    def _cleanup(self, now: float) -> None:
+        """清理一分钟之前的权重记录（调用方需持有锁）"""
+        while self._history and now - self._history[0][0] >= 60.0:
+            _, weight = self._history.popleft()
+            self._used -= weight
+    
+    def acquire(self, weight: int = 1) -> float:
+        """
+        申请请求权重，预算不足时阻塞等待
+        
+        Args:
+            weight: 本次请求的权重
+            
+        Returns:
+            float: 实际等待的秒数
+        """
+        weight = min(weight, self.limit)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                self._cleanup(now)
+                
+                if now < self._blocked_until:
+                    wait_time = self._blocked_until - now
+                elif self._used + weight <= self.limit:
+                    self._history.append((now, weight))
+                    self._used += weight
+                    return waited
+                else:
+                    wait_time = 60.0 - (now - self._history[0][0])
+            
+            logger.debug(f"请求权重预算不足，等待 {wait_time:.2f} 秒")
+            time.sleep(max(wait_time, 0.01))
+            waited += max(wait_time, 0.01)
+    
+    def sync_used_weight(self, used_weight: int) -> None:
+        """
+        根据交易所返回的已用权重（如 X-MBX-USED-WEIGHT-1M）校正本地统计
+        
+        其他进程或机器共享同一出口 IP 时，服务端统计会高于本地统计，
+        此时补记差额，使本地预算不会超发。
+        """
+        with self._lock:
+            now = time.time()
+            self._cleanup(now)
+            if used_weight > self._used:
+                extra = used_weight - self._used
+                self._history.append((now, extra))
+                self._used += extra
+    
+    def block_for(self, seconds: float) -> None:
+        """收到 429/418 后在指定时间内暂停所有请求"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.time() + seconds)
+        logger.warning(f"触发交易所限流，暂停请求 {seconds:.0f} 秒")
+    
+    def get_stats(self) -> Dict:
+        """获取预算使用情况"""
+        with self._lock:
+            self._cleanup(time.time())
+            return {
+                'limit': self.limit,
+                'used_last_minute': self._used,
+                'blocked_until': self._blocked_until,
+            }
+
+
 # 全局速率限制器实例
 rate_limiter = APIRateLimiter()
 
+# 币安现货 REQUEST_WEIGHT 限制为每 IP 每分钟 6000
+binance_weight_budget = WeightBudget(limit_per_minute=6000)
+
 def with_rate_limit(exchange: str, endpoint: str = 'default'):
     """
     装饰器：为API调用添加速率限制
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+信号回测模块：在本地存储的K线上回放 TrendAnalyzer 使用的交易规则
+
+所有规则都先用数组运算生成持仓序列（1 做多 / -1 做空 / 0 空仓），
+再由持仓变化点切分出每笔交易，全程没有逐根K线的Python循环。
+信号在K线收盘时产生，按该K线收盘价进出场。
+"""
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from utils.indicators import compute_indicators, TREND_MA_WINDOWS
+from utils.kline_store import KlineArrays, kline_store
+from utils.ttl_cache import TTLCache
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('backtest')
+
+# 回测使用的K线数量
+BACKTEST_KLINES = 1000
+
+# 单边手续费（币安现货默认0.1%）
+DEFAULT_FEE = 0.001
+
+# 回测结果缓存：(symbol, interval, rule) -> 结果，K线更新后重新计算
+BACKTEST_CACHE_TTL = 900  # 秒
+backtest_cache = TTLCache(ttl=BACKTEST_CACHE_TTL, maxsize=2048)
+
+# 已补齐过的序列：(symbol, interval) -> True；上市不久的交易对历史本来就不足，过期前不再重复请求
+backfilled_series = TTLCache(ttl=BACKTEST_CACHE_TTL, maxsize=2048)
+
+# 支持的规则及说明
+BACKTEST_RULES = {
+    'ma_stack': "均线多空排列（MA7/MA25/MA99多头排列做多，空头排列做空）",
+    'rsi': "RSI超买超卖（RSI<30做多、>70做空，回到50平仓）",
+    'macd_cross': "MACD金叉死叉（金叉做多，死叉做空）",
+}
+
+
+def _forward_fill(events: np.ndarray) -> np.ndarray:
+    """把事件序列（NaN表示无事件）向前填充为持仓状态，第一个事件之前为0"""
+    valid = ~np.isnan(events)
+    idx = np.where(valid, np.arange(len(events)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    filled = events[idx]
+    filled[~valid & (np.cumsum(valid) == 0)] = 0.0
+    return np.nan_to_num(filled)
+
+
+def rule_positions(rule: str, close: np.ndarray) -> np.ndarray:
+    """
+    根据规则生成持仓序列
+
+    Args:
+        rule: 规则名称，见 BACKTEST_RULES
+        close: 收盘价
+
+    Returns:
+        np.ndarray: 每根K线收盘后的持仓（1/-1/0）
+    """
+    indicators = compute_indicators(close, ma_windows=TREND_MA_WINDOWS)
+
+    if rule == 'ma_stack':
+        ma7, ma25, ma99 = (indicators.ma[window] for window in TREND_MA_WINDOWS)
+        return np.where((ma7 > ma25) & (ma25 > ma99), 1.0,
+                        np.where((ma7 < ma25) & (ma25 < ma99), -1.0, 0.0))
+
+    if rule == 'macd_cross':
+        # 金叉后持有多单直到死叉，反之亦然
+        hist = indicators.macd_hist
+        return np.sign(hist)
+
+    if rule == 'rsi':
+        rsi = indicators.rsi
+        prev = np.concatenate([[np.nan], rsi[:-1]])
+        crossed_mid = ((prev < 50) & (rsi >= 50)) | ((prev > 50) & (rsi <= 50))
+        events = np.full(len(close), np.nan)
+        events[crossed_mid] = 0.0
+        events[rsi < 30] = 1.0
+        events[rsi > 70] = -1.0
+        return _forward_fill(events)
+
+    raise ValueError(f"不支持的回测规则: {rule}")
+
+
+def evaluate_positions(close: np.ndarray, positions: np.ndarray, fee: float = DEFAULT_FEE) -> Dict[str, Any]:
+    """
+    根据持仓序列统计交易表现
+
+    Args:
+        close: 收盘价
+        positions: 持仓序列
+        fee: 单边手续费率
+
+    Returns:
+        Dict: 交易次数、胜率、期望收益、平均盈亏、最大回撤等（百分比）
+    """
+    close = np.asarray(close, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.float64)
+    n = len(close)
+
+    # 持仓变化点：每段持仓的起点和下一段的起点
+    changes = np.flatnonzero(np.diff(positions)) + 1
+    starts = np.concatenate([[0], changes])
+    ends = np.concatenate([changes, [n - 1]])
+    sides = positions[starts]
+    closed = np.concatenate([np.ones(len(changes), dtype=bool), [False]])
+    trade = (sides != 0) & closed
+
+    entry, exit_, side = starts[trade], ends[trade], sides[trade]
+    trade_returns = side * (close[exit_] / close[entry] - 1) - 2 * fee
+
+    # 资金曲线：持仓在下一根K线获得收益，换仓时扣除手续费
+    bar_returns = np.zeros(n)
+    bar_returns[1:] = positions[:-1] * (close[1:] / close[:-1] - 1)
+    turnover = np.abs(np.diff(np.concatenate([[0.0], positions])))
+    bar_returns -= turnover * fee
+    equity = np.cumprod(1 + bar_returns)
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+
+    wins = trade_returns[trade_returns > 0]
+    losses = trade_returns[trade_returns <= 0]
+    count = len(trade_returns)
+    return {
+        'trades': int(count),
+        'win_rate': float(len(wins) / count * 100) if count else None,
+        'expectancy': float(trade_returns.mean() * 100) if count else None,
+        'avg_win': float(wins.mean() * 100) if len(wins) else None,
+        'avg_loss': float(losses.mean() * 100) if len(losses) else None,
+        'avg_bars': float((exit_ - entry).mean()) if count else None,
+        'total_return': float((equity[-1] - 1) * 100) if n else 0.0,
+        'max_drawdown': float(drawdown.min() * 100) if n else 0.0,
+        'exposure': float(np.mean(positions != 0) * 100) if n else 0.0,
+        'open_position': int(positions[-1]) if n else 0,
+    }
+
+
+def backtest_arrays(arrays: KlineArrays, rule: str, fee: float = DEFAULT_FEE) -> Dict[str, Any]:
+    """
+    在列式K线上回测一条规则
+
+    Args:
+        arrays: 按开盘时间升序的K线
+        rule: 规则名称
+        fee: 单边手续费率
+
+    Returns:
+        Dict: 回测统计，附带规则、K线数量和时间范围
+    """
+    close = np.asarray(arrays.close, dtype=np.float64)
+    result = evaluate_positions(close, rule_positions(rule, close), fee)
+    result.update({
+        'rule': rule,
+        'description': BACKTEST_RULES[rule],
+        'bars': len(arrays),
+        'start': int(arrays.timestamp[0]) if len(arrays) else None,
+        'end': arrays.last_open_time,
+    })
+    return result
+
+
+def backtest_symbol(symbol: str, interval: str, rule: str, fetcher=None,
+                    klines: int = BACKTEST_KLINES) -> Optional[Dict[str, Any]]:
+    """
+    回测某个交易对的一条规则，结果按 (symbol, interval, rule) 缓存
+
+    使用本地存储的已收盘K线；存储中出现新K线后缓存自动失效。缓存未命中且数量不足时
+    通过 fetcher 补齐（增量写入本地存储），同一序列在 BACKTEST_CACHE_TTL 内只补齐一次。
+
+    Args:
+        symbol: 币安交易对，如 'BTCUSDT'
+        interval: 币安时间周期
+        rule: 规则名称
+        fetcher: KlineDataFetcher，存储不足时用于补齐数据
+        klines: 回测使用的K线数量
+
+    Returns:
+        Optional[Dict]: 回测统计，数据不足时为None
+    """
+    if rule not in BACKTEST_RULES:
+        raise ValueError(f"不支持的回测规则: {rule}")
+
+    key = (symbol, interval, rule)
+    stored = kline_store.load(symbol, interval)
+    cached = backtest_cache.get(key)
+    if cached is not None and cached['end'] == stored.last_open_time:
+        return cached
+
+    if len(stored) < klines and fetcher is not None and not backfilled_series.get((symbol, interval)):
+        try:
+            fetcher.get_kline_arrays(symbol, interval, klines)
+            backfilled_series.set((symbol, interval), True)
+            stored = kline_store.load(symbol, interval)
+        except Exception as e:
+            logger.error(f"获取回测K线失败 {symbol} {interval}: {str(e)}")
+
+    if len(stored) < max(TREND_MA_WINDOWS) + 2:
+        return None
+
+    cached = backtest_cache.get(key)
+    if cached is not None and cached['end'] == stored.last_open_time:
+        return cached
+
+    result = backtest_arrays(stored.tail(klines), rule)
+    backtest_cache.set(key, result)
+    return result
+
+
+def backtest_all_rules(symbol: str, interval: str, fetcher=None) -> Dict[str, Dict[str, Any]]:
+    """
+    回测所有规则
+
+    Returns:
+        Dict[str, Dict]: 规则名称到回测统计的映射（数据不足的规则不包含在内）
+    """
+    results = {}
+    for rule in BACKTEST_RULES:
+        result = backtest_symbol(symbol, interval, rule, fetcher)
+        if result is not None:
+            results[rule] = result
+    return results
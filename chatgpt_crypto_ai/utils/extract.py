@@ -4,17 +4,16 @@
 """
 import re
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple, Iterable
 
 # 尝试导入币种同步模块
 try:
-    from utils.symbols_sync import get_all_symbols
-    # 从 Bybit API 获取实时币种列表
-    BYBIT_SYMBOLS = get_all_symbols()
-    logging.info(f"从 Bybit API 加载了 {len(BYBIT_SYMBOLS)} 个币种符号")
+    from utils.symbols_sync import get_symbols_snapshot
 except Exception as e:
-    logging.error(f"加载 Bybit 币种失败: {str(e)}")
-    BYBIT_SYMBOLS = []
+    logging.error(f"加载币种同步模块失败: {str(e)}")
+    get_symbols_snapshot = None
 
 # 常见加密货币符号列表 - 确保关键币种始终存在
 COMMON_CRYPTO_SYMBOLS = [
@@ -24,8 +23,8 @@ COMMON_CRYPTO_SYMBOLS = [
     "NEO", "QNT", "FTM", "MANA", "AXS", "GRT", "SAND", "LUNA", "GALA", "ONE"
 ]
 
-# 结合 API 和静态列表生成完整币种列表
-ALL_CRYPTO_SYMBOLS = list(set(COMMON_CRYPTO_SYMBOLS + BYBIT_SYMBOLS))
+# 交易对连写时可能紧跟在币种后面的计价币种，如 BTCUSDT
+PAIR_QUOTE_SUFFIXES = ("USDT", "BUSD", "USDC", "BTC", "ETH")
 
 # 特殊处理的加密货币名称与符号映射
 CRYPTO_NAME_TO_SYMBOL = {
@@ -85,6 +84,144 @@ TIME_WINDOW_MAP = {
     "month": "1M",
 }
 
+def _is_word_char(ch: str) -> bool:
+    """是否为币种符号的组成字符（ASCII字母或数字），中文和标点都视为分隔"""
+    return ch.isascii() and ch.isalnum()
+
+
+class CoinMentionMatcher:
+    """
+    币种提及匹配器（Aho-Corasick 自动机）
+
+    一次遍历文本即可找出所有币种符号（BTC、BTC/USDT、BTCUSDT）以及中英文名称。
+    币种符号要求两侧不是ASCII字母或数字，名称按子串匹配；均不区分大小写。
+    """
+
+    def __init__(self, symbols: Iterable[str], names: Dict[str, str]):
+        """
+        构建自动机
+
+        Args:
+            symbols: 币种符号
+            names: 名称到币种符号的映射
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态结束的模式: (模式长度, 币种符号, 是否为币种符号)
+        self._output: List[List[Tuple[int, str, bool]]] = [[]]
+
+        for symbol in symbols:
+            if symbol:
+                self._add(symbol.upper(), symbol.upper(), True)
+        for name, symbol in names.items():
+            self._add(name.upper(), symbol, False)
+        self._build_fail_links()
+
+    def _add(self, pattern: str, symbol: str, is_ticker: bool) -> None:
+        """向字典树中加入一个模式"""
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), symbol, is_ticker))
+
+    def _build_fail_links(self) -> None:
+        """按广度优先构建失败指针，并合并后缀状态的输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+                queue.append(next_state)
+
+    @staticmethod
+    def _ticker_bounded(text: str, start: int, end: int) -> bool:
+        """币种符号两侧是否为分隔符（右侧允许紧跟计价币种，如 BTCUSDT）"""
+        if start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if end >= len(text) or not _is_word_char(text[end]):
+            return True
+        for quote in PAIR_QUOTE_SUFFIXES:
+            quote_end = end + len(quote)
+            if text.startswith(quote, end) and (quote_end >= len(text) or not _is_word_char(text[quote_end])):
+                return True
+        return False
+
+    def find(self, text: str) -> List[str]:
+        """
+        找出文本中提及的币种
+
+        Args:
+            text: 用户输入的文本
+
+        Returns:
+            List[str]: 币种符号列表，按在文本中首次出现的位置排序
+        """
+        upper_text = text.upper()
+        goto, fail, output = self._goto, self._fail, self._output
+        first_seen: Dict[str, int] = {}
+        state = 0
+
+        for end, ch in enumerate(upper_text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, symbol, is_ticker in output[state]:
+                start = end - length
+                if symbol in first_seen and first_seen[symbol] <= start:
+                    continue
+                if is_ticker and not self._ticker_bounded(upper_text, start, end):
+                    continue
+                first_seen[symbol] = start
+
+        return sorted(first_seen, key=first_seen.get)
+
+
+# 当前使用的匹配器及其对应的币种列表，币种列表变化时重建
+_coin_matcher: Optional[CoinMentionMatcher] = None
+_coin_matcher_source: Optional[Tuple[str, ...]] = None
+_coin_matcher_lock = threading.Lock()
+
+
+def get_coin_matcher() -> CoinMentionMatcher:
+    """
+    获取币种匹配器，只有币安币种列表变化时才重新构建
+
+    Returns:
+        CoinMentionMatcher: 币种匹配器
+    """
+    global _coin_matcher, _coin_matcher_source
+
+    base_coins: Tuple[str, ...] = ()
+    if get_symbols_snapshot is not None:
+        try:
+            base_coins = get_symbols_snapshot().base_coins
+        except Exception as e:
+            logging.error(f"加载币安币种失败: {str(e)}")
+
+    matcher = _coin_matcher
+    if matcher is not None and (base_coins is _coin_matcher_source or base_coins == _coin_matcher_source):
+        return matcher
+
+    with _coin_matcher_lock:
+        if _coin_matcher is None or base_coins != _coin_matcher_source:
+            symbols = dict.fromkeys(COMMON_CRYPTO_SYMBOLS + list(base_coins))
+            _coin_matcher = CoinMentionMatcher(symbols, CRYPTO_NAME_TO_SYMBOL)
+            logging.info(f"币种匹配器已构建，共 {len(symbols)} 个币种符号")
+        _coin_matcher_source = base_coins
+        return _coin_matcher
+
+
 def extract_crypto_symbols(text: str) -> List[str]:
     """
     从文本中提取加密货币符号
@@ -95,46 +232,9 @@ def extract_crypto_symbols(text: str) -> List[str]:
     Returns:
         List[str]: 提取出的加密货币符号列表
     """
-    # 将文本转换为大写和小写形式
-    upper_text = text.upper()
-    lower_text = text.lower()
-    
-    # 直接匹配币种符号
-    found_symbols = []
-    
-    # 预处理文本，添加空格在标点符号前后，以确保正确分词
-    processed_text = re.sub(r'([.,!?()\[\]{}:;\'"\s])', r' \1 ', text)
-    processed_text = re.sub(r'\s+', ' ', processed_text)  # 将多个空格合并为一个
-    tokens = processed_text.split()
-    
-    # 1. 首先匹配完全相等的词组
-    for symbol in ALL_CRYPTO_SYMBOLS:
-        if symbol.lower() in [t.lower() for t in tokens] or symbol in [t for t in tokens]:
-            if symbol not in found_symbols:
-                found_symbols.append(symbol)
-    
-    # 2. 使用正则表达式匹配单词边界
-    for symbol in ALL_CRYPTO_SYMBOLS:
-        if symbol in found_symbols:
-            continue  # 已经匹配到的跳过
-        
-        # 匹配完整词边界
-        pattern = r'\b' + re.escape(symbol) + r'\b'
-        if re.search(pattern, upper_text) or re.search(pattern, lower_text):
-            found_symbols.append(symbol)
-            continue
-        
-        # 匹配交易对中的符号（如BTC/USDT中的BTC）
-        pattern = r'\b' + re.escape(symbol) + r'/'
-        if re.search(pattern, upper_text) or re.search(pattern, lower_text):
-            found_symbols.append(symbol)
-    
-    # 匹配中文或英文名称
-    for name, symbol in CRYPTO_NAME_TO_SYMBOL.items():
-        if name.lower() in text.lower() and symbol not in found_symbols:
-            found_symbols.append(symbol)
-    
-    return found_symbols
+    if not text:
+        return []
+    return get_coin_matcher().find(text)
 
 def extract_time_window(text: str) -> Optional[str]:
     """
@@ -146,12 +246,7 @@ def extract_time_window(text: str) -> Optional[str]:
     Returns:
         Optional[str]: 提取出的时间窗口，如果未找到则返回None
     """
-    # 检查常用时间窗口表达
-    for key, value in TIME_WINDOW_MAP.items():
-        if key in text.lower():
-            return value
-            
-    # 匹配数字+时间单位的模式
+    # 匹配数字+时间单位的模式（优先于常用表达，避免“4小时”被识别为“小时”）
     time_patterns = [
         (r'(\d+)\s*分钟', 'm'),
         (r'(\d+)\s*小时', 'h'),
@@ -166,11 +261,17 @@ def extract_time_window(text: str) -> Optional[str]:
         (r'(\d+)\s*month', 'M'),
     ]
     
+    lower_text = text.lower()
     for pattern, unit in time_patterns:
-        match = re.search(pattern, text.lower())
+        match = re.search(pattern, lower_text)
         if match:
             return f"{match.group(1)}{unit}"
     
+    # 检查常用时间窗口表达
+    for key, value in TIME_WINDOW_MAP.items():
+        if key in lower_text:
+            return value
+    
     # 如果未找到特定时间窗口，默认返回None
     return None
 
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+增量技术指标状态，按 (交易对, 时间周期) 保存
+
+每根新K线（或正在变化的最后一根K线）只需 O(1) 更新 EMA、RSI 平均值和滚动窗口，
+不再对整段历史重新计算。状态可以序列化为JSON，进程重启后从磁盘恢复。
+
+同一根K线（开盘时间相同）重复传入时视为修订：各指标回退到该K线之前的状态后重新计算，
+因此实时行情推送可以反复修订当前未收盘的K线。
+"""
+import os
+import json
+import math
+import logging
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.indicators import TREND_MA_WINDOWS, RSI_PERIOD, MACD_FAST, MACD_SLOW, MACD_SIGNAL, BOLLINGER_WINDOW, BOLLINGER_STD
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('indicator_state')
+
+# 指标状态缓存目录
+INDICATOR_STATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "indicator_state")
+
+# 默认保留的最近K线数量（与 get_klines 默认的 limit 一致）
+DEFAULT_HISTORY = 100
+
+
+class RollingWindow:
+    """
+    定长环形缓冲区，维护窗口内数值的累加和
+    """
+
+    __slots__ = ('size', 'buffer', 'pos', 'count', 'total')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buffer = [0.0] * size
+        self.pos = 0      # 下一个写入位置
+        self.count = 0    # 已写入的数量（最多 size）
+        self.total = 0.0
+
+    def append(self, value: float, revise: bool = False) -> None:
+        """追加一个值；revise=True 时替换最后一个值"""
+        if revise and self.count:
+            last = (self.pos - 1) % self.size
+            self.total += value - self.buffer[last]
+            self.buffer[last] = value
+            return
+
+        if self.count == self.size:
+            self.total -= self.buffer[self.pos]
+        else:
+            self.count += 1
+        self.buffer[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        # 每转一圈重新求和一次，避免浮点误差累积
+        self.total = sum(self.buffer[:self.count]) if self.pos == 0 else self.total + value
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.size
+
+    def values(self) -> List[float]:
+        """按时间顺序（旧到新）返回窗口内的值"""
+        if self.count < self.size:
+            return self.buffer[:self.count]
+        return self.buffer[self.pos:] + self.buffer[:self.pos]
+
+    def last(self, offset: int = 1) -> float:
+        """倒数第 offset 个值"""
+        return self.buffer[(self.pos - offset) % self.size]
+
+    def mean(self) -> float:
+        """窗口均值，窗口未满时为NaN"""
+        return self.total / self.size if self.full else math.nan
+
+    def std(self) -> float:
+        """窗口样本标准差（ddof=1），窗口未满时为NaN"""
+        if not self.full or self.size < 2:
+            return math.nan
+        return float(np.std(self.buffer, ddof=1))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'size': self.size, 'values': self.values()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RollingWindow':
+        window = cls(data['size'])
+        for value in data['values']:
+            window.append(value)
+        return window
+
+
+class EMAState:
+    """
+    指数移动平均，等价于 pandas ewm(span=span, adjust=False)
+    """
+
+    __slots__ = ('span', 'alpha', 'value', 'prev')
+
+    def __init__(self, span: int, value: Optional[float] = None, prev: Optional[float] = None):
+        self.span = span
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = value  # 当前值
+        self.prev = prev    # 最后一根K线之前的值，用于修订
+
+    def update(self, x: float, revise: bool = False) -> float:
+        """用新值更新；revise=True 时基于最后一根K线之前的值重新计算"""
+        if not revise:
+            self.prev = self.value
+        base = self.prev
+        self.value = x if base is None else self.alpha * x + (1.0 - self.alpha) * base
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'span': self.span, 'value': self.value, 'prev': self.prev}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EMAState':
+        return cls(data['span'], data['value'], data['prev'])
+
+
+class RSIState:
+    """
+    RSI 的增量状态
+
+    smoothing='sma' 时与 utils.indicators.rsi 相同（涨跌幅的简单移动平均，第一根K线涨跌记为0）；
+    smoothing='wilder' 时使用 Wilder 平滑：前 period 个涨跌幅取简单平均作为初值，
+    之后 avg = (avg * (period - 1) + 当前值) / period。
+    """
+
+    __slots__ = ('period', 'smoothing', 'close', 'prev_close', 'gains', 'losses',
+                 'avg_gain', 'avg_loss', 'prev_avg')
+
+    def __init__(self, period: int = RSI_PERIOD, smoothing: str = 'sma'):
+        if smoothing not in ('sma', 'wilder'):
+            raise ValueError(f"不支持的RSI平滑方式: {smoothing}")
+        self.period = period
+        self.smoothing = smoothing
+        self.close: Optional[float] = None
+        self.prev_close: Optional[float] = None
+        self.gains = RollingWindow(period)
+        self.losses = RollingWindow(period)
+        # Wilder 平均值，以及最后一根K线之前的平均值（用于修订）
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+        self.prev_avg: Optional[Tuple[Optional[float], Optional[float]]] = None
+
+    def update(self, close: float, revise: bool = False) -> None:
+        """用新的收盘价更新"""
+        if revise and self.close is not None:
+            base = self.prev_close
+        else:
+            self.prev_close = self.close
+            self.prev_avg = (self.avg_gain, self.avg_loss)
+            base = self.close
+        self.close = close
+
+        delta = 0.0 if base is None else close - base
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        revise_window = revise and self.gains.count > 0
+        self.gains.append(gain, revise=revise_window)
+        self.losses.append(loss, revise=revise_window)
+
+        if self.smoothing == 'wilder':
+            avg_gain, avg_loss = self.prev_avg
+            if avg_gain is None:
+                # 窗口填满时用简单平均作为初值
+                if self.gains.full:
+                    self.avg_gain, self.avg_loss = self.gains.mean(), self.losses.mean()
+            else:
+                n = self.period
+                self.avg_gain = (avg_gain * (n - 1) + gain) / n
+                self.avg_loss = (avg_loss * (n - 1) + loss) / n
+
+    @property
+    def value(self) -> float:
+        """当前RSI，数据不足时为NaN"""
+        if self.smoothing == 'wilder':
+            avg_gain, avg_loss = self.avg_gain, self.avg_loss
+            if avg_gain is None:
+                return math.nan
+        else:
+            avg_gain, avg_loss = self.gains.mean(), self.losses.mean()
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else math.nan
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'period': self.period, 'smoothing': self.smoothing,
+            'close': self.close, 'prev_close': self.prev_close,
+            'gains': self.gains.to_dict(), 'losses': self.losses.to_dict(),
+            'avg_gain': self.avg_gain, 'avg_loss': self.avg_loss,
+            'prev_avg': list(self.prev_avg) if self.prev_avg else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RSIState':
+        state = cls(data['period'], data['smoothing'])
+        state.close = data['close']
+        state.prev_close = data['prev_close']
+        state.gains = RollingWindow.from_dict(data['gains'])
+        state.losses = RollingWindow.from_dict(data['losses'])
+        state.avg_gain = data['avg_gain']
+        state.avg_loss = data['avg_loss']
+        state.prev_avg = tuple(data['prev_avg']) if data['prev_avg'] else None
+        return state
+
+
+class IndicatorState:
+    """
+    单个 (交易对, 时间周期) 的全部指标状态
+
+    维护均线、RSI、MACD、布林带，以及最近 history 根K线的收盘价/最高价/最低价，
+    供 TrendAnalyzer.analyze_state 使用。
+    """
+
+    def __init__(self, ma_windows: Sequence[int] = TREND_MA_WINDOWS, rsi_period: int = RSI_PERIOD,
+                 rsi_smoothing: str = 'sma',
+                 macd_params: Tuple[int, int, int] = (MACD_FAST, MACD_SLOW, MACD_SIGNAL),
+                 bollinger_window: int = BOLLINGER_WINDOW, bollinger_std: float = BOLLINGER_STD,
+                 history: int = DEFAULT_HISTORY):
+        self.ma_windows = tuple(ma_windows)
+        self.bollinger_std = bollinger_std
+        self.history = history
+        self.last_timestamp: Optional[int] = None
+        self.count = 0
+
+        self.ma = {window: RollingWindow(window) for window in self.ma_windows}
+        self.bollinger = RollingWindow(bollinger_window)
+        self.rsi = RSIState(rsi_period, rsi_smoothing)
+        fast, slow, signal = macd_params
+        self.ema_fast = EMAState(fast)
+        self.ema_slow = EMAState(slow)
+        self.ema_signal = EMAState(signal)
+        self.macd_hist = RollingWindow(3)
+        self.closes = RollingWindow(history)
+        self.highs = RollingWindow(history)
+        self.lows = RollingWindow(history)
+
+    def update(self, timestamp: int, high: float, low: float, close: float) -> bool:
+        """
+        追加或修订一根K线
+
+        Args:
+            timestamp: 开盘时间（毫秒）；与最后一根相同时视为修订
+            high: 最高价
+            low: 最低价
+            close: 收盘价
+
+        Returns:
+            bool: 是否更新了状态（早于最后一根的K线会被忽略）
+        """
+        timestamp = int(timestamp)
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return False
+        revise = timestamp == self.last_timestamp
+        if not revise:
+            self.last_timestamp = timestamp
+            self.count += 1
+
+        close, high, low = float(close), float(high), float(low)
+        for window in self.ma.values():
+            window.append(close, revise)
+        self.bollinger.append(close, revise)
+        self.rsi.update(close, revise)
+
+        macd = self.ema_fast.update(close, revise) - self.ema_slow.update(close, revise)
+        signal = self.ema_signal.update(macd, revise)
+        self.macd_hist.append(macd - signal, revise)
+
+        self.closes.append(close, revise)
+        self.highs.append(high, revise)
+        self.lows.append(low, revise)
+        return True
+
+    def update_arrays(self, timestamps, highs, lows, closes) -> int:
+        """
+        批量喂入K线，只处理开盘时间不早于最后一根的部分
+
+        Returns:
+            int: 新追加的K线数量（不含对最后一根K线的修订）
+        """
+        timestamps = np.asarray(timestamps)
+        start = 0
+        if self.last_timestamp is not None:
+            start = int(np.searchsorted(timestamps, self.last_timestamp, side='left'))
+        count = self.count
+        for i in range(start, len(timestamps)):
+            self.update(timestamps[i], highs[i], lows[i], closes[i])
+        return self.count - count
+
+    def latest(self) -> Dict[str, float]:
+        """
+        当前指标值，键名与 utils.indicators.IndicatorSet 的字段一致（均线为 ma<窗口>）
+        """
+        middle = self.bollinger.mean()
+        std = self.bollinger.std()
+        macd = self.ema_fast.value - self.ema_slow.value if self.count else math.nan
+        values = {f'ma{window}': buffer.mean() for window, buffer in self.ma.items()}
+        values.update({
+            'rsi': self.rsi.value,
+            'macd': macd,
+            'macd_signal': self.ema_signal.value if self.count else math.nan,
+            'macd_hist': self.macd_hist.last() if self.count else math.nan,
+            'bb_middle': middle,
+            'bb_upper': middle + std * self.bollinger_std,
+            'bb_lower': middle - std * self.bollinger_std,
+        })
+        return values
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可写入JSON的字典"""
+        return {
+            'ma_windows': list(self.ma_windows),
+            'bollinger_std': self.bollinger_std,
+            'history': self.history,
+            'last_timestamp': self.last_timestamp,
+            'count': self.count,
+            'ma': {str(window): buffer.to_dict() for window, buffer in self.ma.items()},
+            'bollinger': self.bollinger.to_dict(),
+            'rsi': self.rsi.to_dict(),
+            'ema_fast': self.ema_fast.to_dict(),
+            'ema_slow': self.ema_slow.to_dict(),
+            'ema_signal': self.ema_signal.to_dict(),
+            'macd_hist': self.macd_hist.to_dict(),
+            'closes': self.closes.to_dict(),
+            'highs': self.highs.to_dict(),
+            'lows': self.lows.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'IndicatorState':
+        """从 to_dict 的结果恢复"""
+        state = cls(ma_windows=data['ma_windows'], bollinger_std=data['bollinger_std'], history=data['history'])
+        state.last_timestamp = data['last_timestamp']
+        state.count = data['count']
+        state.ma = {int(window): RollingWindow.from_dict(buffer) for window, buffer in data['ma'].items()}
+        state.bollinger = RollingWindow.from_dict(data['bollinger'])
+        state.rsi = RSIState.from_dict(data['rsi'])
+        state.ema_fast = EMAState.from_dict(data['ema_fast'])
+        state.ema_slow = EMAState.from_dict(data['ema_slow'])
+        state.ema_signal = EMAState.from_dict(data['ema_signal'])
+        state.macd_hist = RollingWindow.from_dict(data['macd_hist'])
+        state.closes = RollingWindow.from_dict(data['closes'])
+        state.highs = RollingWindow.from_dict(data['highs'])
+        state.lows = RollingWindow.from_dict(data['lows'])
+        return state
+
+    def matches(self, **params) -> bool:
+        """参数是否与给定配置一致（配置变化时需要重建状态）"""
+        return (tuple(params.get('ma_windows', self.ma_windows)) == self.ma_windows
+                and params.get('history', self.history) == self.history)
+
+
+class IndicatorStateStore:
+    """
+    按 (symbol, interval) 管理指标状态，内存中常驻并持久化为JSON文件
+    """
+
+    def __init__(self, base_dir: str = INDICATOR_STATE_DIR, **params):
+        """
+        Args:
+            base_dir: 持久化目录
+            **params: 新建 IndicatorState 时使用的参数
+        """
+        self.base_dir = base_dir
+        self.params = params
+        self._states: Dict[Tuple[str, str], IndicatorState] = {}
+        self._locks = defaultdict(threading.Lock)
+
+    def _state_path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.base_dir, f"{symbol}_{interval}.json")
+
+    def _get_unlocked(self, symbol: str, interval: str) -> IndicatorState:
+        """获取状态（调用方需持有锁），内存中没有时从磁盘恢复"""
+        key = (symbol, interval)
+        state = self._states.get(key)
+        if state is not None:
+            return state
+
+        path = self._state_path(symbol, interval)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    state = IndicatorState.from_dict(json.load(f))
+                if not state.matches(**self.params):
+                    state = None
+            except Exception as e:
+                logger.error(f"读取指标状态失败 {path}: {str(e)}")
+                state = None
+
+        if state is None:
+            state = IndicatorState(**self.params)
+        self._states[key] = state
+        return state
+
+    def get(self, symbol: str, interval: str) -> IndicatorState:
+        """获取某个序列的指标状态"""
+        with self._locks[(symbol, interval)]:
+            return self._get_unlocked(symbol, interval)
+
+    def sync(self, symbol: str, interval: str, arrays) -> IndicatorState:
+        """
+        用K线数据更新状态，只处理最后一根已处理K线及之后的部分
+
+        如果K线数据与已有状态之间有缺口（第一根K线晚于状态的最后一根），则丢弃旧状态重新计算。
+        只有追加了新K线时才写入磁盘；只修订未收盘K线时不写（恢复后下次同步会重新修订）。
+
+        Args:
+            symbol: 币安交易对
+            interval: 时间周期
+            arrays: KlineArrays（按开盘时间升序）
+
+        Returns:
+            IndicatorState: 更新后的状态
+        """
+        return self.sync_columns(symbol, interval, arrays.timestamp, arrays.high, arrays.low, arrays.close)
+
+    def sync_columns(self, symbol: str, interval: str, timestamps, highs, lows, closes) -> IndicatorState:
+        """
+        同 sync，直接传入开盘时间（毫秒）、最高价、最低价和收盘价数组
+        """
+        key = (symbol, interval)
+        with self._locks[key]:
+            state = self._get_unlocked(symbol, interval)
+            timestamps = np.asarray(timestamps, dtype=np.int64)
+            if not len(timestamps):
+                return state
+
+            if state.last_timestamp is not None and timestamps[0] > state.last_timestamp:
+                state = IndicatorState(**self.params)
+                self._states[key] = state
+
+            if state.update_arrays(timestamps, highs, lows, closes):
+                self._save_unlocked(symbol, interval, state)
+            return state
+
+    def _save_unlocked(self, symbol: str, interval: str, state: IndicatorState) -> None:
+        """原子写入状态文件（先写临时文件再重命名）"""
+        path = self._state_path(symbol, interval)
+        try:
+            os.makedirs(self.base_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, prefix=f".{symbol}_{interval}.", suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state.to_dict(), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"保存指标状态失败 {path}: {str(e)}")
+
+    def clear(self, symbol: str, interval: str) -> None:
+        """删除某个序列的状态"""
+        with self._locks[(symbol, interval)]:
+            self._states.pop((symbol, interval), None)
+            try:
+                os.remove(self._state_path(symbol, interval))
+            except OSError:
+                pass
+
+
+# 全局指标状态存储
+indicator_state_store = IndicatorStateStore()
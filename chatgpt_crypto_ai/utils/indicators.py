@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+技术指标计算引擎，直接基于 float64 数组计算 MA、RSI、MACD 和布林带
+
+utils/trend.py 与 utils/trend_analyzer.py 共用这里的实现，计算结果与原先的
+pandas rolling/ewm 写法一致（均线、RSI 为简单移动平均，MACD 为 adjust=False 的EMA，
+布林带标准差为样本标准差）。
+
+输入既可以是一维数组（单个币种），也可以是二维数组（每行一个币种，按时间对齐），
+二维时沿最后一个轴计算，一次得到所有币种的指标。
+"""
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 默认参数
+DEFAULT_MA_WINDOWS = (5, 10, 20, 50)
+TREND_MA_WINDOWS = (7, 25, 99)  # 趋势分析的短期、中期、长期均线（全市场筛选、回测、增量指标状态共用）
+RSI_PERIOD = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+BOLLINGER_WINDOW = 20
+BOLLINGER_STD = 2.0
+
+
+class IndicatorSet(NamedTuple):
+    """
+    一组序列的技术指标，每个字段与输入形状相同，窗口不足的位置为NaN
+    """
+    ma: Dict[int, np.ndarray]  # 均线窗口 -> 均线
+    rsi: np.ndarray
+    macd: np.ndarray
+    macd_signal: np.ndarray
+    macd_hist: np.ndarray
+    bb_middle: np.ndarray
+    bb_upper: np.ndarray
+    bb_lower: np.ndarray
+
+    def latest(self, name: str, offset: int = -1):
+        """
+        取某个指标在指定位置的值（一维时为float，二维时为每个币种一个值的数组）
+
+        Args:
+            name: 字段名，均线用 'ma<窗口>'，如 'ma20'
+            offset: 位置，默认最后一根K线
+        """
+        if name.startswith('ma') and name[2:].isdigit():
+            values = self.ma[int(name[2:])]
+        else:
+            values = getattr(self, name)
+        value = values[..., offset]
+        return float(value) if np.ndim(value) == 0 else value
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """沿最后一个轴计算简单移动平均，前 window-1 个位置为NaN"""
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=-1)
+        result[..., window - 1:] = windows.mean(axis=-1)
+    return result
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """沿最后一个轴计算样本标准差（ddof=1），前 window-1 个位置为NaN"""
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=-1)
+        result[..., window - 1:] = windows.std(axis=-1, ddof=1)
+    return result
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    沿最后一个轴计算指数移动平均，等价于 pandas ewm(span=span, adjust=False).mean()
+
+    递推 y[t] = alpha * x[t] + decay * y[t-1] 展开为 decay**t * (y[0] + alpha * sum(x[j] / decay**j))，
+    用 cumsum 一次算出整段，一维和二维输入都不需要逐根K线的Python循环。
+    decay**-j 会随长度增大而溢出，因此按块计算，每块以上一块的最后一个值为起点。
+    """
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    n = values.shape[-1]
+    if n == 0:
+        return np.empty(values.shape)
+    if decay <= 0.0:
+        return np.array(values, dtype=np.float64)
+
+    # 块长度保证 decay**-block 不超过 1e100
+    block = max(1, int(100 / -np.log10(decay)))
+    scale = decay ** -np.arange(1, min(block, n) + 1, dtype=np.float64)
+
+    result = np.empty(values.shape)
+    result[..., 0] = values[..., 0]
+    for start in range(1, n, block):
+        end = min(start + block, n)
+        weights = scale[:end - start]
+        acc = np.cumsum(values[..., start:end] * weights, axis=-1)
+        result[..., start:end] = (alpha * acc + result[..., start - 1:start]) / weights
+    return result
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """
+    计算RSI（涨跌幅的简单移动平均），第一根K线的涨跌记为0
+    """
+    delta = np.zeros(close.shape)
+    delta[..., 1:] = np.diff(close, axis=-1)
+    avg_gain = rolling_mean(np.where(delta > 0, delta, 0.0), period)
+    avg_loss = rolling_mean(np.where(delta < 0, -delta, 0.0), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        return 100.0 - 100.0 / (1.0 + rs)
+
+
+def compute_indicators(close, ma_windows: Sequence[int] = DEFAULT_MA_WINDOWS,
+                       rsi_period: int = RSI_PERIOD,
+                       macd_params: Tuple[int, int, int] = (MACD_FAST, MACD_SLOW, MACD_SIGNAL),
+                       bollinger_window: int = BOLLINGER_WINDOW,
+                       bollinger_std: float = BOLLINGER_STD) -> IndicatorSet:
+    """
+    计算一组序列的全部技术指标
+
+    Args:
+        close: 收盘价，一维 (n,) 或二维 (币种数, n)
+        ma_windows: 均线窗口
+        rsi_period: RSI周期
+        macd_params: MACD的 (快线, 慢线, 信号线) 周期
+        bollinger_window: 布林带窗口
+        bollinger_std: 布林带标准差倍数
+
+    Returns:
+        IndicatorSet: 技术指标
+    """
+    close = np.asarray(close, dtype=np.float64)
+    fast, slow, signal_span = macd_params
+
+    ma = {window: rolling_mean(close, window) for window in ma_windows}
+
+    macd_line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(macd_line, signal_span)
+
+    middle = ma[bollinger_window] if bollinger_window in ma else rolling_mean(close, bollinger_window)
+    std = rolling_std(close, bollinger_window)
+
+    return IndicatorSet(
+        ma=ma,
+        rsi=rsi(close, rsi_period),
+        macd=macd_line,
+        macd_signal=signal_line,
+        macd_hist=macd_line - signal_line,
+        bb_middle=middle,
+        bb_upper=middle + std * bollinger_std,
+        bb_lower=middle - std * bollinger_std,
+    )
+
+
+def stack_series(series: Sequence[np.ndarray], length: Optional[int] = None) -> np.ndarray:
+    """
+    把多个币种的收盘价按最近的K线对齐成二维数组，供批量计算使用
+
+    Args:
+        series: 每个币种的收盘价数组
+        length: 每个币种取最近多少根K线，默认取所有序列中最短的长度
+
+    Returns:
+        np.ndarray: 形状为 (币种数, length) 的数组
+    """
+    if not series:
+        return np.empty((0, 0))
+    if length is None:
+        length = min(len(s) for s in series)
+    return np.vstack([np.asarray(s[len(s) - length:], dtype=np.float64) for s in series])
+
+
+def compute_indicators_batch(series: Sequence[np.ndarray], length: Optional[int] = None,
+                             **kwargs) -> IndicatorSet:
+    """
+    批量计算多个币种的技术指标，每行对应 series 中的一个币种
+
+    Args:
+        series: 每个币种的收盘价数组
+        length: 对齐长度，见 stack_series
+        **kwargs: 传给 compute_indicators 的参数
+
+    Returns:
+        IndicatorSet: 二维技术指标
+    """
+    return compute_indicators(stack_series(series, length), **kwargs)
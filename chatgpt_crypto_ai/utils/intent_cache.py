@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+意图提取结果缓存
+
+相同或几乎相同的消息（如“BTC走势”和“btc 走势如何”）在相同的上下文里会得到相同的
+意图提取结果。缓存键由两部分组成：
+
+- 规范化后的消息：全角转半角、转小写、去掉空白和标点，以及句末的语气词；
+- 上下文指纹：最近对话中用户提到过的币种（按最后提及的顺序），因为意图提示词会用
+  最近提到的币种补全代词和省略的币种。
+
+默认保存在进程内（有容量上限和过期时间）；USE_REDIS 开启时保存在 Redis 中，
+多个进程共享，Redis 不可用时自动退回进程内缓存。
+"""
+import re
+import json
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import config
+from utils.extract import extract_crypto_symbols
+from utils.ttl_cache import TTLCache
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('intent_cache')
+
+# 缓存过期时间与进程内容量
+INTENT_CACHE_TTL = 600  # 秒
+INTENT_CACHE_MAXSIZE = 4096
+
+# 参与上下文指纹的最近消息数（与意图提示词使用的历史长度一致）
+CONTEXT_MESSAGES = 10
+
+# Redis 键前缀
+REDIS_KEY_PREFIX = "coingpt:intent:"
+
+# 低于该置信度的结果不缓存
+MIN_CACHE_CONFIDENCE = 0.5
+
+# 句末不影响意图的语气词
+TRAILING_FILLERS = ("如何", "怎么样", "怎样", "咋样", "呢", "吗", "啊", "呀", "吧", "了")
+
+_PUNCTUATION_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize_message(text: str) -> str:
+    """
+    规范化消息文本
+
+    Args:
+        text: 用户输入
+
+    Returns:
+        str: 规范化后的文本，如 "btc 走势如何？" -> "btc走势"
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    text = _PUNCTUATION_RE.sub('', text)
+    stripped = True
+    while stripped:
+        stripped = False
+        for filler in TRAILING_FILLERS:
+            if text.endswith(filler) and len(text) > len(filler):
+                text = text[:-len(filler)]
+                stripped = True
+    return text
+
+
+def context_fingerprint(user_input: str, conversation_history: Optional[List[Dict[str, str]]]) -> str:
+    """
+    计算上下文指纹：最近对话中用户提到的币种，按最后一次提及排序
+
+    Args:
+        user_input: 当前用户输入（历史中与之相同的最后一条消息会被忽略）
+        conversation_history: 对话历史
+
+    Returns:
+        str: 如 "ETH,BTC"，没有提到币种时为空字符串
+    """
+    coins: Dict[str, None] = {}
+    for msg in (conversation_history or [])[-CONTEXT_MESSAGES:]:
+        if msg.get("role") != "user" or msg.get("content") == user_input:
+            continue
+        for coin in extract_crypto_symbols(msg.get("content", "")):
+            coins.pop(coin, None)
+            coins[coin] = None
+    return ",".join(coins)
+
+
+class IntentCache:
+    """
+    意图提取结果缓存，USE_REDIS 开启时使用 Redis
+    """
+
+    def __init__(self, ttl: float = INTENT_CACHE_TTL, maxsize: int = INTENT_CACHE_MAXSIZE,
+                 use_redis: bool = config.USE_REDIS):
+        self.ttl = ttl
+        self._local = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._use_redis = use_redis
+        self._redis = None
+        self._lock = threading.Lock()
+
+    def _get_redis(self):
+        """懒加载 Redis 客户端，不可用时返回None"""
+        if not self._use_redis:
+            return None
+        if self._redis is None:
+            with self._lock:
+                if self._redis is None:
+                    try:
+                        from redis import Redis
+                        self._redis = Redis.from_url(
+                            config.REDIS_URL,
+                            password=config.REDIS_PASSWORD,
+                            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+                            socket_connect_timeout=config.REDIS_SOCKET_CONNECT_TIMEOUT,
+                            health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+                            decode_responses=True,
+                        )
+                    except Exception as e:
+                        logger.error(f"创建Redis客户端失败，使用进程内缓存: {str(e)}")
+                        self._use_redis = False
+                        return None
+        return self._redis
+
+    @staticmethod
+    def make_key(user_input: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        """
+        生成缓存键
+
+        Args:
+            user_input: 用户输入
+            conversation_history: 对话历史
+
+        Returns:
+            str: 规范化消息与上下文指纹的摘要
+        """
+        raw = f"{normalize_message(user_input)}|{context_fingerprint(user_input, conversation_history)}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取缓存的意图结果"""
+        client = self._get_redis()
+        if client is not None:
+            try:
+                value = client.get(REDIS_KEY_PREFIX + key)
+                return json.loads(value) if value else None
+            except Exception as e:
+                logger.warning(f"读取Redis意图缓存失败: {str(e)}")
+        value = self._local.get(key)
+        return dict(value) if value is not None else None
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """写入意图结果（出错或低置信度的结果不缓存）"""
+        if result.get("error"):
+            return
+        try:
+            if float(result.get("confidence") or 0) < MIN_CACHE_CONFIDENCE:
+                return
+        except (TypeError, ValueError):
+            return
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.setex(REDIS_KEY_PREFIX + key, int(self.ttl), json.dumps(result, ensure_ascii=False))
+                return
+            except Exception as e:
+                logger.warning(f"写入Redis意图缓存失败: {str(e)}")
+        self._local.set(key, dict(result))
+
+    def clear(self) -> None:
+        """清空进程内缓存"""
+        self._local.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取进程内缓存统计"""
+        stats = self._local.get_stats()
+        stats['backend'] = 'redis' if self._use_redis else 'memory'
+        return stats
+
+
+# 全局意图缓存
+intent_cache = IntentCache()
@@ -5,23 +5,16 @@
 from typing import Dict, Any, List, Optional
 import json
 import logging
-import os
-from openai import OpenAI
 from tenacity import retry, stop_after_attempt, wait_exponential
 import config
+from utils.intent_rules import classify_intent, intent_rule_stats
+from utils.intent_cache import intent_cache
+from utils.llm_client import chat_completion
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('intent_extractor')
 
-# 加载OpenAI API密钥
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    logger.warning("未找到OPENAI_API_KEY环境变量")
-
-# 初始化OpenAI客户端
-client = OpenAI(api_key=OPENAI_API_KEY)
-
 # 意图类型
 INTENT_TYPES = {
     "analyze": "分析",  # K线分析
@@ -159,7 +152,7 @@ class IntentExtractor:
 
             # 调用OpenAI API
             logger.info(f"正在从用户输入中提取意图: {user_input}")
-            response = client.chat.completions.create(
+            response = chat_completion(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "你是一个专注于提取加密货币相关信息的AI助手。你只输出JSON格式的结果。"},
@@ -167,7 +160,7 @@ class IntentExtractor:
                 ],
                 temperature=0.1,  # 低温度以获得更确定的结果
                 max_tokens=200,   # 限制token以获得简洁结果
-                timeout=config.OPENAI_TIMEOUT        # 设置30秒超时
+                timeout=config.OPENAI_TIMEOUT        # 设置30秒超时（含排队时间）
             )
             
             # 提取回复内容
@@ -223,6 +216,52 @@ class IntentExtractor:
                 "confidence": 0.2  # 非常低的置信度
             }
     
+    @staticmethod
+    def detect_intent(user_input: str, conversation_history: List[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        识别意图：明确的输入直接按关键词规则识别，有歧义时再调用（带缓存的）extract_intent
+        
+        Args:
+            user_input: 用户输入的文本
+            conversation_history: 对话历史记录
+            
+        Returns:
+            Dict: 与 extract_intent 相同格式的结果，规则命中时附加 "source": "rules"
+        """
+        if config.INTENT_RULES_ENABLED:
+            result = classify_intent(user_input)
+            intent_rule_stats.record(result is not None)
+            if result is not None:
+                logger.info(f"规则识别意图: {result}")
+                return result
+        
+        return IntentExtractor.extract_intent_cached(user_input, conversation_history)
+    
+    @staticmethod
+    def extract_intent_cached(user_input: str, conversation_history: List[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        带缓存的 extract_intent
+        
+        缓存键为规范化后的消息加上最近对话中提到的币种，相同上下文里的相同问题
+        不再重复调用OpenAI。
+        
+        Args:
+            user_input: 用户输入的文本
+            conversation_history: 对话历史记录
+            
+        Returns:
+            Dict: 与 extract_intent 相同格式的结果
+        """
+        key = intent_cache.make_key(user_input, conversation_history)
+        cached = intent_cache.get(key)
+        if cached is not None:
+            logger.info(f"意图缓存命中: {cached}")
+            return cached
+        
+        result = IntentExtractor.extract_intent(user_input, conversation_history)
+        intent_cache.set(key, result)
+        return result
+    
     @staticmethod
     def map_timeframe_to_system(timeframe: str) -> str:
         """
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+基于规则的意图快速识别
+
+意图提示词（IntentExtractor.build_intent_prompt）里已经写明了判断规则：
+trade 关键词优先，其次是只关心价格的 monitor，最后是纯技术分析的 analyze。
+对于只提到一个币种、且关键词只指向一种意图的明确输入（如“BTC多少钱”、
+“分析ETH 4小时”），直接按这些规则给出结果，省去一次 OpenAI 往返；
+含代词、多个币种、没有关键词或关键词互相冲突时返回 None，交给大模型判断。
+"""
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from utils.extract import extract_crypto_symbols, extract_time_window
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('intent_rules')
+
+# 买卖决策关键词（与意图提示词的 trade 规则一致）
+TRADE_KEYWORDS = (
+    "值得买", "能买", "可以买", "适合买", "入场", "建仓", "抄底", "卖出", "止盈", "止损",
+    "值得吗", "合适吗", "现在买", "要不要", "建议", "推荐",
+    "买入", "做多", "做空", "开仓", "平仓", "加仓", "减仓", "该买", "该卖", "能卖", "可以卖",
+)
+
+# 只关心价格数据的关键词
+MONITOR_KEYWORDS = (
+    "多少钱", "什么价格", "价格多少", "啥价", "现价", "报价", "涨了多少", "跌了多少",
+    "price",
+)
+
+# 技术分析关键词
+ANALYZE_KEYWORDS = (
+    "走势", "趋势", "技术指标", "支撑", "阻力", "分析", "k线", "均线", "rsi", "macd", "布林",
+    "图", "行情", "技术面",
+)
+
+# 指代之前币种的代词，需要结合对话历史判断
+PRONOUNS = ("它", "这个", "那个", "该币", "这币", "此币")
+
+# 计价币种，单独出现时不算作分析对象（如 BTC/USDT）
+QUOTE_COINS = ("USDT", "USDC", "BUSD")
+
+# 快速识别结果的置信度
+RULE_CONFIDENCE = 0.9
+
+# 系统支持的时间框架，识别出其他周期（如“7天”）时交给大模型
+SYSTEM_TIMEFRAMES = ("15m", "30m", "1h", "4h", "1d", "1w", "1M")
+
+
+def _contains_any(text: str, keywords) -> bool:
+    return any(keyword in text for keyword in keywords)
+
+
+def classify_intent(user_input: str) -> Optional[Dict[str, Any]]:
+    """
+    用关键词规则识别高置信度的意图
+
+    Args:
+        user_input: 用户输入的文本
+
+    Returns:
+        Optional[Dict]: 与 IntentExtractor.extract_intent 相同格式的结果（附加 source="rules"），
+                        无法确定时为None
+    """
+    if not user_input:
+        return None
+
+    text = user_input.lower()
+    if _contains_any(text, PRONOUNS):
+        return None
+
+    coins: List[str] = extract_crypto_symbols(user_input)
+    if len(coins) > 1:
+        coins = [coin for coin in coins if coin not in QUOTE_COINS]
+    if len(coins) != 1:
+        return None
+
+    # 按意图提示词中的优先级判断
+    if _contains_any(text, TRADE_KEYWORDS):
+        intent = "trade"
+    else:
+        is_monitor = _contains_any(text, MONITOR_KEYWORDS)
+        is_analyze = _contains_any(text, ANALYZE_KEYWORDS)
+        if is_monitor == is_analyze:
+            return None
+        intent = "monitor" if is_monitor else "analyze"
+
+    timeframe = extract_time_window(user_input)
+    if timeframe is not None and timeframe not in SYSTEM_TIMEFRAMES:
+        return None
+
+    return {
+        "coin": coins[0],
+        "timeframe": timeframe,
+        "intent": intent,
+        "error": None,
+        "confidence": RULE_CONFIDENCE,
+        "source": "rules",
+    }
+
+
+class IntentRuleStats:
+    """
+    快速识别命中率统计（进程内）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool) -> None:
+        """记录一次识别结果，并输出当前命中率"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            total = self.hits + self.misses
+            hit_rate = self.hits / total
+        logger.info(f"意图规则{'命中' if hit else '未命中，交给大模型'}，命中率 {hit_rate:.1%} ({self.hits}/{total})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# 全局命中率统计
+intent_rule_stats = IntentRuleStats()
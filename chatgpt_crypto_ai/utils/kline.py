@@ -2,20 +2,119 @@
 """
 K线数据获取模块，直接通过币安API获取历史K线数据
 """
+import os
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 from typing import Dict, List, Optional, Any
 import time
 import logging
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from urllib.parse import urljoin
+import config
 from utils.symbols_sync import get_trading_pairs
+from utils.kline_store import kline_store, KlineArrays, merge_arrays
+from utils.api_rate_limiter import binance_weight_budget
+from utils.ttl_cache import TTLCache
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('kline_fetcher')
 
+# 币安各端点的请求权重（参见币安现货API文档）
+ENDPOINT_WEIGHTS = {
+    "/api/v3/klines": 2,
+    "/api/v3/ticker/price": 2,
+    "/api/v3/exchangeInfo": 20,
+}
+
+# 行情短期缓存的过期时间（秒）
+TICKER_CACHE_TTL = 5
+
+# 进程内共享的行情缓存，键为 (数据来源, 交易对)，聊天、价格监控和行情接口共用
+ticker_cache = TTLCache(ttl=TICKER_CACHE_TTL, maxsize=4096)
+
+# HTTP连接池大小（单个域名的最大长连接数）
+HTTP_POOL_MAXSIZE = 32
+
+# 共享获取器后台刷新交易对信息的间隔（秒）
+SYMBOL_REFRESH_INTERVAL = 3600
+
+# 单一币种匹配交易对时计价币的优先级
+QUOTE_PRIORITY = ['USDT', 'BUSD', 'USDC', 'BTC', 'ETH']
+
+
+class SymbolIndex:
+    """
+    交易对解析索引，在交易对表加载时一次性构建
+
+    包含带斜杠、不带斜杠、小写等写法到交易对的别名表，以及基础币种到
+    按计价币优先级排序的交易对列表，任意输入都能 O(1) 解析；
+    无法解析的输入会被记入否定缓存，避免重复查找。
+    """
+
+    # 否定缓存的最大条目数，超过后整体清空
+    MAX_NEGATIVE_CACHE = 10000
+
+    def __init__(self, pairs: Dict[str, Dict]):
+        """
+        Args:
+            pairs: 交易对信息字典，键为交易对符号，值包含 baseAsset/quoteAsset
+        """
+        self.pairs = pairs
+        self.aliases: Dict[str, str] = {}
+        self.base_pairs: Dict[str, List[str]] = {}
+        self._unknown = set()
+
+        quote_rank = {quote: i for i, quote in enumerate(QUOTE_PRIORITY)}
+        ranked: Dict[str, List[tuple]] = {}
+        for order, (pair, info) in enumerate(pairs.items()):
+            base = info.get('baseAsset', '')
+            quote = info.get('quoteAsset', '')
+            for alias in (pair, f"{base}/{quote}", f"{base}{quote}"):
+                self.aliases.setdefault(alias.upper(), pair)
+            if base:
+                ranked.setdefault(base.upper(), []).append(
+                    (quote_rank.get(quote, len(QUOTE_PRIORITY)), order, pair)
+                )
+
+        for base, entries in ranked.items():
+            self.base_pairs[base] = [pair for _, _, pair in sorted(entries)]
+
+    def resolve(self, symbol: str) -> str:
+        """
+        解析任意写法的币种或交易对
+
+        Args:
+            symbol: 如 'BTC', 'btc', 'BTC/USDT', 'BTCUSDT'
+
+        Returns:
+            str: 币安交易对，找不到时返回空字符串
+        """
+        key = (symbol or '').strip().upper()
+        if not key or key in self._unknown:
+            return ""
+
+        # 交易对的各种写法
+        pair = self.aliases.get(key)
+        if pair:
+            return pair
+
+        # 单一币种或不存在的交易对，按基础币种取优先级最高的交易对
+        base = key.split('/')[0]
+        candidates = self.base_pairs.get(base)
+        if candidates:
+            return candidates[0]
+
+        if len(self._unknown) >= self.MAX_NEGATIVE_CACHE:
+            self._unknown.clear()
+        self._unknown.add(key)
+        return ""
+
+
 class KlineDataFetcher:
     """
     K线数据获取器，直接调用币安API获取加密货币的K线数据
@@ -29,13 +128,14 @@ class KlineDataFetcher:
             api_secret: 币安API密钥secret（可选）
         """
         # 币安API基础URL
-        self.base_url = "https://api.binance.com"
-        self.base_url_fallback = "https://api1.binance.com"  # 备用API域名
+        self.base_url = config.BINANCE_API_BASE
+        self.base_url_fallback = config.BINANCE_API_FALLBACK  # 备用API域名
         
         # 币安API端点
         self.kline_endpoint = "/api/v3/klines"  # K线数据端点
         self.exchange_info_endpoint = "/api/v3/exchangeInfo"  # 交易对信息端点
         self.ticker_price_endpoint = "/api/v3/ticker/price"  # 当前价格端点
+        self.ticker_24hr_endpoint = "/api/v3/ticker/24hr"  # 24小时行情统计端点
         
         # API配置
         self.api_key = api_key
@@ -44,12 +144,18 @@ class KlineDataFetcher:
         # 请求配置
         self.request_timeout = 30  # 请求超时时间（秒）
         self.max_retries = 3      # 最大重试次数
+        self.max_range_workers = 4  # 分页获取历史K线时的最大并发数
+        self.max_batch_workers = 16  # 批量获取多个交易对时的最大并发数
         
-        # 初始化请求会话
+        # 初始化请求会话，使用长连接池复用TLS连接（主域名和备用域名各一个连接池）
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=False)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.session.headers.update({
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            "Connection": "keep-alive",
         })
         
         # 如果提供API密钥，则添加到头部
@@ -59,6 +165,40 @@ class KlineDataFetcher:
         # 优先用本地缓存
         self.available_symbols = get_trading_pairs()
         logger.info(f"币安K线数据获取器初始化完成，成功获取 {len(self.available_symbols)} 个交易对信息（优先本地缓存）")
+        
+        # 后台刷新交易对的线程
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_stop = threading.Event()
+    
+    def start_symbol_refresh(self, interval: int = SYMBOL_REFRESH_INTERVAL) -> None:
+        """
+        启动后台线程定期刷新交易对信息，请求线程无需每次重新读取缓存文件
+        
+        Args:
+            interval: 刷新间隔（秒）
+        """
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+        
+        def refresh_loop():
+            while not self._refresh_stop.wait(interval):
+                try:
+                    symbols = get_trading_pairs()
+                    # 快照未变化时返回同一个对象，无需重建索引
+                    if symbols and symbols is not self.available_symbols:
+                        # 整体替换引用，读取方始终看到完整的交易对表
+                        self.available_symbols = symbols
+                        logger.info(f"后台刷新交易对信息完成，共 {len(symbols)} 个交易对")
+                except Exception as e:
+                    logger.error(f"后台刷新交易对信息失败: {str(e)}")
+        
+        self._refresh_stop.clear()
+        self._refresh_thread = threading.Thread(target=refresh_loop, name='kline-symbol-refresh', daemon=True)
+        self._refresh_thread.start()
+    
+    def stop_symbol_refresh(self) -> None:
+        """停止后台刷新线程"""
+        self._refresh_stop.set()
     
     def _get_available_symbols(self) -> Dict[str, Dict]:
         """
@@ -110,20 +250,24 @@ class KlineDataFetcher:
         logger.error("无法从币安API获取交易对信息")
         return {}
         
-    def _make_api_request(self, endpoint: str, params: Dict = None, use_fallback: bool = False) -> Optional[Any]:
+    def _make_api_request(self, endpoint: str, params: Dict = None, use_fallback: bool = False,
+                          weight: Optional[int] = None) -> Optional[Any]:
         """
-        发送API请求，带自动重试机制
+        发送API请求，带自动重试机制和请求权重限流
         
         Args:
             endpoint: API端点
             params: 请求参数
             use_fallback: 是否使用备用URL
+            weight: 请求权重，默认按端点查表
             
         Returns:
             响应数据或None(如果失败)
         """
         params = params or {}
         retry_count = 0
+        if weight is None:
+            weight = ENDPOINT_WEIGHTS.get(endpoint, 1)
         
         while retry_count < self.max_retries:
             try:
@@ -131,8 +275,22 @@ class KlineDataFetcher:
                 base = self.base_url_fallback if use_fallback else self.base_url
                 url = urljoin(base, endpoint)
                 
+                # 申请请求权重，所有线程共享币安每分钟的权重预算
+                binance_weight_budget.acquire(weight)
+                
                 # 发送请求
                 response = self.session.get(url, params=params, timeout=self.request_timeout)
+                
+                # 用服务端统计的已用权重校正本地预算
+                used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M')
+                if used_weight and used_weight.isdigit():
+                    binance_weight_budget.sync_used_weight(int(used_weight))
+                
+                # 429/418 表示已触发限流，按 Retry-After 暂停所有请求
+                if response.status_code in (418, 429):
+                    retry_after = response.headers.get('Retry-After', '60')
+                    binance_weight_budget.block_for(int(retry_after) if retry_after.isdigit() else 60)
+                
                 response.raise_for_status()
                 return response.json()
                 
@@ -163,65 +321,131 @@ class KlineDataFetcher:
         Returns:
             DataFrame: 包含K线数据的DataFrame
         """
-        # 币安API的时间周期映射
-        binance_intervals = {
-            '1m': '1m', '3m': '3m', '5m': '5m', '15m': '15m', '30m': '30m',
-            '1h': '1h', '2h': '2h', '4h': '4h', '6h': '6h', '8h': '8h', '12h': '12h',
-            '1d': '1d', '3d': '3d', '1w': '1w', '1M': '1M'
-        }
+        # 标准化符号，处理不同的币种输入格式
+        binance_symbol = self._normalize_symbol(symbol)
+        if not binance_symbol:
+            logger.error(f"无法找到匹配的交易对: {symbol}")
+            return pd.DataFrame()
         
-        # 标准化时间周期
-        if timeframe not in binance_intervals:
-            logger.warning(f"不支持的时间周期 {timeframe}，将使用 '1h'")
-            interval = '1h'
-        else:
-            interval = binance_intervals[timeframe]
+        arrays = self.get_kline_arrays(binance_symbol, timeframe, limit)
+        if not len(arrays):
+            return pd.DataFrame()
+        
+        return self._arrays_to_dataframe(arrays, binance_symbol)
+    
+    def get_kline_arrays(self, symbol: str, timeframe: str = '1d', limit: int = 100) -> KlineArrays:
+        """
+        获取列式K线数据，优先使用本地存储，只向币安拉取高水位之后的新K线
+        
+        返回的数组可以直接交给 TrendAnalyzer.analyze_arrays，不需要构造DataFrame。
+        
+        Args:
+            symbol: 货币对符号，如 'BTC/USDT' 或 'BTC'
+            timeframe: 时间周期，如 '1m', '1h', '1d', '1w' 等
+            limit: 获取的K线数量，最大为1000
+            
+        Returns:
+            KlineArrays: 列式K线数据（包含未收盘的最新K线），失败时为空
+        """
+        interval = self._to_binance_interval(timeframe)
         
         # 标准化符号，处理不同的币种输入格式
         binance_symbol = self._normalize_symbol(symbol)
         if not binance_symbol:
             logger.error(f"无法找到匹配的交易对: {symbol}")
-            return pd.DataFrame()
+            return KlineArrays.empty()
         
+        limit = min(limit, 1000)  # 币安限制最大能查询1000条
         logger.info(f"获取 {binance_symbol} 的 {interval} K线数据，最大 {limit} 条")
         
+        # 读取本地已收盘的K线序列
+        stored = kline_store.load(binance_symbol, interval)
+        interval_ms = self._timeframe_to_minutes(interval) * 60 * 1000
+        now_ms = int(time.time() * 1000)
+        
+        # 高水位之后缺失的K线数量
+        missing = (now_ms - stored.last_open_time) // interval_ms if len(stored) else None
+        
+        # 本地序列足够长且没有过期太久时，只拉取高水位之后的新K线
+        # 存储中只有已收盘的K线，加上拉取到的未收盘K线，limit-1 根即可凑满 limit 根
+        incremental = len(stored) > 0 and len(stored) >= limit - 1 and missing <= 1000
+        
         # 准备API请求参数
         params = {
             'symbol': binance_symbol,
             'interval': interval,
-            'limit': min(limit, 1000),  # 币安限制最大能查询1000条
         }
+        if incremental:
+            params['startTime'] = stored.last_open_time + 1
+            params['limit'] = 1000
+        else:
+            params['limit'] = limit
         
         # 发送API请求
         response_data = self._make_api_request(self.kline_endpoint, params)
-        if not response_data:
+        if response_data is None:
+            if len(stored):
+                logger.warning(f"无法获取 {binance_symbol} 的最新K线数据，使用本地缓存")
+                return stored.tail(limit)
             logger.error(f"无法获取 {binance_symbol} 的K线数据")
-            return pd.DataFrame()
+            return KlineArrays.empty()
+        
+        fetched = KlineArrays.from_rows(response_data)
+        if incremental:
+            logger.info(f"{binance_symbol} {interval} 本地已缓存 {len(stored)} 条K线，增量获取 {len(fetched)} 条")
+        
+        # 已收盘的K线写入本地存储；新数据与本地序列之间有断档时直接替换旧序列
+        replace = not incremental and missing is not None and missing >= limit
+        kline_store.merge(binance_symbol, interval, fetched, replace=replace)
+        
+        # 合并本地序列与新数据（新数据覆盖同一开盘时间的旧数据，包括未收盘的最新K线）
+        if incremental:
+            arrays = merge_arrays(stored.tail(limit), fetched)
+        else:
+            arrays = fetched
+        arrays = arrays.tail(limit)
         
         # 检查数据是否为空
-        if len(response_data) == 0:
+        if not len(arrays):
             logger.warning(f"{binance_symbol} 没有可用的K线数据")
-            return pd.DataFrame()
         
-        # 币安K线数据格式: [Open time, Open, High, Low, Close, Volume, Close time, Quote asset volume, 
-        # Number of trades, Taker buy base, Taker buy quote, Ignore]
-        columns = [
-            'timestamp', 'open', 'high', 'low', 'close', 'volume', 
-            'close_time', 'quote_volume', 'trades_count', 
-            'taker_buy_base', 'taker_buy_quote', 'ignore'
-        ]
+        return arrays
+    
+    def _to_binance_interval(self, timeframe: str) -> str:
+        """
+        将时间周期标准化为币安API支持的周期
         
-        # 创建DataFrame
-        df = pd.DataFrame(response_data, columns=columns)
+        Args:
+            timeframe: 时间周期，如 '1m', '1h', '1d', '1w' 等
+            
+        Returns:
+            str: 币安时间周期，不支持时返回 '1h'
+        """
+        # 币安API的时间周期映射
+        binance_intervals = {
+            '1m': '1m', '3m': '3m', '5m': '5m', '15m': '15m', '30m': '30m',
+            '1h': '1h', '2h': '2h', '4h': '4h', '6h': '6h', '8h': '8h', '12h': '12h',
+            '1d': '1d', '3d': '3d', '1w': '1w', '1M': '1M'
+        }
         
-        # 转换数据类型
-        for col in ['open', 'high', 'low', 'close', 'volume', 'quote_volume', 
-                   'taker_buy_base', 'taker_buy_quote']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+        if timeframe not in binance_intervals:
+            logger.warning(f"不支持的时间周期 {timeframe}，将使用 '1h'")
+            return '1h'
+        return binance_intervals[timeframe]
+    
+    def _arrays_to_dataframe(self, arrays: KlineArrays, binance_symbol: str) -> pd.DataFrame:
+        """
+        将列式K线数据转换为DataFrame
         
-        # 将时间戳转换为datetime格式
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['close_time'] = pd.to_datetime(df['close_time'], unit='ms')
+        Args:
+            arrays: 列式K线数据
+            binance_symbol: 币安交易对
+            
+        Returns:
+            DataFrame: 包含K线数据的DataFrame
+        """
+        # 数值列直接来自float64数组，无需再做字符串解析
+        df = arrays.to_frame()
         
         # 添加额外的信息列
         df['symbol'] = binance_symbol
@@ -243,6 +467,16 @@ class KlineDataFetcher:
         
         return df
     
+    @property
+    def available_symbols(self) -> Dict[str, Dict]:
+        """当前使用的交易对信息"""
+        return self._symbol_index.pairs
+    
+    @available_symbols.setter
+    def available_symbols(self, symbols: Dict[str, Dict]) -> None:
+        """替换交易对信息时同时重建解析索引（整体替换引用，读取方不会看到半成品）"""
+        self._symbol_index = SymbolIndex(symbols)
+    
     def _normalize_symbol(self, symbol: str) -> str:
         """
         将不同格式的币种符号标准化为币安API能识别的格式
@@ -253,59 +487,10 @@ class KlineDataFetcher:
         Returns:
             str: 币安格式的符号，或空字符串（如果找不到）
         """
-        # 针对不同格式添加币种匹配策略
-        candidates = []
-        symbol = symbol.upper()
-        
-        # 处理情况1: 直接匹配现有交易对
-        if symbol in self.available_symbols:
-            return symbol
-        
-        # 处理情况2: 如果包含斜杠，删除斜杠后再尝试
-        if '/' in symbol:
-            no_slash = symbol.replace('/', '')
-            if no_slash in self.available_symbols:
-                return no_slash
-            # 将带斜杠的符号加入候选
-            base, quote = symbol.split('/')
-            candidates.append(base + quote)
-        
-        # 处理情况3: 如果是单一币种，尝试加上不同的计价币
-        else:
-            # 常见计价币，按优先级排序
-            quote_assets = ['USDT', 'BUSD', 'USDC', 'BTC', 'ETH']
-            for quote in quote_assets:
-                candidate = symbol + quote
-                candidates.append(candidate)
-        
-        # 尝试所有候选符号
-        for candidate in candidates:
-            if candidate in self.available_symbols:
-                return candidate
-        
-        # 如果还是找不到，尝试全币平台模糊查找（找到包含该基础货币的任何交易对）
-        if '/' in symbol:
-            base = symbol.split('/')[0]
-        else:
-            base = symbol
-            
-        for sym in self.available_symbols:
-            # 如果完全匹配或者基础资产匹配
-            symbol_info = self.available_symbols[sym]
-            if symbol_info['baseAsset'] == base:
-                # 优先返回xUSDT交易对
-                if symbol_info['quoteAsset'] == 'USDT':
-                    return sym
-                # 暂存其他匹配
-                candidates.append(sym)
-        
-        # 如果有匹配的其他币种对，返回第一个
-        if candidates:
-            return candidates[0]
-            
-        # 完全找不到
-        logger.error(f"无法找到匹配的交易对符号: {symbol}")
-        return ""
+        binance_symbol = self._symbol_index.resolve(symbol)
+        if not binance_symbol:
+            logger.error(f"无法找到匹配的交易对符号: {symbol}")
+        return binance_symbol
         
     def _get_base_asset(self, symbol: str) -> str:
         """获取交易对的基础资产"""
@@ -319,49 +504,80 @@ class KlineDataFetcher:
             return self.available_symbols[symbol]['quoteAsset']
         return ""
     
-    def get_multiple_klines(self, symbols: List[str], timeframe: str = '1d', limit: int = 100) -> Dict[str, pd.DataFrame]:
+    def get_multiple_klines(self, symbols: List[str], timeframe: str = '1d', limit: int = 100,
+                            errors: Optional[Dict[str, str]] = None) -> Dict[str, pd.DataFrame]:
         """
-        获取多个货币对的K线数据
+        并发获取多个货币对的K线数据
         
         Args:
             symbols: 货币对符号列表
             timeframe: 时间周期
             limit: 获取的K线数量
+            errors: 可选，传入字典以收集每个失败交易对的错误信息
             
         Returns:
             Dict[str, DataFrame]: 币种到K线数据的映射
         """
         result = {}
         
+        for symbol, df, error in self.iter_multiple_klines(symbols, timeframe, limit):
+            if error:
+                if errors is not None:
+                    errors[symbol] = error
+            else:
+                result[symbol] = df
+        
+        return result
+    
+    def iter_multiple_klines(self, symbols: List[str], timeframe: str = '1d', limit: int = 100):
+        """
+        并发获取多个货币对的K线数据，按完成顺序逐个返回
+        
+        请求通过共享的连接池发出，限流由币安请求权重预算控制，而不是固定延迟。
+        
+        Args:
+            symbols: 货币对符号列表
+            timeframe: 时间周期
+            limit: 获取的K线数量
+            
+        Yields:
+            Tuple[str, DataFrame, Optional[str]]: (币种, K线数据, 错误信息)，成功时错误信息为None
+        """
         # 记录成功和失败数量供日志
         successful = 0
         failed = 0
-        
-        logger.info(f"开始获取 {len(symbols)} 个交易对的K线数据")
-        
-        for symbol in symbols:
-            try:
-                # 添加适当延迟以尊重币安API限制
-                time.sleep(0.3)  # 300ms延迟每个请求，满足币安的限流规则
-                
-                # 获取单个交易对的K线数据
-                df = self.get_klines(symbol, timeframe, limit)
+        started = time.time()
+        
+        unique_symbols = list(dict.fromkeys(symbols))
+        logger.info(f"开始并发获取 {len(unique_symbols)} 个交易对的K线数据")
+        if not unique_symbols:
+            return
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_batch_workers, len(unique_symbols))) as executor:
+            futures = {
+                executor.submit(self.get_klines, symbol, timeframe, limit): symbol
+                for symbol in unique_symbols
+            }
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    df = future.result()
+                except Exception as e:
+                    logger.error(f"获取 {symbol} 的K线数据时发生错误: {str(e)}")
+                    failed += 1
+                    yield symbol, pd.DataFrame(), str(e)
+                    continue
                 
-                # 如果获取成功，添加到结果字典
-                if not df.empty:
-                    result[symbol] = df
-                    successful += 1
-                else:
+                if df.empty:
                     failed += 1
-            except Exception as e:
-                logger.error(f"获取 {symbol} 的K线数据时发生错误: {str(e)}")
-                failed += 1
+                    yield symbol, df, "无法获取K线数据"
+                else:
+                    successful += 1
+                    yield symbol, df, None
         
-        logger.info(f"批量获取K线数据完成: 成功 {successful}/{len(symbols)}个交易对")
+        logger.info(f"批量获取K线数据完成: 成功 {successful}/{len(unique_symbols)}个交易对，耗时 {time.time() - started:.2f} 秒")
         if failed > 0:
             logger.warning(f"{failed} 个交易对的数据获取失败")
-                
-        return result
     
     def get_recent_klines(self, symbol: str, timeframe: str = '1d', days: int = 30) -> pd.DataFrame:
         """
@@ -378,18 +594,124 @@ class KlineDataFetcher:
         # 计算需要多少根K线
         timeframe_in_minutes = self._timeframe_to_minutes(timeframe)
         minutes_in_period = days * 24 * 60
-        limit = min(1000, minutes_in_period // timeframe_in_minutes)  # 限制在币安API最大1000条
+        needed = minutes_in_period // timeframe_in_minutes
+        
+        # 1000条以内直接用limit参数获取
+        if needed <= 1000:
+            return self.get_klines(symbol, timeframe, needed)
+        
+        # 超过币安单次限制，按startTime/endTime分页获取
+        logger.info(f"要获取 {days} 天的数据需要 {needed} 条K线，超过币安单次限制，将分页获取")
+        binance_symbol = self._normalize_symbol(symbol)
+        if not binance_symbol:
+            logger.error(f"无法找到匹配的交易对: {symbol}")
+            return pd.DataFrame()
         
-        # 如果需要的数据超过1000条，则使用开始时间和结束时间来进行查询
-        if minutes_in_period // timeframe_in_minutes > 1000:
-            logger.info(f"要获取 {days} 天的数据需要 {minutes_in_period // timeframe_in_minutes} 条K线，超过币安限制，将只获取最新1000条")
+        end_ms = int(time.time() * 1000)
+        start_ms = end_ms - minutes_in_period * 60 * 1000
+        arrays = self.get_kline_range(binance_symbol, timeframe, start_ms, end_ms)
+        if not len(arrays):
+            return pd.DataFrame()
+        
+        return self._arrays_to_dataframe(arrays, binance_symbol)
+    
+    def get_kline_range(self, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> KlineArrays:
+        """
+        获取指定时间范围内的K线，按1000条一个窗口分页并发请求
+        
+        本地存储已覆盖的区间不会重复请求，只拉取存储序列之前和之后缺失的窗口，
+        所有窗口合并去重后组成一段连续的序列。
+        
+        Args:
+            symbol: 货币对符号
+            timeframe: 时间周期
+            start_ms: 开始时间（毫秒）
+            end_ms: 结束时间（毫秒）
             
-        # 使用默认limit参数调用get_klines方法
-        return self.get_klines(symbol, timeframe, limit)
+        Returns:
+            KlineArrays: 开盘时间位于 [start_ms, end_ms] 的K线，失败时为空
+        """
+        interval = self._to_binance_interval(timeframe)
+        binance_symbol = self._normalize_symbol(symbol)
+        if not binance_symbol:
+            logger.error(f"无法找到匹配的交易对: {symbol}")
+            return KlineArrays.empty()
+        
+        interval_ms = self._timeframe_to_minutes(interval) * 60 * 1000
+        window_ms = 1000 * interval_ms
+        stored = kline_store.load(binance_symbol, interval)
+        
+        # 计算本地存储未覆盖的区间
+        missing_ranges = []
+        if not len(stored):
+            missing_ranges.append((start_ms, end_ms))
+        else:
+            first_open = int(stored.timestamp[0])
+            if start_ms < first_open:
+                missing_ranges.append((start_ms, first_open - 1))
+            if end_ms > stored.last_open_time:
+                missing_ranges.append((stored.last_open_time + 1, end_ms))
+        
+        # 按1000条K线切分窗口
+        windows = []
+        for range_start, range_end in missing_ranges:
+            window_start = range_start
+            while window_start <= range_end:
+                window_end = min(window_start + window_ms - 1, range_end)
+                windows.append((window_start, window_end))
+                window_start = window_end + 1
+        
+        logger.info(f"{binance_symbol} {interval} 范围查询需要请求 {len(windows)} 个窗口（本地已缓存 {len(stored)} 条）")
+        
+        # 使用有界线程池并发请求各窗口
+        fetched = KlineArrays.empty()
+        failed = 0
+        if windows:
+            with ThreadPoolExecutor(max_workers=min(self.max_range_workers, len(windows))) as executor:
+                futures = [
+                    executor.submit(self._fetch_kline_window, binance_symbol, interval, window_start, window_end)
+                    for window_start, window_end in windows
+                ]
+                for future in futures:
+                    window_arrays = future.result()
+                    if window_arrays is None:
+                        failed += 1
+                        continue
+                    fetched = merge_arrays(fetched, window_arrays)
+        
+        # 只有全部窗口成功时才写入本地存储，避免存储序列出现断档
+        if failed:
+            logger.warning(f"{binance_symbol} {interval} 有 {failed}/{len(windows)} 个窗口获取失败，返回的序列可能不连续")
+        elif len(fetched):
+            kline_store.merge(binance_symbol, interval, fetched, backfill=True)
+        
+        arrays = merge_arrays(stored, fetched)
+        in_range = (arrays.timestamp >= start_ms) & (arrays.timestamp <= end_ms)
+        return KlineArrays(arrays.data[:, in_range])
+    
+    def _fetch_kline_window(self, binance_symbol: str, interval: str, start_ms: int, end_ms: int) -> Optional[KlineArrays]:
+        """
+        获取单个时间窗口内的K线（最多1000条）
+        
+        Returns:
+            Optional[KlineArrays]: 窗口内的K线，请求失败时返回None
+        """
+        params = {
+            'symbol': binance_symbol,
+            'interval': interval,
+            'startTime': start_ms,
+            'endTime': end_ms,
+            'limit': 1000,
+        }
+        response_data = self._make_api_request(self.kline_endpoint, params)
+        if response_data is None:
+            logger.error(f"获取 {binance_symbol} {interval} 窗口 {start_ms}-{end_ms} 失败")
+            return None
+        return KlineArrays.from_rows(response_data)
     
     def get_current_price(self, symbol: str) -> Dict:
         """
-        获取币种当前价格
+        获取币种当前价格及24小时统计数据（单次 ticker/24hr 请求）
         
         Args:
             symbol: 货币对符号
@@ -402,40 +724,85 @@ class KlineDataFetcher:
         if not binance_symbol:
             logger.error(f"无法找到匹配的交易对: {symbol}")
             return {}
-            
-        # 准备API请求参数
-        params = {'symbol': binance_symbol}
         
-        # 调用币安的价格接口
-        response_data = self._make_api_request(self.ticker_price_endpoint, params)
+        result = self.get_current_prices([binance_symbol]).get(binance_symbol, {})
+        if result:
+            logger.info(f"{binance_symbol} 当前价格: {result['price']:.4f}")
+        return result
+    
+    def get_current_prices(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取多个币种的当前价格及24小时统计数据
+        
+        未命中短期缓存的交易对通过一次 ticker/24hr 请求（symbols 参数）批量获取，
+        结果写入进程内共享的 ticker_cache。
         
-        if not response_data:
-            logger.error(f"无法获取 {binance_symbol} 的价格数据")
-            return {}
+        Args:
+            symbols: 货币对符号列表
             
-        # 使用get_klines获取最近一根K线的更多信息
-        kline_df = self.get_klines(binance_symbol, '1d', 1)
+        Returns:
+            Dict[str, Dict]: 币安交易对到价格信息的映射，获取失败的交易对不包含在内
+        """
+        result = {}
+        missing = []
         
-        result = {
+        for symbol in symbols:
+            binance_symbol = self._normalize_symbol(symbol)
+            if not binance_symbol:
+                logger.error(f"无法找到匹配的交易对: {symbol}")
+                continue
+            cached = ticker_cache.get(('binance', binance_symbol))
+            if cached is not None:
+                result[binance_symbol] = cached
+            elif binance_symbol not in missing:
+                missing.append(binance_symbol)
+        
+        # 每次请求最多100个交易对
+        for i in range(0, len(missing), 100):
+            chunk = missing[i:i + 100]
+            if len(chunk) == 1:
+                params = {'symbol': chunk[0]}
+            else:
+                params = {'symbols': json.dumps(chunk, separators=(',', ':'))}
+            
+            response_data = self._make_api_request(self.ticker_24hr_endpoint, params,
+                                                   weight=self._ticker_24hr_weight(len(chunk)))
+            if not response_data:
+                logger.error(f"无法获取 {', '.join(chunk)} 的价格数据")
+                continue
+            
+            tickers = response_data if isinstance(response_data, list) else [response_data]
+            for ticker in tickers:
+                price_info = self._parse_ticker_24hr(ticker)
+                ticker_cache.set(('binance', price_info['symbol']), price_info)
+                result[price_info['symbol']] = price_info
+        
+        return result
+    
+    def _parse_ticker_24hr(self, ticker: Dict) -> Dict:
+        """将币安 ticker/24hr 返回的数据转换为价格信息字典"""
+        binance_symbol = ticker.get('symbol')
+        return {
             'symbol': binance_symbol,
-            'price': float(response_data.get('price', 0)),
+            'price': float(ticker.get('lastPrice', 0)),
             'baseAsset': self._get_base_asset(binance_symbol),
             'quoteAsset': self._get_quote_asset(binance_symbol),
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            '24h_change': round(float(ticker.get('priceChangePercent', 0)), 2),
+            '24h_high': float(ticker.get('highPrice', 0)),
+            '24h_low': float(ticker.get('lowPrice', 0)),
+            '24h_volume': float(ticker.get('volume', 0)),
+            '24h_quote_volume': float(ticker.get('quoteVolume', 0)),
         }
-        
-        # 如果有K线数据，添加更多信息
-        if not kline_df.empty:
-            latest = kline_df.iloc[-1]
-            result.update({
-                '24h_change': latest['change'],
-                '24h_high': float(latest['high']),
-                '24h_low': float(latest['low']),
-                '24h_volume': float(latest['volume']),
-            })
-        
-        logger.info(f"{binance_symbol} 当前价格: {result['price']:.4f}")
-        return result
+    
+    @staticmethod
+    def _ticker_24hr_weight(symbol_count: int) -> int:
+        """ticker/24hr 的请求权重随交易对数量增加"""
+        if symbol_count <= 20:
+            return 2
+        if symbol_count <= 100:
+            return 40
+        return 80
     
     def _timeframe_to_minutes(self, timeframe: str) -> int:
         """
@@ -479,3 +846,34 @@ class KlineDataFetcher:
         except ValueError:
             logger.warning(f"无效的时间周期格式: {timeframe}，使用默认1小时")
             return 60  # 默认为1小时
+
+
+# 进程内共享的K线数据获取器
+_shared_fetcher: Optional[KlineDataFetcher] = None
+_shared_fetcher_pid: Optional[int] = None
+_shared_fetcher_lock = threading.Lock()
+
+
+def get_kline_fetcher() -> KlineDataFetcher:
+    """
+    获取进程内共享的K线数据获取器（线程安全，懒加载）
+    
+    同一进程内复用同一个HTTP连接池和交易对表；Gunicorn/Celery fork 出的子进程
+    会重新创建自己的实例，避免跨进程共享连接和后台线程。
+    
+    Returns:
+        KlineDataFetcher: 共享的获取器实例
+    """
+    global _shared_fetcher, _shared_fetcher_pid
+    
+    pid = os.getpid()
+    if _shared_fetcher is not None and _shared_fetcher_pid == pid:
+        return _shared_fetcher
+    
+    with _shared_fetcher_lock:
+        if _shared_fetcher is None or _shared_fetcher_pid != pid:
+            fetcher = KlineDataFetcher()
+            fetcher.start_symbol_refresh()
+            _shared_fetcher = fetcher
+            _shared_fetcher_pid = pid
+    return _shared_fetcher
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+本地K线存储模块，按 (交易对, 时间周期) 持久化已收盘的K线
+
+已收盘的K线不会再变化，因此只需保存一次；之后每次请求只向币安拉取
+高水位（最后一根已存K线）之后的新K线即可。
+
+存储格式为列式的 .npy 文件：一个形状为 (字段数, K线数) 的 float64 数组，
+每个字段在文件中连续存放。读取时以只读方式内存映射，多个 Gunicorn/Celery
+进程共享同一份页缓存，取最近N根K线只是一个切片视图，不需要任何解析。
+毫秒时间戳小于 2^53，用 float64 存储不会丢失精度。
+"""
+import os
+import time
+import logging
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('kline_store')
+
+# K线缓存目录
+KLINE_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "klines")
+
+# 每个序列默认保留的K线数量（get_kline_arrays 单次最多请求1000条，超出部分丢弃最旧的）
+# 每次合并都会重写整个序列文件，默认路径保持较小的上限
+DEFAULT_STORED_KLINES = 1000
+
+# 通过 get_kline_range 回填的序列最多保留的K线数量
+MAX_STORED_KLINES = 100000
+
+# 列式存储的字段顺序，与币安K线原始行的前11列一致
+KLINE_FIELDS = (
+    'timestamp', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_volume', 'trades_count', 'taker_buy_base', 'taker_buy_quote'
+)
+FIELD_INDEX = {name: i for i, name in enumerate(KLINE_FIELDS)}
+
+
+class KlineArrays:
+    """
+    列式K线数据
+
+    data 是形状为 (len(KLINE_FIELDS), n) 的 float64 数组（通常是内存映射文件的视图），
+    每个字段可以通过同名属性获取，如 arrays.close。
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    @classmethod
+    def empty(cls) -> 'KlineArrays':
+        """创建空的K线数据"""
+        return cls(np.empty((len(KLINE_FIELDS), 0), dtype=np.float64))
+
+    @classmethod
+    def from_rows(cls, rows: List[list]) -> 'KlineArrays':
+        """
+        从币安原始K线行创建列式数据
+
+        Args:
+            rows: 币安 /api/v3/klines 返回的原始行
+        """
+        if not rows:
+            return cls.empty()
+        width = len(KLINE_FIELDS)
+        data = np.array([row[:width] for row in rows], dtype=np.float64).T
+        return cls(np.ascontiguousarray(data))
+
+    def __len__(self) -> int:
+        return self.data.shape[1]
+
+    def column(self, name: str) -> np.ndarray:
+        """获取某个字段的数组视图"""
+        return self.data[FIELD_INDEX[name]]
+
+    def tail(self, n: int) -> 'KlineArrays':
+        """获取最近n根K线（零拷贝视图）"""
+        if n <= 0:
+            return KlineArrays(self.data[:, :0])
+        return KlineArrays(self.data[:, -n:])
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        """最后一根K线的开盘时间（毫秒）"""
+        return int(self.data[0, -1]) if len(self) else None
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        转换为DataFrame，列与 KlineDataFetcher.get_klines 的基础列一致
+        """
+        frame = {name: self.column(name) for name in KLINE_FIELDS}
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'].astype(np.int64), unit='ms')
+        frame['close_time'] = pd.to_datetime(frame['close_time'].astype(np.int64), unit='ms')
+        frame['trades_count'] = frame['trades_count'].astype(np.int64)
+        return pd.DataFrame(frame)
+
+
+# 为每个字段生成只读属性，如 arrays.timestamp / arrays.close
+for _name in KLINE_FIELDS:
+    setattr(KlineArrays, _name, property(lambda self, _i=FIELD_INDEX[_name]: self.data[_i]))
+
+
+def merge_arrays(old: KlineArrays, new: KlineArrays) -> KlineArrays:
+    """
+    合并两段K线数据，按开盘时间去重（new 覆盖 old）并升序排列
+
+    Args:
+        old: 旧数据
+        new: 新数据
+
+    Returns:
+        KlineArrays: 合并后的数据
+    """
+    if not len(new):
+        return old
+    if not len(old):
+        return new
+    # 新数据整体位于旧数据之后时直接拼接
+    if new.data[0, 0] > old.data[0, -1]:
+        return KlineArrays(np.concatenate([old.data, new.data], axis=1))
+
+    combined = np.concatenate([old.data, new.data], axis=1)
+    # 反转后取每个开盘时间第一次出现的位置，即保留最后写入的那一行
+    reversed_ts = combined[0, ::-1]
+    _, first_idx = np.unique(reversed_ts, return_index=True)
+    keep = combined.shape[1] - 1 - first_idx
+    return KlineArrays(combined[:, keep])
+
+
+class KlineStore:
+    """
+    本地K线存储，每个 (symbol, interval) 对应一个列式 .npy 文件
+
+    序列中只保存已收盘的K线，按开盘时间升序排列且不重复。
+    """
+
+    def __init__(self, base_dir: str = KLINE_CACHE_DIR, max_klines: int = MAX_STORED_KLINES,
+                 default_klines: int = DEFAULT_STORED_KLINES):
+        """
+        初始化K线存储
+
+        Args:
+            base_dir: 存储目录
+            max_klines: 回填的序列最多保留的K线数量
+            default_klines: 未回填的序列默认保留的K线数量
+        """
+        self.base_dir = base_dir
+        self.max_klines = max_klines
+        self.default_klines = default_klines
+        self._locks = defaultdict(threading.Lock)
+        # 进程内的内存映射: (symbol, interval) -> ((inode, 大小, mtime), 列式数据)
+        self._memory: Dict[Tuple[str, str], Tuple[Tuple[int, int, int], KlineArrays]] = {}
+
+    def _series_path(self, symbol: str, interval: str) -> str:
+        """获取序列文件路径"""
+        return os.path.join(self.base_dir, f"{symbol}_{interval}.npy")
+
+    def load(self, symbol: str, interval: str) -> KlineArrays:
+        """
+        读取已存储的K线序列（只读内存映射）
+
+        Args:
+            symbol: 币安交易对，如 'BTCUSDT'
+            interval: 时间周期，如 '1h'
+
+        Returns:
+            KlineArrays: 按开盘时间升序排列的已收盘K线
+        """
+        with self._locks[(symbol, interval)]:
+            return self._load_unlocked(symbol, interval)
+
+    def _load_unlocked(self, symbol: str, interval: str) -> KlineArrays:
+        """读取序列（调用方需持有锁），文件未变化时直接复用已有的内存映射"""
+        key = (symbol, interval)
+        path = self._series_path(symbol, interval)
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._memory.pop(key, None)
+            return KlineArrays.empty()
+
+        # os.replace 每次写入都会产生新的inode，与大小、mtime一起判断文件是否变化
+        version = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = self._memory.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        try:
+            data = np.load(path, mmap_mode='r')
+        except Exception as e:
+            logger.error(f"读取K线缓存失败 {path}: {str(e)}")
+            return KlineArrays.empty()
+
+        if data.ndim != 2 or data.shape[0] != len(KLINE_FIELDS):
+            logger.error(f"K线缓存格式不正确 {path}: {data.shape}")
+            return KlineArrays.empty()
+
+        arrays = KlineArrays(data)
+        self._memory[key] = (version, arrays)
+        return arrays
+
+    def high_water_mark(self, symbol: str, interval: str) -> Optional[int]:
+        """
+        获取序列中最后一根已收盘K线的开盘时间（毫秒）
+
+        Returns:
+            Optional[int]: 开盘时间，序列为空时返回None
+        """
+        return self.load(symbol, interval).last_open_time
+
+    def merge(self, symbol: str, interval: str, rows, replace: bool = False, backfill: bool = False) -> KlineArrays:
+        """
+        将新K线合并进序列并写回磁盘
+
+        只保存已收盘的K线（收盘时间早于当前时间），按开盘时间去重，新数据覆盖旧数据。
+        序列默认最多保留 default_klines 根；回填过的序列保持已有长度（不超过 max_klines），
+        之后的增量合并不会把它截短。
+
+        Args:
+            symbol: 币安交易对
+            interval: 时间周期
+            rows: 币安原始K线行或 KlineArrays
+            replace: 是否丢弃旧序列（新数据与旧序列不连续时使用）
+            backfill: 是否为范围回填（允许序列增长到 max_klines）
+
+        Returns:
+            KlineArrays: 合并后的序列
+        """
+        new = rows if isinstance(rows, KlineArrays) else KlineArrays.from_rows(rows)
+        now_ms = time.time() * 1000
+        closed = KlineArrays(new.data[:, new.close_time < now_ms])
+
+        with self._locks[(symbol, interval)]:
+            existing = KlineArrays.empty() if replace else self._load_unlocked(symbol, interval)
+            if not len(closed):
+                return existing
+
+            if backfill:
+                limit = self.max_klines
+            else:
+                limit = max(self.default_klines, min(len(existing), self.max_klines))
+            series = merge_arrays(existing, closed).tail(limit)
+            return self._write_unlocked(symbol, interval, series)
+
+    def _write_unlocked(self, symbol: str, interval: str, series: KlineArrays) -> KlineArrays:
+        """原子写入序列文件（先写临时文件再重命名），调用方需持有锁"""
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self._series_path(symbol, interval)
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, prefix=f".{symbol}_{interval}.", suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(series.data, dtype=np.float64))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"保存K线缓存失败 {path}: {str(e)}")
+            return series
+
+        self._memory.pop((symbol, interval), None)
+        return self._load_unlocked(symbol, interval)
+
+    def clear(self, symbol: str, interval: str) -> None:
+        """删除某个序列"""
+        with self._locks[(symbol, interval)]:
+            self._memory.pop((symbol, interval), None)
+            try:
+                os.remove(self._series_path(symbol, interval))
+            except OSError:
+                pass
+
+
+# 全局K线存储实例
+kline_store = KlineStore()
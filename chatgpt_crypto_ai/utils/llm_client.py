@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+共享的 OpenAI 客户端
+
+进程内只创建一个 OpenAI 客户端，底层 httpx 连接池在请求之间复用（省去每次的
+TCP/TLS 握手）。每次调用的超时来自 config.OPENAI_TIMEOUT；并发调用数由信号量限制，
+超出时排队等待，等待时间计入同一个超时。流式调用在收到第一个 token 时立即返回。
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+from openai import OpenAI
+
+import config
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('llm_client')
+
+# 建立连接的超时（秒），读取超时使用 config.OPENAI_TIMEOUT
+CONNECT_TIMEOUT = 5.0
+
+# 空闲连接的保活时间（秒）
+KEEPALIVE_EXPIRY = 60.0
+
+_client: Optional[OpenAI] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+_semaphore = threading.BoundedSemaphore(config.OPENAI_MAX_CONCURRENCY)
+
+
+class LLMBusyError(RuntimeError):
+    """在超时时间内没有等到可用的并发名额"""
+
+
+def get_openai_client() -> OpenAI:
+    """
+    获取进程内共享的 OpenAI 客户端（线程安全，懒加载，fork 后在子进程中重新创建）
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            if not config.OPENAI_API_KEY:
+                logger.warning("未配置OPENAI_API_KEY")
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=config.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.OPENAI_MAX_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(config.OPENAI_TIMEOUT, connect=CONNECT_TIMEOUT),
+            )
+            _client = OpenAI(
+                api_key=config.OPENAI_API_KEY,
+                base_url=config.OPENAI_BASE_URL,
+                timeout=config.OPENAI_TIMEOUT,
+                max_retries=config.OPENAI_MAX_RETRIES,
+                http_client=http_client,
+            )
+            _client_pid = pid
+    return _client
+
+
+def _acquire(deadline: float) -> None:
+    """在截止时间前获取并发名额"""
+    if not _semaphore.acquire(timeout=max(deadline - time.monotonic(), 0)):
+        raise LLMBusyError(f"OpenAI 并发调用已达上限 {config.OPENAI_MAX_CONCURRENCY}，等待超时")
+
+
+def chat_completion(messages: List[Dict[str, str]], model: Optional[str] = None,
+                    timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    非流式调用 chat.completions
+
+    Args:
+        messages: 消息列表
+        model: 模型，默认 config.OPENAI_MODEL
+        timeout: 本次调用的总超时（秒，含排队时间），默认 config.OPENAI_TIMEOUT
+        **kwargs: 传给 chat.completions.create 的其他参数
+
+    Returns:
+        ChatCompletion: OpenAI 返回结果
+    """
+    timeout = timeout or config.OPENAI_TIMEOUT
+    deadline = time.monotonic() + timeout
+    _acquire(deadline)
+    try:
+        return get_openai_client().chat.completions.create(
+            model=model or config.OPENAI_MODEL,
+            messages=messages,
+            timeout=max(deadline - time.monotonic(), 1.0),
+            **kwargs
+        )
+    finally:
+        _semaphore.release()
+
+
+def stream_chat_completion(messages: List[Dict[str, str]], model: Optional[str] = None,
+                           timeout: Optional[float] = None, **kwargs) -> Iterator[str]:
+    """
+    流式调用 chat.completions，逐个返回内容片段
+
+    并发名额在整个流结束（或调用方停止迭代）时释放。
+
+    Args:
+        messages: 消息列表
+        model: 模型，默认 config.OPENAI_MODEL
+        timeout: 排队和每次读取的超时（秒），默认 config.OPENAI_TIMEOUT
+        **kwargs: 传给 chat.completions.create 的其他参数
+
+    Yields:
+        str: 内容片段
+    """
+    timeout = timeout or config.OPENAI_TIMEOUT
+    _acquire(time.monotonic() + timeout)
+    try:
+        stream = get_openai_client().chat.completions.create(
+            model=model or config.OPENAI_MODEL,
+            messages=messages,
+            stream=True,
+            timeout=timeout,
+            **kwargs
+        )
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+        finally:
+            stream.close()
+    finally:
+        _semaphore.release()
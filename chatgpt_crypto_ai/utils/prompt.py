@@ -2,10 +2,23 @@
 """
 构造OpenAI GPT模型的输入消息模块
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+import numpy as np
 import pandas as pd
 import json
 
+import config
+from utils.token_budget import count_message_tokens, count_tokens, truncate_to_tokens, TOKENS_PER_MESSAGE
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('prompt')
+
+# 较早对话摘要中每条消息保留的 token 数，以及摘要最多占用的 token 数
+SUMMARY_TOKENS_PER_MESSAGE = 40
+SUMMARY_MAX_TOKENS = 400
+
 class PromptConstructor:
     """
     负责构造发送给GPT模型的提示
@@ -128,9 +141,16 @@ class PromptConstructor:
             content += f"**错误:** {analysis_data['error']}\n"
             return {"role": "assistant", "content": content}
         
-        # 当前价格和涨跌幅
-        content += f"**当前价格:** {analysis_data['price']:.4f}\n"
-        content += f"**24小时涨跌:** {analysis_data['price_change_pct_24h']:.2f}%\n"
+        # 当前价格和涨跌幅，有实时24小时行情时优先使用
+        ticker = analysis_data.get('ticker_24h')
+        if ticker:
+            content += f"**当前价格:** {ticker['price']:.4f}\n"
+            content += f"**24小时涨跌:** {ticker['24h_change']:.2f}%\n"
+            content += f"**24小时最高/最低:** {ticker['24h_high']:.4f} / {ticker['24h_low']:.4f}\n"
+            content += f"**24小时成交量:** {ticker['24h_volume']:.2f}\n"
+        else:
+            content += f"**当前价格:** {analysis_data['price']:.4f}\n"
+            content += f"**24小时涨跌:** {analysis_data['price_change_pct_24h']:.2f}%\n"
         
         if analysis_data.get('change_20d') is not None:
             content += f"**20天涨跌幅:** {analysis_data['change_20d']:.2f}%\n"
@@ -159,14 +179,83 @@ class PromptConstructor:
         if analysis_data['resistance_levels']:
             resistance_levels = [f"{level:.4f}" for level in analysis_data['resistance_levels']]
             content += f"**主要阻力位:** {', '.join(resistance_levels)}\n"
-        
+
+        # 多周期趋势汇总
+        multi_timeframe = analysis_data.get('multi_timeframe')
+        if multi_timeframe:
+            content += "\n**多周期趋势:**\n"
+            for tf, summary in multi_timeframe.items():
+                ma_text = f"均线{summary['ma_trend']}，" if summary['ma_trend'] else ""
+                content += (
+                    f"- {tf}: {summary['overall_trend']}，{ma_text}"
+                    f"RSI {summary['rsi']:.2f}，MACD {summary['macd_signal']}\n"
+                )
+
+        # 交易意图附带的规则历史回测
+        backtest = analysis_data.get('backtest')
+        if backtest:
+            content += "\n**信号历史回测（已扣手续费）:**\n"
+            for result in backtest.values():
+                if not result['trades']:
+                    content += f"- {result['description']}: 最近{result['bars']}根K线内无完整交易\n"
+                    continue
+                content += (
+                    f"- {result['description']}: 最近{result['bars']}根K线 {result['trades']}笔交易，"
+                    f"胜率{result['win_rate']:.1f}%，单笔期望{result['expectancy']:+.2f}%，"
+                    f"最大回撤{result['max_drawdown']:.2f}%\n"
+                )
+
         # 添加最近价格数据的简要描述
         if recent_price_data is not None and not recent_price_data.empty:
-            last_5_days = recent_price_data.tail(5)
             content += "\n**最近5天价格走势:**\n"
-            for _, row in last_5_days.iterrows():
-                date = row['timestamp'].strftime('%Y-%m-%d')
-                content += f"- {date}: 开:{row['open']:.4f} 高:{row['high']:.4f} 低:{row['low']:.4f} 收:{row['close']:.4f} 量:{row['volume']:.2f}\n"
+            content += PromptConstructor.render_candle_table(recent_price_data.tail(5))
+        
+        return {"role": "assistant", "content": content}
+    
+    @staticmethod
+    def render_candle_table(candles: pd.DataFrame) -> str:
+        """
+        把K线渲染为逐行文本（整列格式化，不逐行遍历DataFrame）
+        
+        Args:
+            candles: 包含 timestamp/open/high/low/close/volume 列的K线
+            
+        Returns:
+            str: 每根K线一行，如 "- 2024-01-01: 开:1.0000 高:... 量:...\n"
+        """
+        def fmt(column: str, spec: str) -> np.ndarray:
+            return np.char.mod(spec, candles[column].to_numpy(dtype=np.float64)).astype(object)
+        
+        lines = pd.to_datetime(candles['timestamp']).dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+        lines = "- " + lines + ": 开:" + fmt('open', '%.4f') + " 高:" + fmt('high', '%.4f') \
+            + " 低:" + fmt('low', '%.4f') + " 收:" + fmt('close', '%.4f') + " 量:" + fmt('volume', '%.2f') + "\n"
+        return "".join(lines)
+    
+    @staticmethod
+    def construct_screener_message(market_screen: Dict[str, Any]) -> Dict[str, str]:
+        """
+        构造全市场筛选结果消息（用户没有指定币种时使用）
+        
+        Args:
+            market_screen: MarketScreener.overview 的结果
+            
+        Returns:
+            Dict: 包含角色和内容的消息字典
+        """
+        content = f"### 全市场 {market_screen['interval']} 筛选数据（USDT交易对）\n\n"
+        
+        for query, rows in market_screen['results'].items():
+            if not rows:
+                continue
+            items = []
+            for row in rows:
+                item = f"{row['symbol']} {row['price']:.4f}"
+                if row.get('change_24h') is not None:
+                    item += f" {row['change_24h']:+.2f}%"
+                if row.get('rsi') is not None:
+                    item += f" RSI {row['rsi']:.1f}"
+                items.append(item)
+            content += f"**{market_screen['labels'].get(query, query)}:** {'; '.join(items)}\n"
         
         return {"role": "assistant", "content": content}
     
@@ -195,10 +284,12 @@ class PromptConstructor:
         extracted_info: Dict[str, Any],
         analysis_results: Dict[str, Dict[str, Any]],
         price_data: Dict[str, pd.DataFrame],
-        previous_messages: Optional[List[Dict[str, str]]] = None
+        previous_messages: Optional[List[Dict[str, str]]] = None,
+        market_screen: Optional[Dict[str, Any]] = None,
+        token_budget: Optional[int] = None
     ) -> List[Dict[str, str]]:
         """
-        构造完整的消息列表
+        构造完整的消息列表（在 token 预算内）
         
         Args:
             user_prompt: 用户原始提示
@@ -206,26 +297,111 @@ class PromptConstructor:
             analysis_results: 每个符号的分析结果
             price_data: 每个符号的价格数据
             previous_messages: 上下文中的前序消息
+            market_screen: 全市场筛选结果（没有指定币种时提供）
+            token_budget: 提示词 token 上限，默认 config.PROMPT_TOKEN_BUDGET
             
         Returns:
             List[Dict[str, str]]: 消息列表
         """
-        # 初始化消息列表
-        messages = []
+        messages, _ = PromptConstructor.build_prompt(
+            user_prompt, extracted_info, analysis_results, price_data,
+            previous_messages, market_screen, token_budget
+        )
+        return messages
+    
+    @staticmethod
+    def build_prompt(
+        user_prompt: str,
+        extracted_info: Dict[str, Any],
+        analysis_results: Dict[str, Dict[str, Any]],
+        price_data: Dict[str, pd.DataFrame],
+        previous_messages: Optional[List[Dict[str, str]]] = None,
+        market_screen: Optional[Dict[str, Any]] = None,
+        token_budget: Optional[int] = None
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        在 token 预算内构造消息列表，并返回提示词大小统计
+        
+        系统消息、分析数据和当前用户消息必须保留；剩余预算从最新的消息开始依次
+        放入历史消息，放不下的较早对话压缩为一条摘要。必需部分本身超出预算时，
+        先去掉分析数据中的K线明细。
         
-        # 获取用户意图
+        Args:
+            与 construct_messages 相同
+            
+        Returns:
+            Tuple[List, Dict]: (消息列表, 统计信息：tokens/budget/messages/history_kept/
+                               history_summarized/history_dropped)
+        """
+        budget = token_budget or config.PROMPT_TOKEN_BUDGET
         intent = extracted_info.get("intent", "analyze")
         
-        # 添加基于意图的系统消息
-        messages.append(PromptConstructor.construct_system_message(intent))
+        system_message = PromptConstructor.construct_system_message(intent)
+        user_message = PromptConstructor.construct_user_message(user_prompt, extracted_info)
+        
+        # 分析数据，超出预算时去掉K线明细
+        data_messages = PromptConstructor._construct_data_messages(
+            extracted_info, analysis_results, price_data, market_screen, include_candles=True)
+        required = [system_message] + data_messages + [user_message]
+        if count_message_tokens(required) > budget:
+            data_messages = PromptConstructor._construct_data_messages(
+                extracted_info, analysis_results, price_data, market_screen, include_candles=False)
+            required = [system_message] + data_messages + [user_message]
+        remaining = budget - count_message_tokens(required)
+        
+        # 历史消息（跳过系统消息，以及与当前输入相同的最后一条用户消息）
+        history = [msg for msg in (previous_messages or []) if msg["role"] != "system"]
+        if history and history[-1]["role"] == "user" and history[-1]["content"] == user_prompt:
+            history = history[:-1]
         
-        # 添加前序消息（如果有）
-        if previous_messages:
-            for msg in previous_messages:
-                if msg["role"] != "system":  # 避免重复的系统消息
-                    messages.append(msg)
+        # 历史放不下时为摘要预留一部分预算
+        costs = [count_tokens(msg["content"]) + TOKENS_PER_MESSAGE for msg in history]
+        reserve = min(SUMMARY_MAX_TOKENS, max(remaining, 0) // 4) if sum(costs) > remaining else 0
         
-        # 为每个符号添加分析消息
+        # 从最新的消息开始放入，直到预算用完
+        available = remaining - reserve
+        kept_count = 0
+        for cost in reversed(costs):
+            if cost > available:
+                break
+            available -= cost
+            kept_count += 1
+        kept = history[len(history) - kept_count:] if kept_count else []
+        older = history[:len(history) - kept_count]
+        
+        # 放不下的较早对话压缩为摘要
+        summary_message = PromptConstructor._summarize_history(older, available + reserve) if older else None
+        
+        messages = [system_message]
+        if summary_message:
+            messages.append(summary_message)
+        messages.extend(kept)
+        messages.extend(data_messages)
+        messages.append(user_message)
+        
+        stats = {
+            "tokens": count_message_tokens(messages),
+            "budget": budget,
+            "messages": len(messages),
+            "history_kept": len(kept),
+            "history_summarized": len(older) if summary_message else 0,
+            "history_dropped": 0 if summary_message else len(older),
+        }
+        logger.info(f"提示词大小: {stats['tokens']}/{budget} tokens，{stats['messages']} 条消息，"
+                    f"保留历史 {stats['history_kept']} 条，摘要 {stats['history_summarized']} 条，"
+                    f"丢弃 {stats['history_dropped']} 条")
+        return messages, stats
+    
+    @staticmethod
+    def _construct_data_messages(
+        extracted_info: Dict[str, Any],
+        analysis_results: Dict[str, Dict[str, Any]],
+        price_data: Dict[str, pd.DataFrame],
+        market_screen: Optional[Dict[str, Any]],
+        include_candles: bool = True
+    ) -> List[Dict[str, str]]:
+        """构造每个币种的分析消息和全市场筛选消息"""
+        messages = []
         symbols = extracted_info.get('symbols', [])
         timeframe = extracted_info.get('time_window', '1d')
         
@@ -236,7 +412,7 @@ class PromptConstructor:
                 else:
                     symbol_key = symbol
                     
-                recent_data = price_data.get(symbol_key)
+                recent_data = price_data.get(symbol_key) if include_candles else None
                 analysis_msg = PromptConstructor.construct_analysis_message(
                     symbol_key, 
                     timeframe, 
@@ -245,7 +421,39 @@ class PromptConstructor:
                 )
                 messages.append(analysis_msg)
         
-        # 添加用户消息
-        messages.append(PromptConstructor.construct_user_message(user_prompt, extracted_info))
+        # 没有具体币种时附上全市场筛选结果
+        if market_screen:
+            messages.append(PromptConstructor.construct_screener_message(market_screen))
         
         return messages
+    
+    @staticmethod
+    def _summarize_history(history: List[Dict[str, str]], max_tokens: int) -> Optional[Dict[str, str]]:
+        """
+        把较早的对话压缩为一条摘要消息（每条消息只保留开头部分，优先保留较新的消息）
+        
+        Args:
+            history: 较早的消息，按时间正序
+            max_tokens: 摘要可用的 token 数
+            
+        Returns:
+            Optional[Dict]: 摘要消息，预算不足时为None
+        """
+        header = "[较早的对话摘要]\n"
+        budget = max_tokens - TOKENS_PER_MESSAGE - count_tokens(header)
+        if budget <= 0:
+            return None
+        
+        lines = []
+        for msg in reversed(history):
+            role = "用户" if msg["role"] == "user" else "助手"
+            line = f"{role}: {truncate_to_tokens(' '.join(msg['content'].split()), SUMMARY_TOKENS_PER_MESSAGE)}\n"
+            cost = count_tokens(line)
+            if cost > budget:
+                break
+            lines.insert(0, line)
+            budget -= cost
+        
+        if not lines:
+            return None
+        return {"role": "system", "content": header + "".join(lines)}
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+K线重采样模块：由基础周期的K线聚合出更高周期的K线
+
+例如 5m -> 15m/1h/4h、1h -> 1d。同一交易对的多个周期只需向币安请求一次
+基础周期K线，其余周期在本地用数组运算聚合（开盘取首根、收盘取末根、
+最高/最低取极值、成交量等累加），与币安返回的高周期K线一致。
+"""
+import logging
+from typing import Dict, Iterable
+
+import numpy as np
+
+from utils.kline_store import KlineArrays, FIELD_INDEX
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('resample')
+
+# 各周期的毫秒数（只包含与UTC零点对齐、可由低周期整除聚合的周期）
+INTERVAL_MS = {
+    '1m': 60 * 1000, '3m': 3 * 60 * 1000, '5m': 5 * 60 * 1000,
+    '15m': 15 * 60 * 1000, '30m': 30 * 60 * 1000,
+    '1h': 3600 * 1000, '2h': 2 * 3600 * 1000, '4h': 4 * 3600 * 1000,
+    '6h': 6 * 3600 * 1000, '8h': 8 * 3600 * 1000, '12h': 12 * 3600 * 1000,
+    '1d': 24 * 3600 * 1000,
+}
+
+# 可作为基础周期的K线（从细到粗）
+BASE_INTERVALS = ('5m', '1h')
+
+# 聊天中多周期汇总使用的周期
+MULTI_TIMEFRAMES = ('1h', '4h', '1d')
+
+# 一次请求的基础K线数量（币安单次上限）
+BASE_KLINES = 1000
+
+# 需要累加的字段
+_SUM_FIELDS = [FIELD_INDEX[name] for name in
+               ('volume', 'quote_volume', 'trades_count', 'taker_buy_base', 'taker_buy_quote')]
+
+
+def choose_base_interval(timeframes: Iterable[str]) -> str:
+    """
+    选择能聚合出所有目标周期的最粗基础周期
+
+    Args:
+        timeframes: 目标周期，如 ('1h', '4h', '1d')
+
+    Returns:
+        str: 基础周期
+    """
+    timeframes = tuple(timeframes)
+    if not timeframes or any(tf not in INTERVAL_MS for tf in timeframes):
+        raise ValueError(f"不支持重采样的时间周期: {timeframes}")
+    targets = [INTERVAL_MS[tf] for tf in timeframes]
+    for base in reversed(BASE_INTERVALS):
+        base_ms = INTERVAL_MS[base]
+        if all(target % base_ms == 0 for target in targets):
+            return base
+    raise ValueError(f"没有可用的基础周期: {timeframes}")
+
+
+def resample_arrays(arrays: KlineArrays, base_interval: str, target_interval: str) -> KlineArrays:
+    """
+    把基础周期K线聚合为目标周期K线
+
+    开头不完整的周期会被丢弃；最后一个周期可能尚未走完（与币安返回的
+    未收盘K线相同）。
+
+    Args:
+        arrays: 按开盘时间升序的基础周期K线
+        base_interval: 基础周期
+        target_interval: 目标周期，必须是基础周期的整数倍
+
+    Returns:
+        KlineArrays: 目标周期K线
+    """
+    base_ms = INTERVAL_MS[base_interval]
+    target_ms = INTERVAL_MS[target_interval]
+    if target_ms % base_ms:
+        raise ValueError(f"{target_interval} 不能由 {base_interval} 聚合")
+    if target_ms == base_ms or not len(arrays):
+        return arrays
+
+    data = arrays.data
+    n = data.shape[1]
+    bucket = data[FIELD_INDEX['timestamp']].astype(np.int64) // target_ms
+    starts = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+
+    # 丢弃开头缺少K线的周期（第一根K线不在周期起点）
+    if bucket[0] * target_ms != int(data[FIELD_INDEX['timestamp'], 0]):
+        starts = starts[1:]
+        if not len(starts):
+            return KlineArrays.empty()
+        data = data[:, starts[0]:]
+        bucket = bucket[starts[0]:]
+        starts = starts - starts[0]
+        n = data.shape[1]
+
+    ends = np.concatenate([starts[1:], [n]]) - 1
+    result = np.empty((data.shape[0], len(starts)), dtype=np.float64)
+    result[FIELD_INDEX['timestamp']] = bucket[starts] * target_ms
+    result[FIELD_INDEX['open']] = data[FIELD_INDEX['open'], starts]
+    result[FIELD_INDEX['high']] = np.maximum.reduceat(data[FIELD_INDEX['high']], starts)
+    result[FIELD_INDEX['low']] = np.minimum.reduceat(data[FIELD_INDEX['low']], starts)
+    result[FIELD_INDEX['close']] = data[FIELD_INDEX['close'], ends]
+    result[FIELD_INDEX['close_time']] = result[FIELD_INDEX['timestamp']] + target_ms - 1
+    result[_SUM_FIELDS] = np.add.reduceat(data[_SUM_FIELDS], starts, axis=1)
+    return KlineArrays(result)
+
+
+def multi_timeframe_arrays(fetcher, symbol: str, timeframes: Iterable[str] = MULTI_TIMEFRAMES,
+                           limit: int = BASE_KLINES) -> Dict[str, KlineArrays]:
+    """
+    一次获取基础周期K线，聚合出多个周期
+
+    Args:
+        fetcher: KlineDataFetcher
+        symbol: 货币对符号，如 'BTC/USDT'
+        timeframes: 目标周期
+        limit: 基础周期K线数量
+
+    Returns:
+        Dict[str, KlineArrays]: 周期到K线的映射，获取失败时为空字典
+    """
+    timeframes = tuple(timeframes)
+    base = choose_base_interval(timeframes)
+    arrays = fetcher.get_kline_arrays(symbol, base, limit)
+    if not len(arrays):
+        return {}
+    return {tf: resample_arrays(arrays, base, tf) for tf in timeframes}
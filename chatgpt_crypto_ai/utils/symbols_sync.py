@@ -1,30 +1,50 @@
 # -*- coding: utf-8 -*-
 """
 直接从币安API获取并同步最新币种信息
+
+缓存过期后读取方立即拿到旧数据，由后台线程重新下载（stale-while-revalidate）；
+多个 worker 进程通过文件锁保证同一时间只有一个进程在刷新。
 """
 import json
 import os
 import time
+import tempfile
+import threading
 import requests
-from typing import List, Dict, Any, Optional
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Mapping, NamedTuple, Tuple, FrozenSet
 import logging
 
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，退化为仅进程内互斥
+    fcntl = None
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('symbols_sync')
 
 # API设置
-BINANCE_API_BASE = 'https://api.binance.com'
-BINANCE_API_FALLBACK = 'https://api1.binance.com'  # 备用API地址
+BINANCE_API_BASE = config.BINANCE_API_BASE
+BINANCE_API_FALLBACK = config.BINANCE_API_FALLBACK  # 备用API地址
 BINANCE_EXCHANGE_INFO_ENDPOINT = '/api/v3/exchangeInfo'
 
 # 缓存文件路径
 CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
 SYMBOLS_CACHE_FILE = os.path.join(CACHE_DIR, "binance_symbols.json")
+SYMBOLS_LOCK_FILE = os.path.join(CACHE_DIR, "binance_symbols.lock")
 
 # 缓存有效期（24小时）
 CACHE_TTL = 86400  # 秒
 
+# 进程内快照的有效期，超过后即使文件未变化也重新检查一次
+MEMORY_CACHE_TTL = 300  # 秒
+
+# 后台刷新失败后的重试间隔
+REFRESH_RETRY_INTERVAL = 300  # 秒
+
 
 def ensure_cache_dir():
     """确保缓存目录存在"""
@@ -109,7 +129,7 @@ def fetch_binance_symbols() -> Dict[str, Dict]:
 
 
 def save_symbols_cache(symbols_dict: Dict[str, Dict], base_coins: List[str]):
-    """保存交易对和币种信息到缓存文件"""
+    """保存交易对和币种信息到缓存文件（先写临时文件再重命名，读取方不会读到半个文件）"""
     ensure_cache_dir()
     
     cache_data = {
@@ -118,16 +138,97 @@ def save_symbols_cache(symbols_dict: Dict[str, Dict], base_coins: List[str]):
         "base_coins": base_coins
     }
     
+    tmp_path = None
     try:
-        with open(SYMBOLS_CACHE_FILE, 'w') as f:
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".binance_symbols.", suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
             json.dump(cache_data, f)
+        os.replace(tmp_path, SYMBOLS_CACHE_FILE)
         logger.info(f"交易对和币种信息已缓存到 {SYMBOLS_CACHE_FILE}")
     except Exception as e:
         logger.error(f"保存交易对缓存失败: {str(e)}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
-def load_symbols_cache() -> Optional[Dict]:
-    """从缓存加载交易对和币种信息，如果缓存有效的话"""
+def _is_cache_fresh() -> bool:
+    """缓存文件是否存在且未过期"""
+    cache_data = read_symbols_cache_file()
+    return bool(cache_data) and int(time.time()) - cache_data["timestamp"] <= CACHE_TTL
+
+
+def refresh_symbols_cache(blocking: bool = False, force: bool = False) -> bool:
+    """
+    在文件锁保护下从币安API刷新交易对缓存
+
+    拿到锁后会再检查一次缓存：其他进程刚刚刷新过时直接返回，不重复下载。
+
+    Args:
+        blocking: 锁被其他进程持有时是否等待
+        force: 缓存未过期时是否也强制刷新
+
+    Returns:
+        bool: 缓存当前是否有效（本进程或其他进程已完成刷新）
+    """
+    ensure_cache_dir()
+    with open(SYMBOLS_LOCK_FILE, 'a') as lock_file:
+        if fcntl is not None:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file.fileno(), flags)
+            except OSError:
+                logger.info("其他进程正在刷新交易对缓存，跳过")
+                return False
+        try:
+            if not force and _is_cache_fresh():
+                return True
+            return bool(fetch_binance_symbols())
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+# 进程内的后台刷新状态
+_refresh_thread: Optional[threading.Thread] = None
+_refresh_attempted_at = 0.0
+_refresh_lock = threading.Lock()
+
+
+def schedule_symbols_refresh() -> bool:
+    """
+    在后台线程中刷新交易对缓存，已有刷新在进行或刚失败过时不重复启动
+
+    Returns:
+        bool: 是否启动了新的刷新线程
+    """
+    global _refresh_thread, _refresh_attempted_at
+
+    with _refresh_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return False
+        if time.time() - _refresh_attempted_at < REFRESH_RETRY_INTERVAL:
+            return False
+        _refresh_attempted_at = time.time()
+
+        def refresh():
+            try:
+                if refresh_symbols_cache():
+                    logger.info("后台刷新交易对缓存完成")
+            except Exception as e:
+                logger.error(f"后台刷新交易对缓存失败: {str(e)}")
+
+        _refresh_thread = threading.Thread(target=refresh, name='symbols-refresh', daemon=True)
+        _refresh_thread.start()
+        return True
+
+
+def read_symbols_cache_file() -> Optional[Dict]:
+    """
+    读取缓存文件内容（不检查是否过期）
+
+    Returns:
+        Optional[Dict]: 包含 timestamp、symbols_dict、base_coins 的字典，读取失败返回None
+    """
     if not os.path.exists(SYMBOLS_CACHE_FILE):
         return None
     
@@ -135,19 +236,10 @@ def load_symbols_cache() -> Optional[Dict]:
         with open(SYMBOLS_CACHE_FILE, 'r') as f:
             cache_data = json.load(f)
         
-        timestamp = cache_data.get("timestamp", 0)
-        symbols_dict = cache_data.get("symbols_dict", {})
-        base_coins = cache_data.get("base_coins", [])
-        
-        # 检查缓存是否过期
-        if int(time.time()) - timestamp > CACHE_TTL:
-            logger.info("交易对缓存已过期")
-            return None
-        
-        logger.info(f"从缓存加载了 {len(symbols_dict)} 个交易对和 {len(base_coins)} 个基础币种")
         return {
-            "symbols_dict": symbols_dict,
-            "base_coins": base_coins
+            "timestamp": cache_data.get("timestamp", 0),
+            "symbols_dict": cache_data.get("symbols_dict", {}),
+            "base_coins": cache_data.get("base_coins", []),
         }
     
     except Exception as e:
@@ -155,46 +247,144 @@ def load_symbols_cache() -> Optional[Dict]:
         return None
 
 
+def load_symbols_cache() -> Optional[Dict]:
+    """从缓存加载交易对和币种信息，如果缓存有效的话"""
+    cache_data = read_symbols_cache_file()
+    if not cache_data:
+        return None
+    
+    # 检查缓存是否过期
+    if int(time.time()) - cache_data["timestamp"] > CACHE_TTL:
+        logger.info("交易对缓存已过期")
+        return None
+    
+    logger.info(f"从缓存加载了 {len(cache_data['symbols_dict'])} 个交易对和 {len(cache_data['base_coins'])} 个基础币种")
+    return {
+        "symbols_dict": cache_data["symbols_dict"],
+        "base_coins": cache_data["base_coins"]
+    }
+
+
+class SymbolsSnapshot(NamedTuple):
+    """
+    交易对缓存的不可变快照，所有视图在加载时一次性构建
+    """
+    symbols_dict: Mapping[str, Dict]      # 交易对 -> 交易对信息（只读）
+    base_coins: Tuple[str, ...]           # 排序后的基础币种
+    base_coin_set: FrozenSet[str]         # 基础币种集合，用于成员判断
+    trading_pairs: Tuple[str, ...]        # 基础币种对应的USDT交易对，与 base_coins 顺序一致
+    timestamp: int                        # 缓存文件中记录的获取时间
+
+
+# 进程内的交易对快照
+_snapshot: Optional[SymbolsSnapshot] = None
+_snapshot_mtime: Optional[int] = None
+_snapshot_checked_at = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def _build_snapshot(symbols_dict: Dict[str, Dict], base_coins: List[str], timestamp: int) -> SymbolsSnapshot:
+    """根据交易对信息构建不可变快照"""
+    if not base_coins:
+        base_coins = {info.get('baseAsset') for info in symbols_dict.values() if info.get('baseAsset')}
+    sorted_coins = tuple(sorted(base_coins))
+    return SymbolsSnapshot(
+        symbols_dict=MappingProxyType(dict(symbols_dict)),
+        base_coins=sorted_coins,
+        base_coin_set=frozenset(sorted_coins),
+        trading_pairs=tuple(f"{coin}USDT" for coin in sorted_coins),
+        timestamp=timestamp,
+    )
+
+
+def _cache_file_mtime() -> Optional[int]:
+    """获取缓存文件的修改时间，文件不存在时返回None"""
+    try:
+        return os.stat(SYMBOLS_CACHE_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_symbols_snapshot() -> SymbolsSnapshot:
+    """
+    获取交易对缓存快照
+
+    只有缓存文件的 mtime 变化时才重新读取文件并构建新快照，文件未变化时始终返回同一个对象；
+    每隔 MEMORY_CACHE_TTL 检查一次内容是否超过 CACHE_TTL，过期时立即返回旧数据，
+    并在后台线程中从币安API重新获取。
+
+    Returns:
+        SymbolsSnapshot: 交易对缓存快照
+    """
+    global _snapshot, _snapshot_mtime, _snapshot_checked_at
+
+    now = time.time()
+    snapshot = _snapshot
+    if snapshot is not None and now - _snapshot_checked_at < MEMORY_CACHE_TTL \
+            and _cache_file_mtime() == _snapshot_mtime:
+        return snapshot
+
+    with _snapshot_lock:
+        mtime = _cache_file_mtime()
+        if _snapshot is not None and mtime is not None and mtime == _snapshot_mtime:
+            # 文件未变化：保留原快照（调用方可按对象判断是否需要重建索引），只检查是否过期
+            if time.time() - _snapshot_checked_at >= MEMORY_CACHE_TTL:
+                if int(time.time()) - _snapshot.timestamp > CACHE_TTL and schedule_symbols_refresh():
+                    logger.info("交易对缓存已过期，已在后台刷新")
+                _snapshot_checked_at = time.time()
+            return _snapshot
+
+        cache_data = read_symbols_cache_file() if mtime is not None else None
+
+        if not cache_data:
+            # 没有任何本地数据时只能同步获取（进程首次启动）
+            refresh_symbols_cache(blocking=True)
+            cache_data = read_symbols_cache_file()
+            mtime = _cache_file_mtime()
+        elif int(time.time()) - cache_data["timestamp"] > CACHE_TTL:
+            # 缓存已过期：先返回旧数据，后台刷新完成后文件 mtime 变化会触发重新加载
+            if schedule_symbols_refresh():
+                logger.info("交易对缓存已过期，已在后台刷新")
+
+        if cache_data:
+            _snapshot = _build_snapshot(cache_data["symbols_dict"], cache_data["base_coins"], cache_data["timestamp"])
+        elif _snapshot is None:
+            _snapshot = _build_snapshot({}, [], 0)
+
+        _snapshot_mtime = mtime
+        _snapshot_checked_at = time.time()
+        return _snapshot
+
+
 def get_all_symbols() -> List[str]:
     """
-    获取所有基础币种符号，优先使用缓存，缓存无效则从API获取
+    获取所有基础币种符号，优先使用缓存，缓存过期时在后台刷新
     
     Returns:
-        List[str]: 基础币种符号列表
+        List[str]: 基础币种符号列表（副本；只读场景请直接使用 get_symbols_snapshot().base_coins）
     """
-    # 尝试从缓存加载
-    cache_data = load_symbols_cache()
-    
-    # 如果缓存无效或不存在，从API获取
-    if not cache_data:
-        symbols_dict = fetch_binance_symbols()
-        # 从交易对中提取基础币种
-        base_coins = set()
-        for symbol_info in symbols_dict.values():
-            base_coins.add(symbol_info.get('baseAsset'))
-        return sorted(list(base_coins))
-    else:
-        return cache_data.get("base_coins", [])
+    return list(get_symbols_snapshot().base_coins)
 
 
-def get_trading_pairs() -> Dict[str, Dict]:
+def get_trading_pairs() -> Mapping[str, Dict]:
     """
-    获取所有交易对信息，优先使用缓存，缓存无效则从API获取
+    获取所有交易对信息，优先使用缓存，缓存过期时在后台刷新
     
     Returns:
-        Dict[str, Dict]: 交易对信息字典，键为交易对符号，值为详细信息
+        Mapping[str, Dict]: 只读的交易对信息字典，键为交易对符号，值为详细信息
     """
-    # 尝试从缓存加载
-    cache_data = load_symbols_cache()
-    
-    # 如果缓存无效或不存在，从API获取
-    if not cache_data:
-        return fetch_binance_symbols()
-    else:
-        return cache_data.get("symbols_dict", {})
+    return get_symbols_snapshot().symbols_dict
 
 
 if __name__ == "__main__":
+    import sys
+
+    # 手动刷新缓存: python -m utils.symbols_sync --refresh
+    if '--refresh' in sys.argv:
+        ok = refresh_symbols_cache(blocking=True, force=True)
+        print("同步完成！" if ok else "同步失败")
+        sys.exit(0 if ok else 1)
+
     # 测试基础币种获取
     base_coins = get_all_symbols()
     print(f"获取到 {len(base_coins)} 个基础币种")
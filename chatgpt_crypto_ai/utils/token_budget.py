@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+提示词 token 计数
+
+安装了 tiktoken 时按模型的实际编码计数；否则按字符估算
+（中日韩字符约1个token，其余字符约4个字符1个token），估算值略偏大。
+"""
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import config
+
+# tiktoken 为可选依赖
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('token_budget')
+
+# 每条消息的格式开销（role、分隔符等）与回复前缀开销，与 OpenAI 的计数方式一致
+TOKENS_PER_MESSAGE = 4
+TOKENS_REPLY_PRIMING = 2
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """获取当前模型的 tiktoken 编码，不可用时返回None"""
+    global _encoding
+    if tiktoken is None:
+        return None
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    _encoding = tiktoken.encoding_for_model(config.OPENAI_MODEL)
+                except Exception:
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+
+def _is_cjk(ch: str) -> bool:
+    code = ord(ch)
+    return 0x3000 <= code <= 0x9FFF or 0xAC00 <= code <= 0xD7AF or 0xFF00 <= code <= 0xFFEF
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """
+    计算文本的 token 数
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: token 数（没有 tiktoken 时为估算值）
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    cjk = sum(1 for ch in text if _is_cjk(ch))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    计算消息列表的 token 数（含每条消息的格式开销）
+
+    Args:
+        messages: OpenAI 格式的消息列表
+
+    Returns:
+        int: token 数
+    """
+    if not messages:
+        return 0
+    return sum(TOKENS_PER_MESSAGE + count_tokens(msg.get("content")) for msg in messages) + TOKENS_REPLY_PRIMING
+
+
+def truncate_to_tokens(text: str, max_tokens: int, suffix: str = "…") -> str:
+    """
+    把文本截断到不超过 max_tokens 个 token
+
+    Args:
+        text: 文本
+        max_tokens: token 上限
+        suffix: 截断后追加的后缀
+
+    Returns:
+        str: 截断后的文本
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    # 二分查找能放下的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid] + suffix) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + suffix if low else ""
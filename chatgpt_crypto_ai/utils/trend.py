@@ -6,6 +6,8 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Any, Optional
 
+from utils.indicators import compute_indicators, DEFAULT_MA_WINDOWS
+
 class TrendAnalyzer:
     """
     趋势分析工具，提供各种技术指标计算和趋势判断功能
@@ -25,38 +27,25 @@ class TrendAnalyzer:
         # 创建副本避免修改原始数据
         result = df.copy()
         
-        # 计算常用移动平均线
-        result['MA5'] = result['close'].rolling(window=5).mean()
-        result['MA10'] = result['close'].rolling(window=10).mean()
-        result['MA20'] = result['close'].rolling(window=20).mean()
-        result['MA50'] = result['close'].rolling(window=50).mean()
-        
-        # 计算RSI (相对强弱指标)
-        delta = result['close'].diff()
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        
-        avg_gain = gain.rolling(window=14).mean()
-        avg_loss = loss.rolling(window=14).mean()
+        # 所有指标由指标引擎基于收盘价数组一次计算
+        indicators = compute_indicators(result['close'].to_numpy(dtype=np.float64), ma_windows=DEFAULT_MA_WINDOWS)
         
-        rs = avg_gain / avg_loss
-        result['RSI'] = 100 - (100 / (1 + rs))
+        # 常用移动平均线
+        for window in DEFAULT_MA_WINDOWS:
+            result[f'MA{window}'] = indicators.ma[window]
         
-        # 计算MACD
-        exp1 = result['close'].ewm(span=12, adjust=False).mean()
-        exp2 = result['close'].ewm(span=26, adjust=False).mean()
-        macd = exp1 - exp2
-        signal = macd.ewm(span=9, adjust=False).mean()
+        # RSI (相对强弱指标)
+        result['RSI'] = indicators.rsi
         
-        result['MACD'] = macd
-        result['MACD_Signal'] = signal
-        result['MACD_Histogram'] = macd - signal
+        # MACD
+        result['MACD'] = indicators.macd
+        result['MACD_Signal'] = indicators.macd_signal
+        result['MACD_Histogram'] = indicators.macd_hist
         
         # 布林带
-        result['Middle_Band'] = result['close'].rolling(window=20).mean()
-        std = result['close'].rolling(window=20).std()
-        result['Upper_Band'] = result['Middle_Band'] + (std * 2)
-        result['Lower_Band'] = result['Middle_Band'] - (std * 2)
+        result['Middle_Band'] = indicators.bb_middle
+        result['Upper_Band'] = indicators.bb_upper
+        result['Lower_Band'] = indicators.bb_lower
         
         return result
     
@@ -168,10 +157,6 @@ class TrendAnalyzer:
         Returns:
             Dict: 包含支撑位和阻力位的字典
         """
-        # 寻找局部低点和局部高点
-        local_min = []
-        local_max = []
-        
         if len(df) < window * 2:
             # 数据不足，返回最低价和最高价
             return {
@@ -179,26 +164,19 @@ class TrendAnalyzer:
                 "resistance": [df['high'].max()]
             }
         
-        for i in range(window, len(df) - window):
-            # 前后窗口的切片
-            prev_window = df.iloc[i-window:i]
-            next_window = df.iloc[i+1:i+window+1]
-            current = df.iloc[i]
-            
-            # 如果当前点的低价是前后窗口中的最低，则为支撑位
-            if current['low'] <= prev_window['low'].min() and current['low'] <= next_window['low'].min():
-                local_min.append(current['low'])
-            
-            # 如果当前点的高价是前后窗口中的最高，则为阻力位
-            if current['high'] >= prev_window['high'].max() and current['high'] >= next_window['high'].max():
-                local_max.append(current['high'])
+        # 寻找局部低点和局部高点：当前点的低价不高于前后窗口中的最低价则为支撑位，
+        # 当前点的高价不低于前后窗口中的最高价则为阻力位
+        low = df['low'].to_numpy(dtype=np.float64)
+        high = df['high'].to_numpy(dtype=np.float64)
+        local_min = TrendAnalyzer._find_pivots(low, window, np.fmin, np.less_equal)
+        local_max = TrendAnalyzer._find_pivots(high, window, np.fmax, np.greater_equal)
         
         # 对支撑位和阻力位进行聚类，避免太多太近的位置
         support = TrendAnalyzer._cluster_price_levels(local_min)
         resistance = TrendAnalyzer._cluster_price_levels(local_max)
         
         # 根据当前价格过滤支撑位和阻力位
-        current_price = df.iloc[-1]['close']
+        current_price = df['close'].iloc[-1]
         support = [s for s in support if s < current_price]
         resistance = [r for r in resistance if r > current_price]
         
@@ -211,11 +189,41 @@ class TrendAnalyzer:
             "resistance": resistance[:3]
         }
     
+    @staticmethod
+    def _find_pivots(values: np.ndarray, window: int, reducer: np.ufunc, compare: np.ufunc) -> List[float]:
+        """
+        寻找局部极值点（向量化）
+        
+        对每个 i（window <= i < n - window），比较 values[i] 与前窗口 values[i-window:i]
+        和后窗口 values[i+1:i+window+1] 的极值。
+        
+        Args:
+            values: 价格数组
+            window: 前后窗口大小
+            reducer: 窗口极值函数，np.fmin 或 np.fmax（忽略NaN，与pandas的min/max一致）
+            compare: 比较函数，np.less_equal 或 np.greater_equal
+            
+        Returns:
+            List[float]: 按时间顺序排列的极值点价格
+        """
+        n = len(values)
+        if n < window * 2 + 1:
+            return []
+        # window_ext[j] 为 values[j:j+window] 的极值
+        window_ext = reducer.reduce(np.lib.stride_tricks.sliding_window_view(values, window), axis=1)
+        current = values[window:n - window]
+        prev_ext = window_ext[:n - 2 * window]
+        next_ext = window_ext[window + 1:]
+        mask = compare(current, prev_ext) & compare(current, next_ext)
+        return current[mask].tolist()
+    
     @staticmethod
     def _cluster_price_levels(levels: List[float], threshold_pct: float = 0.01) -> List[float]:
         """
         对价格水平进行聚类，合并相近的价位
         
+        排序后单次遍历，维护当前聚类的累加和与数量。
+        
         Args:
             levels: 价格水平列表
             threshold_pct: 合并阈值，相差小于这个百分比的价位会被合并
@@ -226,25 +234,25 @@ class TrendAnalyzer:
         if not levels:
             return []
             
-        # 排序
         sorted_levels = sorted(levels)
         clusters = []
-        current_cluster = [sorted_levels[0]]
+        cluster_sum = sorted_levels[0]
+        cluster_count = 1
         
-        for i in range(1, len(sorted_levels)):
-            current = sorted_levels[i]
-            cluster_avg = sum(current_cluster) / len(current_cluster)
+        for current in sorted_levels[1:]:
+            cluster_avg = cluster_sum / cluster_count
             
             # 如果当前价位与聚类平均值相差小于阈值，则添加到当前聚类
             if abs(current - cluster_avg) / cluster_avg < threshold_pct:
-                current_cluster.append(current)
+                cluster_sum += current
+                cluster_count += 1
             else:
                 # 否则完成当前聚类并开始新聚类
-                clusters.append(sum(current_cluster) / len(current_cluster))
-                current_cluster = [current]
+                clusters.append(cluster_sum / cluster_count)
+                cluster_sum = current
+                cluster_count = 1
                 
         # 添加最后一个聚类
-        if current_cluster:
-            clusters.append(sum(current_cluster) / len(current_cluster))
+        clusters.append(cluster_sum / cluster_count)
             
         return clusters
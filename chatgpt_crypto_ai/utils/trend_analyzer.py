@@ -7,6 +7,10 @@ import numpy as np
 from typing import Dict, List, Any, Optional
 import logging
 
+from utils.indicators import compute_indicators, TREND_MA_WINDOWS
+from utils.indicator_state import indicator_state_store, DEFAULT_HISTORY
+from utils.analysis_cache import analysis_cache
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('trend_analyzer')
@@ -16,6 +20,49 @@ class TrendAnalyzer:
     负责分析加密货币的趋势和技术指标
     """
     
+    @staticmethod
+    def analyze_arrays(arrays) -> Dict[str, Any]:
+        """
+        直接基于列式K线数据分析趋势，无需构造DataFrame
+        
+        Args:
+            arrays: KlineDataFetcher.get_kline_arrays 返回的 KlineArrays
+            
+        Returns:
+            Dict: 包含分析结果的字典
+        """
+        if not len(arrays):
+            return {"error": "无法获取币种数据"}
+        
+        return TrendAnalyzer._analyze(arrays.close, arrays.high, arrays.low)
+
+    @staticmethod
+    def analyze_timeframes(frames: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        多周期趋势汇总
+
+        Args:
+            frames: 周期到 KlineArrays 的映射（通常由 utils.resample.multi_timeframe_arrays 聚合得到）
+
+        Returns:
+            Dict[str, Dict]: 每个周期的价格、趋势、均线排列、RSI、MACD信号和K线数量；
+            K线数量不足最长均线窗口时（如由1000根1h聚合出的42根日线）均线排列为None
+        """
+        summary = {}
+        for timeframe, arrays in frames.items():
+            analysis = TrendAnalyzer.analyze_arrays(arrays)
+            if 'error' in analysis:
+                continue
+            summary[timeframe] = {
+                'price': analysis['price'],
+                'overall_trend': analysis['overall_trend'],
+                'ma_trend': analysis['ma_trend'] if len(arrays) >= max(TREND_MA_WINDOWS) else None,
+                'rsi': analysis['rsi'],
+                'macd_signal': analysis['macd_signal'],
+                'bars': len(arrays),
+            }
+        return summary
+
     @staticmethod
     def analyze_trend(kline_data: pd.DataFrame) -> Dict[str, Any]:
         """
@@ -27,125 +74,237 @@ class TrendAnalyzer:
         Returns:
             Dict: 包含分析结果的字典
         """
+        if kline_data.empty:
+            return {"error": "无法获取币种数据"}
+        
         try:
-            if kline_data.empty:
-                return {"error": "无法获取币种数据"}
-            
             # 确保数据按时间正序排序
-            df = kline_data.sort_values('timestamp')
-            
-            # 计算当前价格和基本信息
-            current_price = float(df['close'].iloc[-1])
-            price_change = ((current_price / float(df['close'].iloc[0])) - 1) * 100
-            
-            # 如果有足够数据，计算过去20天的涨跌幅
-            change_20d = None
-            if len(df) >= 20:
-                change_20d = ((current_price / float(df['close'].iloc[-20])) - 1) * 100
-            
-            # 计算移动平均线
-            df['ma7'] = df['close'].rolling(window=7).mean()
-            df['ma25'] = df['close'].rolling(window=25).mean()
-            df['ma99'] = df['close'].rolling(window=99).mean()
-            
-            # 判断均线排列趋势
-            last_row = df.iloc[-1]
-            ma_trend = "不明确"
-            if last_row['ma7'] > last_row['ma25'] > last_row['ma99']:
-                ma_trend = "多头排列"
-            elif last_row['ma7'] < last_row['ma25'] < last_row['ma99']:
-                ma_trend = "空头排列"
-            elif last_row['ma7'] > last_row['ma25'] and last_row['ma25'] < last_row['ma99']:
-                ma_trend = "混合排列"
-            
-            # 判断整体趋势
-            recent_trend = df['close'].iloc[-10:].values
-            trend_direction = np.polyfit(range(len(recent_trend)), recent_trend, 1)[0]
+            df = kline_data
+            if not df['timestamp'].is_monotonic_increasing:
+                df = df.sort_values('timestamp')
+            close = df['close'].to_numpy(dtype=np.float64)
+            high = df['high'].to_numpy(dtype=np.float64)
+            low = df['low'].to_numpy(dtype=np.float64)
+        except Exception as e:
+            logger.error(f"趋势分析失败: {str(e)}")
+            return {"error": f"趋势分析错误: {str(e)}"}
+        
+        return TrendAnalyzer._analyze(close, high, low)
+    
+    @staticmethod
+    def analyze_trend_cached(symbol: str, interval: str, kline_data: pd.DataFrame) -> Dict[str, Any]:
+        """
+        带缓存的 analyze_trend，同一根K线内对同一交易对只分析一次
+        
+        缓存键为 (symbol, interval, K线数量, 最后一根K线开盘时间, 最后收盘价)，
+        并发的相同请求会合并为一次计算。缓存未命中时（最新价格变化），K线数量与
+        指标状态保留的数量一致（get_klines 默认的100根）时用增量指标状态计算，
+        只处理新增或修订的K线；其他数量按整段数据计算。
+        
+        Args:
+            symbol: 交易对，如 'BTC/USDT'
+            interval: 时间周期，如 '1h'
+            kline_data: 包含交易对的K线数据的DataFrame
             
-            if trend_direction > 0:
-                overall_trend = "上涨趋势"
-            elif trend_direction < 0:
-                overall_trend = "下跌趋势"
-            else:
-                overall_trend = "横盘整理"
+        Returns:
+            Dict: 包含分析结果的字典（副本，可以修改）
+        """
+        if kline_data.empty:
+            return TrendAnalyzer.analyze_trend(kline_data)
+        
+        try:
+            key = (symbol, interval, len(kline_data),
+                   kline_data['timestamp'].iloc[-1], float(kline_data['close'].iloc[-1]))
+        except Exception:
+            return TrendAnalyzer.analyze_trend(kline_data)
+        
+        def compute():
+            if len(kline_data) == DEFAULT_HISTORY and kline_data['timestamp'].is_monotonic_increasing:
+                try:
+                    timestamps = kline_data['timestamp'].to_numpy().astype('datetime64[ms]').astype(np.int64)
+                    state = indicator_state_store.sync_columns(
+                        symbol.replace('/', ''), interval, timestamps,
+                        kline_data['high'].to_numpy(dtype=np.float64),
+                        kline_data['low'].to_numpy(dtype=np.float64),
+                        kline_data['close'].to_numpy(dtype=np.float64),
+                    )
+                    return TrendAnalyzer.analyze_state(state)
+                except Exception as e:
+                    logger.error(f"增量趋势分析失败，改为完整计算: {str(e)}")
+            return TrendAnalyzer.analyze_trend(kline_data)
+        
+        return analysis_cache.get_or_compute(key, compute)
+    
+    @staticmethod
+    def _analyze(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> Dict[str, Any]:
+        """
+        基于按时间正序排列的价格数组分析趋势
+        
+        Args:
+            close: 收盘价
+            high: 最高价
+            low: 最低价
             
-            # 计算RSI
-            delta = df['close'].diff()
-            gain = delta.where(delta > 0, 0)
-            loss = -delta.where(delta < 0, 0)
-            avg_gain = gain.rolling(window=14).mean()
-            avg_loss = loss.rolling(window=14).mean()
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-            current_rsi = float(rsi.iloc[-1])
+        Returns:
+            Dict: 包含分析结果的字典
+        """
+        try:
+            close = np.asarray(close, dtype=np.float64)
             
-            # 计算MACD
-            exp12 = df['close'].ewm(span=12, adjust=False).mean()
-            exp26 = df['close'].ewm(span=26, adjust=False).mean()
-            macd = exp12 - exp26
-            signal = macd.ewm(span=9, adjust=False).mean()
-            hist = macd - signal
+            # 所有指标由指标引擎一次计算
+            indicators = compute_indicators(close, ma_windows=TREND_MA_WINDOWS)
+            latest = {f'ma{window}': indicators.latest(f'ma{window}') for window in TREND_MA_WINDOWS}
+            latest.update({name: indicators.latest(name) for name in ('rsi', 'bb_upper', 'bb_lower')})
             
-            macd_signal = "中性"
-            if hist.iloc[-1] > 0 and hist.iloc[-2] <= 0:
-                macd_signal = "金叉看多"
-            elif hist.iloc[-1] < 0 and hist.iloc[-2] >= 0:
-                macd_signal = "死叉看空"
-            elif hist.iloc[-3:].mean() > 0:
-                macd_signal = "偏多"
-            elif hist.iloc[-3:].mean() < 0:
-                macd_signal = "偏空"
+            return TrendAnalyzer._interpret(close, high, low, latest, indicators.macd_hist[-3:])
             
-            # 计算布林带
-            df['20ma'] = df['close'].rolling(window=20).mean()
-            df['std'] = df['close'].rolling(window=20).std()
-            df['upper_band'] = df['20ma'] + 2 * df['std']
-            df['lower_band'] = df['20ma'] - 2 * df['std']
+        except Exception as e:
+            logger.error(f"趋势分析失败: {str(e)}")
+            return {"error": f"趋势分析错误: {str(e)}"}
+    
+    @staticmethod
+    def analyze_state(state) -> Dict[str, Any]:
+        """
+        基于增量指标状态分析趋势，不需要重新处理历史K线
+        
+        Args:
+            state: utils.indicator_state.IndicatorState（均线窗口需与 TREND_MA_WINDOWS 一致）
             
-            # 判断布林带状态
-            last = df.iloc[-1]
-            if last['close'] > last['upper_band']:
-                bollinger_status = "超买区域"
-            elif last['close'] < last['lower_band']:
-                bollinger_status = "超卖区域"
-            else:
-                bollinger_status = "正常区域"
+        Returns:
+            Dict: 包含分析结果的字典，字段与 analyze_trend 相同
+        """
+        if not state.count:
+            return {"error": "无法获取币种数据"}
+        
+        try:
+            return TrendAnalyzer._interpret(
+                np.array(state.closes.values()),
+                np.array(state.highs.values()),
+                np.array(state.lows.values()),
+                state.latest(),
+                np.array(state.macd_hist.values()),
+            )
+        except Exception as e:
+            logger.error(f"趋势分析失败: {str(e)}")
+            return {"error": f"趋势分析错误: {str(e)}"}
+    
+    @staticmethod
+    def analyze_incremental(symbol: str, interval: str, arrays) -> Dict[str, Any]:
+        """
+        用新K线更新 (symbol, interval) 的指标状态后分析趋势
+        
+        只处理上次更新之后的K线（包括修订最后一根未收盘K线），历史部分不再重复计算。
+        
+        Args:
+            symbol: 币安交易对，如 'BTCUSDT'
+            interval: 时间周期，如 '1h'
+            arrays: KlineDataFetcher.get_kline_arrays 返回的 KlineArrays
             
-            # 计算支撑位和阻力位
-            support_levels = []
-            resistance_levels = []
+        Returns:
+            Dict: 包含分析结果的字典
+        """
+        state = indicator_state_store.sync(symbol, interval, arrays)
+        return TrendAnalyzer.analyze_state(state)
+    
+    @staticmethod
+    def _interpret(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                   latest: Dict[str, float], hist: np.ndarray) -> Dict[str, Any]:
+        """
+        根据最新指标值生成分析结论
+        
+        Args:
+            close: 最近的收盘价（按时间正序）
+            high: 最近的最高价
+            low: 最近的最低价
+            latest: 最新指标值（ma7/ma25/ma99/rsi/bb_upper/bb_lower）
+            hist: 最近几根K线的MACD柱
             
-            # 简化的支撑位和阻力位计算（基于近期价格波动）
-            if len(df) >= 20:
-                recent_lows = df['low'].iloc[-20:].nsmallest(3).values
-                recent_highs = df['high'].iloc[-20:].nlargest(3).values
-                
-                # 筛选出相对接近的支撑位
-                for low in recent_lows:
-                    if low < current_price and low not in support_levels:
-                        support_levels.append(low)
-                
-                # 筛选出相对接近的阻力位
-                for high in recent_highs:
-                    if high > current_price and high not in resistance_levels:
-                        resistance_levels.append(high)
+        Returns:
+            Dict: 包含分析结果的字典
+        """
+        # 计算当前价格和基本信息
+        current_price = float(close[-1])
+        price_change = ((current_price / float(close[0])) - 1) * 100
+        
+        # 如果有足够数据，计算过去20天的涨跌幅
+        change_20d = None
+        if len(close) >= 20:
+            change_20d = ((current_price / float(close[-20])) - 1) * 100
+        
+        # 判断均线排列趋势
+        ma7, ma25, ma99 = (latest[f'ma{window}'] for window in TREND_MA_WINDOWS)
+        ma_trend = "不明确"
+        if ma7 > ma25 > ma99:
+            ma_trend = "多头排列"
+        elif ma7 < ma25 < ma99:
+            ma_trend = "空头排列"
+        elif ma7 > ma25 and ma25 < ma99:
+            ma_trend = "混合排列"
+        
+        # 判断整体趋势
+        recent_trend = close[-10:]
+        trend_direction = np.polyfit(range(len(recent_trend)), recent_trend, 1)[0]
+        
+        if trend_direction > 0:
+            overall_trend = "上涨趋势"
+        elif trend_direction < 0:
+            overall_trend = "下跌趋势"
+        else:
+            overall_trend = "横盘整理"
+        
+        # RSI
+        current_rsi = latest['rsi']
+        
+        # MACD
+        macd_signal = "中性"
+        if hist[-1] > 0 and hist[-2] <= 0:
+            macd_signal = "金叉看多"
+        elif hist[-1] < 0 and hist[-2] >= 0:
+            macd_signal = "死叉看空"
+        elif hist[-3:].mean() > 0:
+            macd_signal = "偏多"
+        elif hist[-3:].mean() < 0:
+            macd_signal = "偏空"
+        
+        # 判断布林带状态
+        if current_price > latest['bb_upper']:
+            bollinger_status = "超买区域"
+        elif current_price < latest['bb_lower']:
+            bollinger_status = "超卖区域"
+        else:
+            bollinger_status = "正常区域"
+        
+        # 计算支撑位和阻力位
+        support_levels = []
+        resistance_levels = []
+        
+        # 简化的支撑位和阻力位计算（基于近期价格波动）
+        if len(close) >= 20:
+            recent_lows = np.sort(np.asarray(low[-20:], dtype=np.float64))[:3]
+            recent_highs = np.sort(np.asarray(high[-20:], dtype=np.float64))[::-1][:3]
             
-            # 整合分析结果
-            return {
-                "price": current_price,
-                "price_change_pct_24h": price_change,
-                "change_20d": change_20d,
-                "overall_trend": overall_trend,
-                "ma_trend": ma_trend,
-                "rsi": current_rsi,
-                "oversold": current_rsi < 30,
-                "overbought": current_rsi > 70,
-                "macd_signal": macd_signal,
-                "bollinger_status": bollinger_status,
-                "support_levels": support_levels,
-                "resistance_levels": resistance_levels
-            }
+            # 筛选出相对接近的支撑位
+            for level in recent_lows.tolist():
+                if level < current_price and level not in support_levels:
+                    support_levels.append(level)
             
-        except Exception as e:
-            logger.error(f"趋势分析失败: {str(e)}")
-            return {"error": f"趋势分析错误: {str(e)}"}
+            # 筛选出相对接近的阻力位
+            for level in recent_highs.tolist():
+                if level > current_price and level not in resistance_levels:
+                    resistance_levels.append(level)
+        
+        # 整合分析结果
+        return {
+            "price": current_price,
+            "price_change_pct_24h": price_change,
+            "change_20d": change_20d,
+            "overall_trend": overall_trend,
+            "ma_trend": ma_trend,
+            "rsi": current_rsi,
+            "oversold": current_rsi < 30,
+            "overbought": current_rsi > 70,
+            "macd_signal": macd_signal,
+            "bollinger_status": bollinger_status,
+            "support_levels": support_levels,
+            "resistance_levels": resistance_levels
+        }